@@ -0,0 +1,8 @@
+from authz_socket.client import AuthzClient, AuthzError
+from authz_socket.server import AuthzSocketServer
+
+__all__ = [
+    "AuthzClient",
+    "AuthzError",
+    "AuthzSocketServer",
+]
@@ -0,0 +1,131 @@
+import asyncio
+import itertools
+from typing import Optional
+
+from authz_socket.protocol import (
+    OP_CHECK,
+    OP_CHECK_BATCH,
+    OP_VERIFY_TOKEN,
+    STATUS_OK,
+    decode_frames,
+    encode_frame,
+)
+
+
+class AuthzError(Exception):
+    pass
+
+
+class AuthzClient:
+    """
+    权限检查套接字的客户端
+    同一连接上的并发调用会流水线发送, 响应按请求ID分发给对应的调用者;
+    同一轮事件循环内产生的请求合并为一次写入
+
+    async with AuthzClient("/run/rpac/authz.sock") as client:
+        allowed = await client.check(token, "user:read")
+    """
+
+    def __init__(self, path: str, read_size: int = 65536):
+        self.path = path
+        self.read_size = read_size
+        self._reader: asyncio.StreamReader = None
+        self._writer: asyncio.StreamWriter = None
+        self._reader_task: asyncio.Task = None
+        self._pending: dict[int, asyncio.Future] = {}
+        self._ids = itertools.count()
+        self._outbox: list[bytes] = []
+        self._flusher: asyncio.Task = None
+
+    async def connect(self):
+        self._reader, self._writer = await asyncio.open_unix_connection(self.path)
+        self._reader_task = asyncio.create_task(self._read_responses())
+
+    async def close(self):
+        if self._writer is None:
+            return
+        self._writer.close()
+        self._reader_task.cancel()
+        if self._flusher is not None:
+            self._flusher.cancel()
+        self._fail_pending(AuthzError("连接已关闭"))
+        self._writer = None
+
+    async def __aenter__(self):
+        await self.connect()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def verify_token(self, token: str) -> Optional[int]:
+        return await self._call(OP_VERIFY_TOKEN, token)
+
+    async def check(
+        self, subject: int | str, permission: str, context: Optional[dict] = None, tenant_id: Optional[int] = None
+    ) -> bool:
+        """
+        subject 为用户ID时必须指定 tenant_id; 为令牌时使用令牌中的租户
+        """
+        if tenant_id is not None:
+            return await self._call(OP_CHECK, subject, permission, context, tenant_id)
+        if context is None:
+            return await self._call(OP_CHECK, subject, permission)
+        return await self._call(OP_CHECK, subject, permission, context)
+
+    async def check_batch(
+        self, checks: list, context: Optional[dict] = None, tenant_id: Optional[int] = None
+    ) -> list[bool]:
+        if tenant_id is not None:
+            return await self._call(OP_CHECK_BATCH, checks, context, tenant_id)
+        return await self._call(OP_CHECK_BATCH, checks, context)
+
+    async def _call(self, op: str, *args):
+        if self._writer is None:
+            raise AuthzError("未连接")
+        request_id = next(self._ids)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        self._outbox.append(encode_frame([request_id, op, *args]))
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.create_task(self._flush())
+        try:
+            return await future
+        finally:
+            self._pending.pop(request_id, None)
+
+    async def _flush(self):
+        try:
+            while self._outbox and self._writer is not None:
+                data = b"".join(self._outbox)
+                self._outbox.clear()
+                self._writer.write(data)
+                await self._writer.drain()
+        except Exception as e:
+            self._fail_pending(AuthzError(f"发送请求失败: {e}"))
+
+    async def _read_responses(self):
+        buffer = bytearray()
+        try:
+            while True:
+                data = await self._reader.read(self.read_size)
+                if not data:
+                    break
+                buffer += data
+                for request_id, status, result in decode_frames(buffer):
+                    future = self._pending.get(request_id)
+                    if future is None or future.done():
+                        continue
+                    if status == STATUS_OK:
+                        future.set_result(result)
+                    else:
+                        future.set_exception(AuthzError(result))
+        except Exception as e:
+            self._fail_pending(AuthzError(f"读取响应失败: {e}"))
+            return
+        self._fail_pending(AuthzError("服务端关闭了连接"))
+
+    def _fail_pending(self, error: Exception):
+        for future in self._pending.values():
+            if not future.done():
+                future.set_exception(error)
@@ -0,0 +1,51 @@
+import struct
+
+import msgpack
+
+
+# 帧格式: 4 字节大端长度 + msgpack 消息体
+HEADER = struct.Struct(">I")
+MAX_FRAME_SIZE = 16 * 1024 * 1024
+
+# 请求: [request_id, op, *args]; 响应: [request_id, status, result]
+OP_VERIFY_TOKEN = "verify"  # [id, "verify", token] -> 用户ID, 无效令牌为 nil
+OP_CHECK = "check"  # [id, "check", subject, permission, context?, tenant_id?] -> bool
+# [id, "check_batch", [[subject, permission, context?], ...], context?, tenant_id?] -> [bool, ...]
+OP_CHECK_BATCH = "check_batch"
+# 令牌主体使用令牌中的租户; 用户ID主体必须指定 tenant_id, 套接字请求没有可以继承的租户上下文
+
+STATUS_OK = 0
+STATUS_ERROR = 1  # result 为错误信息
+
+
+class ProtocolError(Exception):
+    pass
+
+
+def encode_frame(message) -> bytes:
+    body = msgpack.packb(message, use_bin_type=True)
+    return HEADER.pack(len(body)) + body
+
+
+def decode_frames(buffer: bytearray, max_frame_size: int = MAX_FRAME_SIZE) -> list:
+    """
+    从缓冲区取出所有完整的帧并解码, 剩余的不完整数据留在缓冲区中
+    """
+    messages = []
+    offset = 0
+    size = len(buffer)
+    while size - offset >= HEADER.size:
+        (length,) = HEADER.unpack_from(buffer, offset)
+        if length > max_frame_size:
+            raise ProtocolError(f"帧长度 {length} 超过上限 {max_frame_size}")
+        end = offset + HEADER.size + length
+        if end > size:
+            break
+        try:
+            messages.append(msgpack.unpackb(buffer[offset + HEADER.size:end], raw=False))
+        except Exception as e:
+            # 帧内容无法解码时后续数据的边界也不可信, 由调用方关闭连接
+            raise ProtocolError(f"无法解码的帧: {e!r}") from e
+        offset = end
+    del buffer[:offset]
+    return messages
@@ -0,0 +1,147 @@
+import asyncio
+import fcntl
+import logging
+import os
+
+from authz_socket.protocol import (
+    OP_CHECK,
+    OP_CHECK_BATCH,
+    OP_VERIFY_TOKEN,
+    STATUS_ERROR,
+    STATUS_OK,
+    ProtocolError,
+    decode_frames,
+    encode_frame,
+)
+from persist.tenant import parse_tenant_id
+from services.authz_service import AuthzService
+
+
+logger = logging.getLogger("AuthzSocketServer")
+
+
+class AuthzSocketServer:
+    """
+    Unix 域套接字上的权限检查服务, 与 HTTP 服务共享 TokenService 和内存权限图
+    客户端可以连续发送多个请求而不等待响应(流水线); 每次读到数据后处理其中所有完整的请求,
+    响应按请求顺序合并为一次写入
+    多 worker 部署时各进程竞争 {path}.lock 文件锁, 只有持有锁的进程监听套接字;
+    进程退出后锁自动释放, 残留的套接字文件只在持有锁时才删除, 不会删掉其他 worker 正在监听的套接字
+    """
+
+    def __init__(self, authz_service: AuthzService, path: str, read_size: int = 65536, mode: int = 0o660):
+        self.authz_service = authz_service
+        self.path = path
+        self.read_size = read_size
+        self.mode = mode
+        self._server: asyncio.AbstractServer = None
+        self._lock_fd = None
+        self.connections = 0
+        self.requests = 0
+
+    def _acquire_lock(self) -> bool:
+        fd = os.open(f"{self.path}.lock", os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return False
+        self._lock_fd = fd
+        return True
+
+    def _release_lock(self):
+        if self._lock_fd is not None:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+            os.close(self._lock_fd)
+            self._lock_fd = None
+
+    async def start(self) -> bool:
+        """
+        开始监听, 返回是否由本进程提供服务; 其他 worker 已在监听时返回 False
+        """
+        if not self._acquire_lock():
+            logger.info(f"权限检查套接字由其他进程提供: {self.path}")
+            return False
+        try:
+            # 持有锁说明上一个监听进程已经退出, 留下的套接字文件可以删除
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+            self._server = await asyncio.start_unix_server(self._handle_connection, path=self.path)
+            os.chmod(self.path, self.mode)
+        except BaseException:
+            self._release_lock()
+            raise
+        logger.info(f"权限检查套接字已启动: {self.path}")
+        return True
+
+    async def close(self):
+        if self._server is None:
+            return
+        self._server.close()
+        await self._server.wait_closed()
+        self._server = None
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self._release_lock()
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+        buffer = bytearray()
+        try:
+            while True:
+                data = await reader.read(self.read_size)
+                if not data:
+                    break
+                buffer += data
+                requests = decode_frames(buffer)
+                if not requests:
+                    continue
+                self.requests += len(requests)
+                writer.write(b"".join([encode_frame(await self._dispatch(request)) for request in requests]))
+                await writer.drain()
+        except ProtocolError as e:
+            logger.warning(f"关闭连接: {e}")
+        except (ConnectionResetError, BrokenPipeError):
+            pass
+        finally:
+            self.connections -= 1
+            writer.close()
+
+    async def _dispatch(self, request) -> list:
+        try:
+            request_id, op, *args = request
+        except (TypeError, ValueError):
+            return [None, STATUS_ERROR, "请求格式错误"]
+        service = self.authz_service
+        try:
+            if op == OP_CHECK:
+                subject, permission, *rest = args
+                tenant_id = self._tenant(rest[1] if len(rest) > 1 else None, [subject])
+                return [request_id, STATUS_OK, service.check(subject, permission, rest[0] if rest else None, tenant_id)]
+            if op == OP_VERIFY_TOKEN:
+                return [request_id, STATUS_OK, service.resolve_token(*args)]
+            if op == OP_CHECK_BATCH:
+                checks, *rest = args
+                if len(checks) > service.max_batch:
+                    return [request_id, STATUS_ERROR, f"单次最多检查 {service.max_batch} 条"]
+                tenant_id = self._tenant(rest[1] if len(rest) > 1 else None, [item[0] for item in checks])
+                # 分块检查, 块之间让出事件循环, 大批量请求不会阻塞其他连接和 HTTP 请求
+                return [request_id, STATUS_OK, await service.check_batch(checks, rest[0] if rest else None, None, tenant_id)]
+        except Exception as e:
+            # 单个请求的任何错误只影响该请求, 不关闭连接
+            return [request_id, STATUS_ERROR, f"参数错误: {type(e).__name__}: {e}"]
+        return [request_id, STATUS_ERROR, f"未知操作: {op}"]
+
+    @staticmethod
+    def _tenant(tenant_id, subjects: list):
+        """
+        校验请求中的租户ID; 有用户ID主体而未指定租户时报错, 而不是落到默认租户
+        """
+        if tenant_id is not None:
+            return parse_tenant_id(tenant_id)
+        if any(isinstance(subject, int) for subject in subjects):
+            raise ValueError("用户ID主体需要指定 tenant_id")
+        return None
+
+    def stats(self) -> dict:
+        return {"connections": self.connections, "requests": self.requests}
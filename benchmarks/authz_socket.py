@@ -0,0 +1,90 @@
+"""
+权限检查吞吐对比: HTTP(POST /authz/check) 与 Unix 域套接字
+
+HTTP 路径经 httpx.ASGITransport 在进程内调用完整应用(含所有中间件), 不包含 TCP 与 HTTP 解析开销,
+实际部署中 HTTP 的差距只会更大; 套接字路径走真实的 Unix 套接字与 msgpack 编解码
+权限图直接在内存中构造, 不需要连接数据库
+
+运行: python -m benchmarks.authz_socket
+"""
+import asyncio
+import os
+import tempfile
+import time
+
+import httpx
+
+from authz_socket import AuthzClient, AuthzSocketServer
+from persist.models.user_model import User
+from persist.tenant import DEFAULT_TENANT_ID
+from main import app, container
+
+SINGLE_CHECKS = 2000
+PIPELINE_CHECKS = 20000
+BATCH_SIZE = 10000
+
+
+def build_graph():
+    graph = container.permission_graph()
+    for permission_id in range(100):
+        graph.add_permission(permission_id, f"resource{permission_id}:read")
+    for role_id in range(10):
+        for permission_id in range(role_id * 10, role_id * 10 + 10):
+            graph.add_role_permission(role_id, permission_id)
+    for user_id in range(1000):
+        graph.add_user_role(user_id, user_id % 10, DEFAULT_TENANT_ID)
+
+
+def report(name, checks, seconds):
+    print(f"{name:<32} {checks / seconds:12.0f} checks/s  {seconds / checks * 1e6:8.2f} us/check")
+
+
+async def bench_http(token):
+    headers = {"Authorization": f"Bearer {token}"}
+    url = "/api/v1/authz/check"
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        start = time.perf_counter()
+        for i in range(SINGLE_CHECKS):
+            await client.post(url, json={"checks": [[token, f"resource{i % 100}:read"]]}, headers=headers)
+        report("http single", SINGLE_CHECKS, time.perf_counter() - start)
+
+        checks = [[token, f"resource{i % 100}:read"] for i in range(BATCH_SIZE)]
+        start = time.perf_counter()
+        for _ in range(10):
+            await client.post(url, json={"checks": checks}, headers=headers)
+        report(f"http batch x{BATCH_SIZE}", BATCH_SIZE * 10, time.perf_counter() - start)
+
+
+async def bench_socket(token, path):
+    async with AuthzClient(path) as client:
+        start = time.perf_counter()
+        for i in range(SINGLE_CHECKS):
+            await client.check(token, f"resource{i % 100}:read")
+        report("socket single", SINGLE_CHECKS, time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(client.check(token, f"resource{i % 100}:read") for i in range(PIPELINE_CHECKS)))
+        report("socket pipelined", PIPELINE_CHECKS, time.perf_counter() - start)
+
+        checks = [[token, f"resource{i % 100}:read"] for i in range(BATCH_SIZE)]
+        start = time.perf_counter()
+        for _ in range(10):
+            await client.check_batch(checks)
+        report(f"socket batch x{BATCH_SIZE}", BATCH_SIZE * 10, time.perf_counter() - start)
+
+
+async def main():
+    build_graph()
+    token = container.token_service().generate_token(User(tenant_id=DEFAULT_TENANT_ID, id=1, username="bench", password=""))
+    path = os.path.join(tempfile.mkdtemp(), "authz.sock")
+    server = AuthzSocketServer(container.authz_service(), path)
+    await server.start()
+    try:
+        await bench_http(token)
+        await bench_socket(token, path)
+    finally:
+        await server.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
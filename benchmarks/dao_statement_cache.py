@@ -0,0 +1,61 @@
+"""
+DAO 热点查询的语句构建开销对比
+
+对比每次调用都新建 select(...).where(...) 与复用模块级预构建语句的 CPU 开销,
+覆盖登录路径(get_user_by_username)和授权路径(get_role_by_id + get_permission_by_id)
+不需要连接数据库: 只测量 SQLAlchemy 在执行前的语句构建与缓存键计算, 以及缓存未命中时的编译耗时
+
+运行: python -m benchmarks.dao_statement_cache
+"""
+import timeit
+
+from sqlalchemy.dialects.postgresql.asyncpg import dialect as asyncpg_dialect
+from sqlmodel import select
+
+from persist.models.permission_model import Permission
+from persist.models.role_model import Role
+from persist.models.user_model import User
+from persist.permission_dao import SELECT_PERMISSION_BY_ID
+from persist.role_dao import SELECT_ROLE_BY_ID
+from persist.user_dao import SELECT_USER_BY_USERNAME
+
+NUMBER = 20000
+
+
+def login_fresh():
+    select(User).where(User.username == "alice")._generate_cache_key()
+
+
+def login_cached():
+    SELECT_USER_BY_USERNAME._generate_cache_key()
+
+
+def grant_fresh():
+    select(Role).where(Role.id == 1)._generate_cache_key()
+    select(Permission).where(Permission.id == 1)._generate_cache_key()
+
+
+def grant_cached():
+    SELECT_ROLE_BY_ID._generate_cache_key()
+    SELECT_PERMISSION_BY_ID._generate_cache_key()
+
+
+def compile_miss():
+    SELECT_USER_BY_USERNAME.compile(dialect=asyncpg_dialect())
+
+
+def report(name, fn, number=NUMBER):
+    seconds = min(timeit.repeat(fn, number=number, repeat=5))
+    per_call = seconds / number * 1e6
+    print(f"{name:<28} {per_call:8.2f} us/call")
+    return per_call
+
+
+if __name__ == "__main__":
+    fresh = report("login fresh statement", login_fresh)
+    cached = report("login cached statement", login_cached)
+    print(f"{'login saved':<28} {fresh - cached:8.2f} us/call")
+    fresh = report("grant fresh statements", grant_fresh)
+    cached = report("grant cached statements", grant_cached)
+    print(f"{'grant saved':<28} {fresh - cached:8.2f} us/call")
+    report("compile (cache miss)", compile_miss, number=2000)
@@ -0,0 +1,87 @@
+"""
+路由取用服务的开销对比: @inject + Depends(Provide[...]) 与启动时绑定的 registry
+
+三个只含一个路由的最小应用(不含中间件), 路由都调用同一个 AuthzService 做单条权限检查, 权限图在内存中构造:
+- inject: 原先的写法, FastAPI 把 Provide 标记当作同步依赖放到线程池中执行, 再由 @inject 包装解析提供者
+- registry (按需解析): 未绑定的 registry, 每次访问调用一次容器的提供者
+- registry (启动时绑定): 服务在启动时解析为实例属性, 请求中只是一次属性查找
+httpx.ASGITransport 进程内调用, 不包含网络开销
+
+运行: python -m benchmarks.dependency_injection
+"""
+import asyncio
+import sys
+import time
+
+import httpx
+from dependency_injector.wiring import Provide, inject
+from fastapi import Depends, FastAPI
+
+from persist.models.user_model import User
+from persist.tenant import DEFAULT_TENANT_ID
+from services import ServiceContainer
+from services.authz_service import AuthzService
+from services.model.authz_vo import AuthzCheckRequest
+from services.registry import ServiceRegistry
+
+REQUESTS = 5000
+
+container = ServiceContainer()
+registry = ServiceRegistry()
+
+
+@inject
+async def check_inject(
+    body: AuthzCheckRequest,
+    authz_service: AuthzService = Depends(Provide[ServiceContainer.authz_service]),
+):
+    return {"results": await authz_service.check_batch(body.checks, body.context)}
+
+
+async def check_registry(body: AuthzCheckRequest):
+    return {"results": await registry.authz_service.check_batch(body.checks, body.context)}
+
+
+def build_app(endpoint) -> FastAPI:
+    app = FastAPI()
+    app.post("/check")(endpoint)
+    return app
+
+
+def build_graph():
+    graph = container.permission_graph()
+    for permission_id in range(100):
+        graph.add_permission(permission_id, f"resource{permission_id}:read")
+    for permission_id in range(10):
+        graph.add_role_permission(1, permission_id)
+    graph.add_user_role(1, 1, DEFAULT_TENANT_ID)
+
+
+async def bench(name: str, app: FastAPI, token: str):
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        body = {"checks": [[token, "resource1:read"]]}
+        for _ in range(200):
+            assert (await client.post("/check", json=body)).json() == {"results": [True]}
+        start = time.perf_counter()
+        for _ in range(REQUESTS):
+            await client.post("/check", json=body)
+        seconds = time.perf_counter() - start
+    print(f"{name:<28} {REQUESTS / seconds:10.0f} req/s  {seconds / REQUESTS * 1e6:8.1f} us/req")
+    return seconds / REQUESTS
+
+
+async def main():
+    build_graph()
+    token = container.token_service().generate_token(User(tenant_id=DEFAULT_TENANT_ID, id=1, username="bench", password=""))
+    container.wire(modules=[sys.modules[__name__]])
+
+    baseline = await bench("inject", build_app(check_inject), token)
+    registry.bind(container, resolve=False)
+    await bench("registry (按需解析)", build_app(check_registry), token)
+    registry.bind(container)
+    prebound = await bench("registry (启动时绑定)", build_app(check_registry), token)
+    print(f"每个请求节省 {(baseline - prebound) * 1e6:.1f} us")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,101 @@
+"""
+权限图快照的加载耗时
+
+按 commands.rbac_dataset 的幂律分布在内存中生成 --users 个用户的授权数据, 对比:
+- 全量加载: 由查询结果行构建权限图(不含数据库查询和传输, 实际部署中这部分通常更慢)
+- 写入快照: 文件大小与耗时
+- 从快照恢复: mmap、校验和、解码角色授权, 用户部分不复制, 前缀树在角色首次被检查时编译
+随后对随机 (用户, 权限) 检查比较两份权限图的结果, 以及预热后两者的检查延迟(快照上的用户查找为二分)
+
+运行: python -m benchmarks.graph_snapshot --users 1000000 --roles 10000 --permissions 5000
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+
+from commands.rbac_dataset import PowerLaw, Popularity
+from services.permission_graph import PermissionGraph
+
+CHECKS = 200_000
+
+
+class RowsChangeLog:
+    """
+    以内存中的行代替数据库, 标记固定, 没有后续变更
+    """
+
+    def __init__(self, permissions, role_permissions, user_roles):
+        self.state = (1, "1:1:", permissions, role_permissions, user_roles)
+
+    async def load_graph_state(self):
+        return self.state
+
+    async def list_changes(self, marker: int, snapshot, limit: int):
+        return marker, snapshot, []
+
+
+def build_rows(args):
+    rng = random.Random(args.seed)
+    permissions = [(i + 1, f"resource{i // 4}:{('read', 'write', 'list', 'delete')[i % 4]}") for i in range(args.permissions)]
+    grant_sizes = PowerLaw(1, min(200, args.permissions), 1.5)
+    permission_popularity = Popularity(args.permissions, 1.0)
+    role_permissions = [
+        (role_id, permission + 1, None)
+        for role_id in range(1, args.roles + 1)
+        for permission in permission_popularity.pick(rng, grant_sizes.sample(rng))
+    ]
+    role_sizes = PowerLaw(1, min(20, args.roles), 2.0)
+    role_popularity = Popularity(args.roles, 1.0)
+    user_roles = [
+        (1, user_id, role + 1)
+        for user_id in range(1, args.users + 1)
+        for role in role_popularity.pick(rng, role_sizes.sample(rng))
+    ]
+    return permissions, role_permissions, user_roles
+
+
+async def main(args):
+    rows = build_rows(args)
+    print(f"{'数据':<16} {len(rows[0])} 个权限, {len(rows[1])} 条角色授权, {len(rows[2])} 条用户角色")
+    path = os.path.join(tempfile.mkdtemp(), "permission_graph.snapshot")
+    change_log = RowsChangeLog(*rows)
+
+    graph = PermissionGraph(None, None, None, change_log_dao=change_log)
+    start = time.perf_counter()
+    await graph.load()
+    print(f"{'全量加载':<16} {(time.perf_counter() - start) * 1000:10.1f} ms")
+
+    start = time.perf_counter()
+    size = await graph.save_snapshot(path)
+    print(f"{'写入快照':<16} {(time.perf_counter() - start) * 1000:10.1f} ms  {size / 1e6:.1f} MB")
+
+    restored = PermissionGraph(None, None, None, change_log_dao=change_log, snapshot_path=path)
+    start = time.perf_counter()
+    await restored.warm_start()
+    print(f"{'快照恢复+追赶':<16} {(time.perf_counter() - start) * 1000:10.1f} ms  ({restored.source})")
+
+    rng = random.Random(args.seed + 1)
+    checks = [(rng.randint(1, args.users), rows[0][rng.randrange(len(rows[0]))][1]) for _ in range(CHECKS)]
+    results = [graph.check(user_id, permission) for user_id, permission in checks]
+    restored_results = [restored.check(user_id, permission) for user_id, permission in checks]
+    mismatches = sum(a != b for a, b in zip(results, restored_results))
+    # 前缀树在首次检查时编译, 上面一轮之后两份权限图都已预热
+    for name, target in (("检查(字典)", graph), ("检查(快照)", restored)):
+        start = time.perf_counter()
+        for user_id, permission in checks:
+            target.check(user_id, permission)
+        print(f"{name:<16} {(time.perf_counter() - start) / CHECKS * 1e6:10.2f} us")
+    print(f"{'结果不一致':<16} {mismatches} / {CHECKS}, 允许 {sum(results)}")
+    os.remove(path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="权限图快照基准测试")
+    parser.add_argument("--users", type=int, default=1_000_000)
+    parser.add_argument("--roles", type=int, default=10_000)
+    parser.add_argument("--permissions", type=int, default=5_000)
+    parser.add_argument("--seed", type=int, default=0)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,66 @@
+"""
+扁平权限与通配权限的存储和检查开销对比
+
+场景: RESOURCES 个资源, 每个资源 ACTIONS 种操作; 每个角色被授予若干资源上的全部操作
+扁平存储: 每个具体权限一行 role_permission, 检查为名称 -> ID 查找 + 集合判断
+通配存储: 每个资源一行 resource:*, 检查为逐段匹配角色的前缀树
+另外给出逐条通配匹配(fnmatch)作为对照, 说明前缀树的检查耗时与授权数量无关
+
+运行: python -m benchmarks.permission_wildcards
+"""
+import itertools
+import random
+import timeit
+from fnmatch import fnmatchcase
+
+from services.permission_trie import PermissionTrie
+
+RESOURCES = 2000
+ACTIONS = ["read", "create", "update", "delete", "list", "export", "import", "audit"]
+GRANT_SIZES = [10, 100, 1000]
+NUMBER = 20000
+
+
+def report(name, grants, rows, fn):
+    seconds = min(timeit.repeat(fn, number=NUMBER, repeat=3))
+    print(f"{name:<12} {grants:>6} 个资源  {rows:>8} 行  {seconds / NUMBER * 1e6:8.3f} us/check")
+
+
+def main():
+    random.seed(0)
+    for size in GRANT_SIZES:
+        resources = random.sample(range(RESOURCES), size)
+        queries = [f"resource{random.randrange(RESOURCES)}:{random.choice(ACTIONS)}" for _ in range(1024)]
+
+        # 扁平: 名称 -> ID, 角色持有具体权限ID集合
+        flat_names = [f"resource{r}:{action}" for r in resources for action in ACTIONS]
+        all_names = [f"resource{r}:{action}" for r in range(RESOURCES) for action in ACTIONS]
+        permission_ids = {name: permission_id for permission_id, name in enumerate(all_names)}
+        granted = {permission_ids[name] for name in flat_names}
+
+        # 通配: 每个资源一条授权
+        patterns = [f"resource{r}:*" for r in resources]
+        trie = PermissionTrie(patterns)
+
+        it = itertools.count()
+
+        def flat_check():
+            name = queries[next(it) & 1023]
+            permission_id = permission_ids.get(name)
+            return permission_id is not None and permission_id in granted
+
+        def trie_check():
+            return trie.match(queries[next(it) & 1023])
+
+        def scan_check():
+            name = queries[next(it) & 1023]
+            return any(fnmatchcase(name, pattern) for pattern in patterns)
+
+        report("flat", size, len(flat_names), flat_check)
+        report("trie", size, len(patterns), trie_check)
+        report("fnmatch scan", size, len(patterns), scan_check)
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+授权条件求值开销
+
+compiled: 加载时编译为闭包, 每次检查只对上下文求值
+reparse:  每次检查都重新解析表达式再求值(对照组)
+worst:    节点数接近 MAX_CONDITION_NODES 的条件, 给出单次求值耗时的实测上界
+
+运行: python -m benchmarks.policy_conditions
+"""
+import ast
+import timeit
+
+from services.policy_condition import MAX_CONDITION_NODES, compile_condition
+
+NUMBER = 50000
+
+CONDITIONS = {
+    "owner": "resource.owner_id == user.id",
+    "owner_or_ip": "resource.owner_id == user.id or ip_in(request.ip, '10.0.0.0/8')",
+    "office_hours": "9 <= request.hour < 18 and request.method in ['GET', 'HEAD'] and not user.suspended",
+}
+
+CONTEXT = {
+    "user": {"id": 42, "suspended": False},
+    "resource": {"owner_id": 7},
+    "request": {"ip": "10.1.2.3", "hour": 11, "method": "GET"},
+}
+
+
+def worst_case() -> str:
+    # 尽量多的比较, 且全部不满足, 迫使 or 求值每一项
+    clauses = []
+    while True:
+        candidate = " or ".join(clauses + [f"resource.owner_id == {len(clauses)}"])
+        if sum(1 for _ in ast.walk(ast.parse(candidate, mode="eval"))) > MAX_CONDITION_NODES:
+            return " or ".join(clauses)
+        clauses.append(f"resource.owner_id == {len(clauses) + 100}")
+
+
+def report(name, fn):
+    seconds = min(timeit.repeat(fn, number=NUMBER, repeat=3))
+    per_check = seconds / NUMBER
+    print(f"{name:<28} {1 / per_check:12.0f} checks/s  {per_check * 1e6:8.3f} us/check")
+
+
+if __name__ == "__main__":
+    for name, source in CONDITIONS.items():
+        condition = compile_condition(source)
+        report(f"compiled {name}", lambda: condition(CONTEXT))
+        report(f"reparse {name}", lambda: compile_condition(source)(CONTEXT))
+    source = worst_case()
+    condition = compile_condition(source)
+    print(f"\nworst case: {sum(1 for _ in ast.walk(ast.parse(source, mode='eval')))} 个节点")
+    report("compiled worst", lambda: condition(CONTEXT))
@@ -0,0 +1,51 @@
+"""
+响应序列化开销对比
+
+旧路径: 路由声明 SQLModel 表模型为返回类型, FastAPI 对 ORM 对象做 pydantic 校验,
+        再经 jsonable_encoder 转换并用标准库 json 序列化(且会输出密码哈希)
+新路径: read_response 按读模型字段直接取值, 由 orjson 序列化, 跳过校验
+
+运行: python -m benchmarks.serialization
+"""
+import timeit
+from datetime import datetime
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from persist.models.user_model import User
+from services.model.user_vo import UserRead
+from utils.responses import read_response
+
+NUMBER = 20000
+
+user = User(
+    id=1,
+    tenant_id=1,
+    username="alice",
+    email="alice@example.com",
+    password="$2b$12$C6UzMDM.H6dfI/f/IKxGhuXtWKkS9eBL4U8j3wJ0A1r4bGkEl1uKa",
+    created_at=datetime.now(),
+    updated_at=datetime.now(),
+)
+
+
+def validated_response():
+    JSONResponse(jsonable_encoder(User.model_validate(user)))
+
+
+def fast_response():
+    read_response(UserRead, user)
+
+
+def report(name, fn):
+    seconds = min(timeit.repeat(fn, number=NUMBER, repeat=5))
+    per_call = seconds / NUMBER * 1e6
+    print(f"{name:<28} {per_call:8.2f} us/response")
+    return per_call
+
+
+if __name__ == "__main__":
+    slow = report("validated + json", validated_response)
+    fast = report("read model + orjson", fast_response)
+    print(f"{'speedup':<28} {slow / fast:8.2f} x")
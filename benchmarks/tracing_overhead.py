@@ -0,0 +1,126 @@
+"""
+请求追踪的开销
+
+追踪是否启用在导入时由 TRACING_EXPORTER 决定, 因此每种配置在独立的子进程中运行:
+关闭追踪、启用但采样 0%、采样 10%、采样 100%(内存导出器)
+每种配置测量:
+- 完整应用的单条权限检查请求(httpx.ASGITransport 进程内调用, 经过全部中间件和路由的 span), 权限图在内存中构造
+- 服务调用 DAO 的协程调用链(1 次服务方法 + 3 次 DAO 方法), 只测装饰器本身的开销
+- 导出开销: 把产生的 span 序列化为 OTLP/JSON 并写入文件的耗时
+
+运行: python -m benchmarks.tracing_overhead
+"""
+import asyncio
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+CONFIGS = [
+    ("关闭", {}),
+    ("采样 0%", {"TRACING_EXPORTER": "memory", "TRACING_SAMPLE_RATE": "0"}),
+    ("采样 10%", {"TRACING_EXPORTER": "memory", "TRACING_SAMPLE_RATE": "0.1"}),
+    ("采样 100%", {"TRACING_EXPORTER": "memory", "TRACING_SAMPLE_RATE": "1"}),
+]
+REQUESTS = 2000
+CALLS = 100000
+
+
+async def bench_http():
+    import httpx
+
+    from benchmarks.authz_socket import build_graph
+    from main import app, container
+    from persist.models.user_model import User
+    from persist.tenant import DEFAULT_TENANT_ID
+
+    build_graph()
+    token = container.token_service().generate_token(User(tenant_id=DEFAULT_TENANT_ID, id=1, username="bench", password=""))
+    headers = {"Authorization": f"Bearer {token}"}
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        for i in range(100):
+            await client.post("/api/v1/authz/check", json={"checks": [[token, "resource1:read"]]}, headers=headers)
+        start = time.perf_counter()
+        for i in range(REQUESTS):
+            await client.post("/api/v1/authz/check", json={"checks": [[token, f"resource{i % 100}:read"]]}, headers=headers)
+        return (time.perf_counter() - start) / REQUESTS
+
+
+async def bench_calls():
+    from utils import tracing
+
+    @tracing.traced_class
+    class Dao:
+        async def get(self, key):
+            return key
+
+    @tracing.traced_class
+    class Service:
+        def __init__(self):
+            self.dao = Dao()
+
+        async def load(self, key):
+            return (await self.dao.get(key), await self.dao.get(key + 1), await self.dao.get(key + 2))
+
+    service = Service()
+    start = time.perf_counter()
+    for i in range(CALLS):
+        span = tracing.tracer.start_trace("bench") if tracing.tracer else None
+        if span is None:
+            await service.load(i)
+            continue
+        token = tracing.activate(span)
+        try:
+            await service.load(i)
+        finally:
+            tracing.deactivate(token)
+            tracing.tracer.end(span)
+    return (time.perf_counter() - start) / CALLS
+
+
+def bench_export():
+    from utils import tracing
+
+    if tracing.tracer is None or not tracing.tracer._buffer:
+        return None, 0
+    spans = tracing.tracer._buffer
+    exporter = tracing.FileSpanExporter(os.path.join(tempfile.mkdtemp(), "traces.jsonl"))
+    start = time.perf_counter()
+    for offset in range(0, len(spans), 512):
+        exporter.export(spans[offset:offset + 512])
+    return (time.perf_counter() - start) / len(spans), len(spans)
+
+
+def child():
+    # 请求日志的输出开销远大于追踪本身, 测量时关闭
+    logging.disable(logging.CRITICAL)
+    # 缓冲区不导出, 测完后统一计算导出开销
+    from utils import tracing
+    if tracing.tracer:
+        tracing.tracer.max_queue = sys.maxsize
+        tracing.tracer.batch_size = sys.maxsize
+    http = asyncio.run(bench_http())
+    calls = asyncio.run(bench_calls())
+    export, spans = bench_export()
+    export_text = f"{export * 1e6:8.2f} us/span ({spans} spans)" if export else "-"
+    print(f"{http * 1e6:10.1f} {calls * 1e6:12.2f}   {export_text}")
+
+
+def main():
+    print(f"{'配置':<12} {'请求 us':>10} {'调用链 us':>12}   导出")
+    for name, env in CONFIGS:
+        env = {**{key: value for key, value in os.environ.items() if not key.startswith("TRACING_")}, **env}
+        result = subprocess.run(
+            [sys.executable, "-m", "benchmarks.tracing_overhead", "--child"],
+            env=env, capture_output=True, text=True, check=True,
+        )
+        print(f"{name:<12} {result.stdout.strip().splitlines()[-1]}")
+
+
+if __name__ == "__main__":
+    if "--child" in sys.argv:
+        child()
+    else:
+        main()
@@ -0,0 +1,42 @@
+"""
+有效权限表的一致性检查与重建
+
+检查: python -m commands.effective_permissions check [--sample 10]
+      不一致时以状态码 1 退出, 可用于定时任务告警
+重建: python -m commands.effective_permissions rebuild
+      在一个事务内清空并重新生成, 期间授权写入会等待
+"""
+import argparse
+import asyncio
+import sys
+
+import orjson
+
+from persist import PersistContainer
+
+
+async def run(args) -> int:
+    container = PersistContainer()
+    dao = container.effective_permission_dao()
+    try:
+        if args.command == "check":
+            report = await dao.check_consistency(sample=args.sample)
+        else:
+            report = await dao.rebuild()
+    finally:
+        await container.pg_client().dispose()
+    print(orjson.dumps(report, option=orjson.OPT_INDENT_2).decode())
+    return 0 if report.get("consistent", True) else 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description="有效权限表的一致性检查与重建")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    check = subparsers.add_parser("check", help="对比有效权限表与 userrole x role_permission")
+    check.add_argument("--sample", type=int, default=10, help="输出的不一致行样本数")
+    subparsers.add_parser("rebuild", help="重新生成有效权限表")
+    sys.exit(asyncio.run(run(parser.parse_args())))
+
+
+if __name__ == "__main__":
+    main()
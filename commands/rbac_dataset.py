@@ -0,0 +1,379 @@
+"""
+生成用于规模测试的合成 RBAC 数据集(需要 PostgreSQL)
+
+生成: python -m commands.rbac_dataset [--tenant 1] [--users 100000] [--roles 1000] [--permissions 5000]
+      [--roles-per-user 1:20] [--permissions-per-role 1:200] [--seed 0] [--facts dataset_facts.json]
+      [--schema NAME] [--replace]
+
+- 每个用户的角色数、每个角色的权限数服从有界幂律分布(P(k) ∝ k^-alpha), 角色和权限的热度同样服从幂律,
+  少数角色被大多数用户持有、少数权限出现在大多数角色中
+- 行结构由 --seed 和租户ID决定, 相同参数重复生成得到相同的数据; id 从数据库序列分配, 事实清单中同时记录名称和 id
+- 表和列取自 SQLModel 模型, 用 asyncpg 的 COPY 分批导入, 有效权限表由触发器维护
+- 事实清单(JSON)记录参数、各表行数、分布统计以及抽样用户的 (用户, 权限, 期望结果) 检查, 供基准测试校验权限检查的正确性
+- 默认写入 POSTGRES_ASYNC_DATABASE_URL 的现有表, 租户已有数据时以状态码 2 退出, --replace 先删除该租户的数据;
+  --schema 在独立的 schema 中按迁移 5b3e9c07a1d4 重新建表(已存在时删除重建), 不影响应用的数据;
+  不能指定 public、系统 schema 或当前 search_path 中的 schema
+"""
+import argparse
+import asyncio
+import bisect
+import heapq
+import importlib.util
+import random
+import sys
+import time
+from array import array
+from datetime import datetime
+from pathlib import Path
+
+import orjson
+
+from persist import PersistContainer
+from persist.models import Permission, Role, RolePermission, User, UserRole
+from persist.tenant import DEFAULT_TENANT_ID
+from utils.bcrypt import hash_password
+
+MIGRATION = next(Path(__file__).resolve().parent.parent.glob("migrations/versions/*-5b3e9c07a1d4_*.py"))
+# 与迁移相同, 序列归属于 id 列, reserve_ids 通过 pg_get_serial_sequence 找到它
+SEQUENCES = """
+CREATE SEQUENCE user_id_seq OWNED BY "user".id; ALTER TABLE "user" ALTER COLUMN id SET DEFAULT nextval('user_id_seq');
+CREATE SEQUENCE role_id_seq OWNED BY role.id; ALTER TABLE role ALTER COLUMN id SET DEFAULT nextval('role_id_seq');
+CREATE SEQUENCE permission_id_seq OWNED BY permission.id;
+ALTER TABLE permission ALTER COLUMN id SET DEFAULT nextval('permission_id_seq');
+"""
+ACTIONS = ("read", "write", "list", "delete")
+# --schema 会被删除重建, 不允许指向这些 schema
+RESERVED_SCHEMAS = frozenset({"public", "information_schema"})
+# 按外键依赖的逆序删除, 有效权限表由 userrole 和 role_permission 上的删除触发器清理
+DELETE_ORDER = (UserRole, RolePermission, User, Role, Permission)
+
+
+class PowerLaw:
+    """
+    有界离散幂律分布: P(k) ∝ k^-alpha, k ∈ [low, high]
+    """
+
+    def __init__(self, low: int, high: int, alpha: float):
+        self.low = low
+        total = 0.0
+        self.cumulative = []
+        for k in range(low, high + 1):
+            total += k ** -alpha
+            self.cumulative.append(total)
+
+    def sample(self, rng: random.Random) -> int:
+        return self.low + bisect.bisect_left(self.cumulative, rng.random() * self.cumulative[-1])
+
+
+class Popularity:
+    """
+    按热度抽取不重复的下标: 第 i 个(从 0 开始)的权重为 (i + 1)^-skew
+    """
+
+    def __init__(self, size: int, skew: float):
+        self.size = size
+        self.skew = skew
+        self.ranks = PowerLaw(1, size, skew)
+
+    def pick(self, rng: random.Random, count: int) -> list[int]:
+        """
+        不放回的加权抽样; 先按分布逐个抽取并丢弃重复, 重复过多(偏斜大或 count 接近 size)时
+        对剩余下标用 Efraimidis–Spirakis 方法(每个下标取 Exp(权重) 的随机键, 取最小的若干个)补足,
+        两种方式得到的分布相同, 且耗时有上界
+        """
+        count = min(count, self.size)
+        picked = set()
+        for _ in range(count * 4):
+            if len(picked) == count:
+                return sorted(picked)
+            picked.add(self.ranks.sample(rng) - 1)
+        if len(picked) < count:
+            remaining = (i for i in range(self.size) if i not in picked)
+            picked.update(
+                heapq.nsmallest(count - len(picked), remaining, key=lambda i: rng.expovariate((i + 1) ** -self.skew))
+            )
+        return sorted(picked)
+
+
+def parse_range(value: str) -> tuple[int, int]:
+    low, _, high = value.partition(":")
+    low, high = int(low), int(high or low)
+    if not 1 <= low <= high:
+        raise argparse.ArgumentTypeError(f"范围应为 最小值:最大值 且 1 <= 最小值 <= 最大值: {value}")
+    return low, high
+
+
+def summarize(counts) -> dict:
+    ordered = sorted(counts)
+    if not ordered:
+        return {}
+    return {
+        "min": ordered[0],
+        "p50": ordered[len(ordered) // 2],
+        "p99": ordered[min(len(ordered) * 99 // 100, len(ordered) - 1)],
+        "max": ordered[-1],
+        "mean": round(sum(ordered) / len(ordered), 2),
+    }
+
+
+def columns(model) -> list[str]:
+    return [column.name for column in model.__table__.columns]
+
+
+def load_migration():
+    spec = importlib.util.spec_from_file_location("partition_migration", MIGRATION)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+async def reserve_ids(raw, model, count: int) -> list[int]:
+    """
+    从表的序列中分配 count 个 id, 与应用并发写入时也不会冲突
+    """
+    rows = await raw.fetch(
+        "SELECT nextval(pg_get_serial_sequence($1, 'id')) FROM generate_series(1, $2)",
+        f'"{model.__tablename__}"', count,
+    )
+    return [row[0] for row in rows]
+
+
+class DatasetLoader:
+    """
+    按参数生成一个租户的数据并以 COPY 导入; 随机数按用途分开, 调整抽样用户数不会改变生成的数据
+    """
+
+    def __init__(self, raw, args):
+        self.raw = raw
+        self.args = args
+        self.tenant_id = args.tenant
+        self.now = datetime.now()
+        self.timing = {}
+        self.rows = {}
+
+    def rng(self, purpose: str) -> random.Random:
+        return random.Random(f"{self.args.seed}:{self.tenant_id}:{purpose}")
+
+    async def copy(self, model, records: list):
+        await self.raw.copy_records_to_table(model.__tablename__, records=records, columns=columns(model))
+        self.rows[model.__tablename__] = self.rows.get(model.__tablename__, 0) + len(records)
+
+    async def timed(self, name: str, coroutine):
+        start = time.perf_counter()
+        result = await coroutine
+        self.timing[name] = round(time.perf_counter() - start, 3)
+        return result
+
+    async def existing_rows(self) -> int:
+        total = 0
+        for model in (User, Role, Permission):
+            total += await self.raw.fetchval(f'SELECT count(*) FROM "{model.__tablename__}" WHERE tenant_id = $1', self.tenant_id)
+        return total
+
+    async def delete_tenant(self):
+        for model in DELETE_ORDER:
+            await self.raw.execute(f'DELETE FROM "{model.__tablename__}" WHERE tenant_id = $1', self.tenant_id)
+
+    async def load_permissions(self) -> tuple[list[int], list[str]]:
+        names = [f"resource{i // len(ACTIONS)}:{ACTIONS[i % len(ACTIONS)]}" for i in range(self.args.permissions)]
+        ids = await reserve_ids(self.raw, Permission, len(names))
+        await self.copy(Permission, [
+            (self.tenant_id, permission_id, name, None, self.now, self.now) for permission_id, name in zip(ids, names)
+        ])
+        return ids, names
+
+    async def load_roles(self, permission_ids: list[int]) -> tuple[list[int], list[list[int]]]:
+        """
+        返回角色 id 和每个角色持有的权限下标
+        """
+        rng = self.rng("grants")
+        sizes = PowerLaw(*self.args.permissions_per_role, self.args.permissions_per_role_alpha)
+        popularity = Popularity(len(permission_ids), self.args.permission_skew)
+        grants = [popularity.pick(rng, sizes.sample(rng)) for _ in range(self.args.roles)]
+
+        ids = await reserve_ids(self.raw, Role, self.args.roles)
+        await self.copy(Role, [
+            (self.tenant_id, role_id, f"role{index}", None, self.now, self.now) for index, role_id in enumerate(ids)
+        ])
+        records = [
+            (self.tenant_id, role_id, permission_ids[permission], None, self.now, self.now)
+            for role_id, permissions in zip(ids, grants)
+            for permission in permissions
+        ]
+        await self.copy(RolePermission, records)
+        return ids, grants
+
+    async def load_users(self, role_ids: list[int], grants: list[list[int]]) -> tuple[array, list[int], dict]:
+        """
+        分批生成用户和用户角色; 返回用户 id、每个用户的角色数和抽样用户持有的角色下标
+        """
+        args = self.args
+        rng = self.rng("roles")
+        sizes = PowerLaw(*args.roles_per_user, args.roles_per_user_alpha)
+        popularity = Popularity(len(role_ids), args.role_skew)
+        password = hash_password(args.password)
+        stride = max(args.users // args.fact_users, 1) if args.fact_users else 0
+
+        grant_counts = [len(permissions) for permissions in grants]
+        user_ids = array("q")
+        role_counts = []
+        # 触发器维护的有效权限表应有的行数: 每个 (用户, 角色) 展开为该角色的全部权限
+        self.rows["user_effective_permission"] = 0
+        sampled = {}
+        for offset in range(0, args.users, args.batch_size):
+            count = min(args.batch_size, args.users - offset)
+            ids = await reserve_ids(self.raw, User, count)
+            users, user_roles = [], []
+            for index, user_id in enumerate(ids, offset):
+                roles = popularity.pick(rng, sizes.sample(rng))
+                users.append((self.tenant_id, user_id, f"user{index}", None, password, self.now, self.now))
+                user_roles.extend((self.tenant_id, user_id, role_ids[role], self.now, self.now) for role in roles)
+                role_counts.append(len(roles))
+                self.rows["user_effective_permission"] += sum(grant_counts[role] for role in roles)
+                if stride and index % stride == 0 and len(sampled) < args.fact_users:
+                    sampled[index] = roles
+            await self.copy(User, users)
+            await self.copy(UserRole, user_roles)
+            user_ids.extend(ids)
+        return user_ids, role_counts, sampled
+
+    def build_facts(self, permission_ids, permission_names, grants, user_ids, role_counts, sampled) -> dict:
+        """
+        抽样用户的权限集合由 角色 -> 权限 的生成结果直接求并得到, 与数据库和应用的检查逻辑无关
+        """
+        rng = self.rng("facts")
+        checks = []
+        for index, roles in sampled.items():
+            granted = set()
+            for role in roles:
+                granted.update(grants[role])
+            positives = rng.sample(sorted(granted), min(self.args.checks_per_user, len(granted)))
+            missing = len(permission_ids) - len(granted)
+            if missing * 2 < len(permission_ids):
+                candidates = [permission for permission in range(len(permission_ids)) if permission not in granted]
+                negatives = rng.sample(candidates, min(self.args.checks_per_user, missing))
+            else:
+                negatives = set()
+                while len(negatives) < self.args.checks_per_user:
+                    permission = rng.randrange(len(permission_ids))
+                    if permission not in granted:
+                        negatives.add(permission)
+                negatives = sorted(negatives)
+            for permissions, expected in ((positives, True), (negatives, False)):
+                checks.extend(
+                    {
+                        "user_id": user_ids[index],
+                        "username": f"user{index}",
+                        "permission": permission_names[permission],
+                        "permission_id": permission_ids[permission],
+                        "expected": expected,
+                    }
+                    for permission in permissions
+                )
+
+        grants_per_role = [len(permissions) for permissions in grants]
+        return {
+            "tenant_id": self.tenant_id,
+            "seed": self.args.seed,
+            "parameters": {
+                "users": self.args.users,
+                "roles": self.args.roles,
+                "permissions": self.args.permissions,
+                "roles_per_user": list(self.args.roles_per_user),
+                "roles_per_user_alpha": self.args.roles_per_user_alpha,
+                "permissions_per_role": list(self.args.permissions_per_role),
+                "permissions_per_role_alpha": self.args.permissions_per_role_alpha,
+                "role_skew": self.args.role_skew,
+                "permission_skew": self.args.permission_skew,
+            },
+            "password": self.args.password,
+            "rows": self.rows,
+            "distributions": {
+                "roles_per_user": summarize(role_counts),
+                "permissions_per_role": summarize(grants_per_role),
+            },
+            "timing": self.timing,
+            "checks": checks,
+        }
+
+
+def quote_identifier(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+async def prepare_schema(raw, schema: str):
+    """
+    删除并重建 schema 后按迁移建表; 拒绝系统 schema 和当前 search_path 中的 schema(应用的数据所在)
+    """
+    in_use = await raw.fetchval("SELECT current_schemas(false)")
+    if schema in RESERVED_SCHEMAS or schema.startswith("pg_") or schema in in_use:
+        raise ValueError(f"--schema 不能是 {schema}: 该 schema 会被删除重建, 只能指定专用于数据集的 schema")
+    migration = load_migration()
+    quoted = quote_identifier(schema)
+    await raw.execute(f"DROP SCHEMA IF EXISTS {quoted} CASCADE; CREATE SCHEMA {quoted}; SET LOCAL search_path TO {quoted}")
+    for script in (migration.partitioned_tables_sql(), migration.CONSTRAINTS, SEQUENCES,
+                   migration.TRIGGER_FUNCTIONS, migration.TRIGGERS):
+        await raw.execute(script)
+
+
+async def run(args) -> int:
+    container = PersistContainer()
+    engine = container.pg_client()
+    try:
+        async with engine.begin() as conn:
+            raw = (await conn.get_raw_connection()).driver_connection
+            if args.schema:
+                try:
+                    await prepare_schema(raw, args.schema)
+                except ValueError as e:
+                    print(e, file=sys.stderr)
+                    return 2
+            loader = DatasetLoader(raw, args)
+            if await loader.existing_rows():
+                if not args.replace:
+                    print(f"租户 {args.tenant} 已有数据, 使用 --replace 先删除", file=sys.stderr)
+                    return 2
+                await loader.timed("delete", loader.delete_tenant())
+
+            permission_ids, permission_names = await loader.timed("permissions", loader.load_permissions())
+            role_ids, grants = await loader.timed("roles", loader.load_roles(permission_ids))
+            user_ids, role_counts, sampled = await loader.timed("users", loader.load_users(role_ids, grants))
+            await loader.timed("analyze", raw.execute("ANALYZE"))
+    finally:
+        await engine.dispose()
+
+    facts = loader.build_facts(permission_ids, permission_names, grants, user_ids, role_counts, sampled)
+    Path(args.facts).write_bytes(orjson.dumps(facts, option=orjson.OPT_INDENT_2))
+    summary = {key: facts[key] for key in ("tenant_id", "rows", "distributions", "timing")}
+    print(orjson.dumps({**summary, "facts": args.facts, "checks": len(facts["checks"])}, option=orjson.OPT_INDENT_2).decode())
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="生成用于规模测试的合成 RBAC 数据集")
+    parser.add_argument("--tenant", type=int, default=DEFAULT_TENANT_ID, help="目标租户ID")
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--roles", type=int, default=1_000)
+    parser.add_argument("--permissions", type=int, default=5_000)
+    parser.add_argument("--roles-per-user", type=parse_range, default=(1, 20), help="每个用户的角色数范围, 如 1:20")
+    parser.add_argument("--roles-per-user-alpha", type=float, default=2.0, help="角色数分布的幂律指数")
+    parser.add_argument("--permissions-per-role", type=parse_range, default=(1, 200), help="每个角色的权限数范围")
+    parser.add_argument("--permissions-per-role-alpha", type=float, default=1.5, help="权限数分布的幂律指数")
+    parser.add_argument("--role-skew", type=float, default=1.0, help="角色热度的幂律指数, 0 为均匀")
+    parser.add_argument("--permission-skew", type=float, default=1.0, help="权限热度的幂律指数, 0 为均匀")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--password", default="password", help="所有用户的密码, 只做一次 bcrypt")
+    parser.add_argument("--batch-size", type=int, default=50_000, help="每次 COPY 的用户数")
+    parser.add_argument("--facts", default="dataset_facts.json", help="事实清单的输出路径")
+    parser.add_argument("--fact-users", type=int, default=1_000, help="事实清单中抽样的用户数")
+    parser.add_argument("--checks-per-user", type=int, default=5, help="每个抽样用户的正例和反例各多少条")
+    parser.add_argument("--schema", help="在独立的 schema 中重新建表后导入")
+    parser.add_argument("--replace", action="store_true", help="先删除该租户的现有数据")
+    args = parser.parse_args()
+    if args.roles_per_user[1] > args.roles or args.permissions_per_role[1] > args.permissions:
+        parser.error("角色数/权限数范围的上限不能超过角色总数/权限总数")
+    sys.exit(asyncio.run(run(args)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""
+按清单同步角色、权限和授权
+
+同步: python -m commands.rbac_manifest rbac.yaml [--tenant 1] [--dry-run] [--details]
+      .yaml/.yml 按 YAML 解析(需要 pyyaml), 其他按 JSON 解析
+      清单有误时以状态码 2 退出, 不写入任何变更
+"""
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+
+import orjson
+from fastapi import HTTPException
+
+from persist.tenant import DEFAULT_TENANT_ID, tenant_scope
+from services import ServiceContainer
+from services.manifest_service import parse_manifest
+
+
+async def run(args) -> int:
+    path = Path(args.manifest)
+    container = ServiceContainer()
+    try:
+        manifest = parse_manifest(path.read_bytes(), "yaml" if path.suffix in (".yaml", ".yml") else "json")
+        with tenant_scope(args.tenant):
+            result = await container.manifest_service().sync(
+                manifest, dry_run=args.dry_run, details=args.details or None
+            )
+    except HTTPException as e:
+        print(orjson.dumps({"error": e.detail}, option=orjson.OPT_INDENT_2).decode(), file=sys.stderr)
+        return 2
+    finally:
+        await container.persist_container.pg_client().dispose()
+    print(orjson.dumps(result, option=orjson.OPT_INDENT_2).decode())
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="按清单同步角色、权限和授权")
+    parser.add_argument("manifest", help="清单文件路径")
+    parser.add_argument("--tenant", type=int, default=DEFAULT_TENANT_ID, help="目标租户ID")
+    parser.add_argument("--dry-run", action="store_true", help="只输出将要执行的变更")
+    parser.add_argument("--details", action="store_true", help="输出每一项变更, dry-run 时默认输出")
+    sys.exit(asyncio.run(run(parser.parse_args())))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,56 +1,214 @@
-from contextlib import asynccontextmanager
-import os
-
-from fastapi import FastAPI
-from routers import routers
-from services import ServiceContainer
-
-# 导入中间件
-from middleware import (
-    AuthMiddleware,
-    LoggingMiddleware,
-    CORSMiddleware,
-    ErrorHandlerMiddleware
-)
-
-container = ServiceContainer()
-container.wire([*routers])
-api_prefix = os.getenv("API_PREFIX", "/api/v1")
+from utils.startup_profiler import startup_profiler
 
+with startup_profiler.phase("import:stdlib"):
+    import asyncio
+    from contextlib import asynccontextmanager
+    import logging
+    import os
+    import sys
 
-@asynccontextmanager
-async def lifespan(app: FastAPI):
-    yield
+with startup_profiler.phase("import:fastapi"):
+    from fastapi import FastAPI
+    from fastapi.responses import ORJSONResponse
 
-app = FastAPI(title='rpac', lifespan=lifespan)
+with startup_profiler.phase("import:persist"):
+    from persist import POOL_WARMUP_SIZE, REPLICA_CHECK_INTERVAL
+    from persist.pool import dispose_pool, warm_up_pool
 
-# 添加中间件（注意顺序：后添加的先执行）
-# 执行顺序: CORS -> ErrorHandler -> Logging -> Auth -> 路由处理
+with startup_profiler.phase("import:services"):
+    from services import (
+        AUTHZ_GRAPH_REFRESH_INTERVAL,
+        AUTHZ_SOCKET_MODE,
+        AUTHZ_SOCKET_PATH,
+        SERVICE_PREBIND,
+        ServiceContainer,
+    )
+    from services.registry import registry
 
-# 1. 身份验证中间件（最后执行，除了路由处理）
-app.add_middleware(
-    AuthMiddleware,
-    token_service=container.token_service()  # 注入TokenService
-)
+with startup_profiler.phase("import:routers"):
+    from routers import routers
 
-# 2. 请求日志中间件
-app.add_middleware(LoggingMiddleware)
+with startup_profiler.phase("import:middleware"):
+    # 导入中间件
+    from middleware import (
+        AuthMiddleware,
+        LoggingMiddleware,
+        CORSMiddleware,
+        ErrorHandlerMiddleware,
+        create_error_sampler,
+        AdmissionMiddleware,
+        create_admission_controller,
+        PublicPathTrie,
+        public,
+        TracingMiddleware,
+        IdempotencyMiddleware,
+        create_idempotency_store
+    )
+    from utils.request_profiler import create_request_profiler
+    from utils.tracing import TRACING_FLUSH_INTERVAL, instrument_engine, instrument_routes, tracer
 
-# 3. 错误处理中间件
-app.add_middleware(ErrorHandlerMiddleware)
+# 启动耗时预算(毫秒), --profile-startup 超出预算时以非零状态码退出, 可用于 CI 回归检查
+STARTUP_BUDGET_MS = float(os.getenv("STARTUP_BUDGET_MS", "3000"))
 
-# 4. CORS中间件（最先执行）
-app.add_middleware(CORSMiddleware)
+with startup_profiler.phase("container"):
+    container = ServiceContainer()
+    # 路由通过 registry 取用服务; 应用启动前按需从容器解析, 启动时再一次性解析为实例属性
+    registry.bind(container, resolve=False)
+api_prefix = os.getenv("API_PREFIX", "/api/v1")
+logger = logging.getLogger("Lifespan")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 启动时解析全部服务单例, 请求中不再解析依赖; 在此之前对容器的 override 都会生效
+    registry.bind(container, resolve=SERVICE_PREBIND)
+    # 启动时预热连接池, 避免首批请求承担建连开销
+    engines = [container.persist_container.pg_client(), *container.persist_container.replica_engines()]
+    for engine in engines:
+        instrument_engine(engine)
+        await warm_up_pool(engine, POOL_WARMUP_SIZE)
+    # 启用追踪时后台批量导出 span
+    span_export = asyncio.create_task(tracer.run_export(TRACING_FLUSH_INTERVAL)) if tracer else None
+    # 按窗口周期输出被抑制的错误汇总, 错误停止后最后一个窗口的汇总也能输出
+    error_summaries = asyncio.create_task(error_sampler.run_flush())
+    # 有只读副本时后台检查副本健康状态
+    replica_router = container.persist_container.router()
+    health_check = None
+    if replica_router.replicas:
+        health_check = asyncio.create_task(replica_router.run_health_checks(REPLICA_CHECK_INTERVAL))
+    # 加载内存权限图, 供批量权限检查使用; 有快照时从快照恢复并追赶变更, 加载失败时由后台刷新任务重试
+    permission_graph = container.permission_graph()
+    try:
+        await permission_graph.warm_start()
+    except Exception as e:
+        logger.warning(f"权限图加载失败: {e}")
+    graph_refresh = asyncio.create_task(permission_graph.run_refresh(AUTHZ_GRAPH_REFRESH_INTERVAL))
+    # 同进程部署的服务通过 Unix 套接字检查权限, 绕过 HTTP 和中间件
+    socket_server = None
+    if AUTHZ_SOCKET_PATH:
+        from authz_socket import AuthzSocketServer
+        socket_server = AuthzSocketServer(container.authz_service(), AUTHZ_SOCKET_PATH, mode=AUTHZ_SOCKET_MODE)
+        await socket_server.start()
+    yield
+    if socket_server:
+        await socket_server.close()
+    if health_check:
+        health_check.cancel()
+    graph_refresh.cancel()
+    error_summaries.cancel()
+    error_sampler.flush_summaries(close_all=True)
+    # 关闭时写入快照, 下次启动(或同一存储上的新实例)只需追赶之后的变更
+    try:
+        await permission_graph.save_snapshot()
+    except Exception as e:
+        logger.warning(f"权限图快照写入失败: {e}")
+    if span_export:
+        span_export.cancel()
+        await tracer.flush()
+    # 关闭时释放所有数据库连接
+    for engine in engines:
+        await dispose_pool(engine)
 
 
-@app.get("/")
 async def root():
     return {"message": "Hello World"}
 
-@app.get("/health")
+
 async def health_check():
     """健康检查端点，不需要认证"""
     return {"status": "healthy", "service": "fastapi-rpac"}
 
-for r in routers:
-    app.include_router(r.router, prefix=api_prefix)
\ No newline at end of file
+
+async def metrics():
+    """准入控制、数据库连接池、bcrypt 线程池、查询合并、实体缓存和幂等存储的运行指标"""
+    return {
+        **admission_controller.metrics(),
+        "single_flight": container.persist_container.router().single_flight.stats(),
+        "entity_cache": container.persist_container.entity_cache().stats(),
+        "permission_graph": container.permission_graph().stats(),
+        "idempotency": idempotency_store.stats(),
+        **({"request_profiler": request_profiler.stats()} if request_profiler else {}),
+        **({"tracing": tracer.stats()} if tracer else {}),
+    }
+
+
+with startup_profiler.phase("app"):
+    app = FastAPI(title='rpac', lifespan=lifespan, default_response_class=ORJSONResponse)
+
+with startup_profiler.phase("middleware"):
+    # 公开路径前缀树, 在路由注册完成后编译
+    public_paths = PublicPathTrie()
+
+    # 准入控制器, 由中间件和 /metrics 共享
+    admission_controller = create_admission_controller(
+        pool_stats=lambda: container.persist_container.pg_client().pool.stats()
+    )
+
+    # 幂等响应存储, 由中间件和 /metrics 共享
+    idempotency_store = create_idempotency_store()
+
+    # 错误日志采样器, 由中间件和后台汇总任务共享
+    error_sampler = create_error_sampler()
+
+    # 按需请求剖析器, 未配置 REQUEST_PROFILE_SECRET 时为 None
+    request_profiler = create_request_profiler()
+
+    # 添加中间件（注意顺序：后添加的先执行）
+    # 执行顺序: Tracing -> CORS -> Admission -> ErrorHandler -> Logging -> Auth -> Idempotency -> 路由处理
+
+    # 1. 幂等中间件（最后执行, 此时已确定租户和用户, 幂等键按二者隔离）
+    app.add_middleware(IdempotencyMiddleware, store=idempotency_store)
+
+    # 2. 身份验证中间件
+    app.add_middleware(
+        AuthMiddleware,
+        token_service=container.token_service(),  # 注入TokenService
+        public_paths=public_paths,
+        profiler=request_profiler
+    )
+
+    # 3. 请求日志中间件
+    app.add_middleware(LoggingMiddleware)
+
+    # 4. 错误处理中间件
+    app.add_middleware(ErrorHandlerMiddleware, error_sampler=error_sampler)
+
+    # 5. 准入控制中间件, 过载时尽早拒绝请求
+    # 在认证之前执行, 只有令牌签名校验通过的请求才获得较高优先级
+    app.add_middleware(
+        AdmissionMiddleware,
+        controller=admission_controller,
+        token_service=container.token_service(),
+        public_paths=public_paths
+    )
+
+    # 6. CORS中间件（最先执行）
+    app.add_middleware(CORSMiddleware)
+
+    # 7. 追踪中间件, 启用追踪(TRACING_EXPORTER)时为每个请求创建根 span
+    if tracer:
+        app.add_middleware(TracingMiddleware, tracer=tracer)
+
+with startup_profiler.phase("routes"):
+    app.get("/")(public(root))
+    app.get("/health")(public(health_check))
+    # 指标暴露连接池、缓存等内部状态, 需要认证
+    app.get("/metrics")(metrics)
+
+    for r in routers:
+        app.include_router(r.router, prefix=api_prefix)
+
+    # 按实际挂载的完整路径编译公开路径
+    public_paths.compile(app)
+
+    # 启用追踪时为每个路由处理函数创建 span
+    instrument_routes(app)
+
+
+if __name__ == "__main__":
+    # python main.py --profile-startup 输出启动各阶段耗时
+    if "--profile-startup" in sys.argv:
+        print(startup_profiler.report())
+        if startup_profiler.total() * 1000 > STARTUP_BUDGET_MS:
+            print(f"启动耗时超出预算 {STARTUP_BUDGET_MS}ms")
+            sys.exit(1)
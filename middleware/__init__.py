@@ -2,10 +2,26 @@ from .auth_middleware import AuthMiddleware
 from .logging_middleware import LoggingMiddleware
 from .cors_middleware import CORSMiddleware
 from .error_middleware import ErrorHandlerMiddleware
+from .error_sampler import ErrorLogSampler, create_error_sampler
+from .admission_middleware import AdmissionController, AdmissionMiddleware, create_admission_controller
+from .public_routes import PublicPathTrie, public
+from .tracing_middleware import TracingMiddleware
+from .idempotency_middleware import IdempotencyMiddleware, IdempotencyStore, create_idempotency_store
 
 __all__ = [
     "AuthMiddleware",
     "LoggingMiddleware", 
     "CORSMiddleware",
-    "ErrorHandlerMiddleware"
+    "ErrorHandlerMiddleware",
+    "ErrorLogSampler",
+    "create_error_sampler",
+    "AdmissionController",
+    "AdmissionMiddleware",
+    "create_admission_controller",
+    "PublicPathTrie",
+    "public",
+    "TracingMiddleware",
+    "IdempotencyMiddleware",
+    "IdempotencyStore",
+    "create_idempotency_store"
 ] 
\ No newline at end of file
@@ -0,0 +1,243 @@
+import asyncio
+import os
+import time
+from typing import Callable, Optional
+
+from fastapi import HTTPException, Request, Response
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from middleware.auth_middleware import extract_token
+from middleware.public_routes import PublicPathTrie
+from services.token_service import TokenService
+from utils.bcrypt import hash_pool_stats
+from utils.tracing import traced_class
+
+
+# 请求优先级, 数值越小越重要
+PRIORITY_CRITICAL = 0  # 健康检查
+PRIORITY_HIGH = 1  # 令牌校验通过的读请求
+PRIORITY_NORMAL = 2  # 令牌校验通过的写请求
+PRIORITY_LOW = 3  # 公开接口(包括登录/注册等 bcrypt 密集型请求)和令牌无效的请求
+
+
+class AdmissionController:
+    """
+    准入控制器
+    用并发槽位限制同时处理的请求数, 按 CoDel 思路观察请求在槽位前的排队时间:
+    排队时间持续超过 target 达一个 interval 即判定过载; 数据库连接池等待时间
+    或 bcrypt 线程池排队超过阈值同样视为过载. 过载时优先丢弃低优先级请求
+    """
+
+    def __init__(
+        self,
+        max_in_flight: int = 64,
+        max_queue: int = 256,
+        target: float = 0.05,
+        interval: float = 0.5,
+        queue_timeout: float = 5.0,
+        pool_wait_target: float = 0.1,
+        hash_queue_limit: int = 16,
+        pool_stats: Optional[Callable[[], dict]] = None,
+        retry_after: int = 1,
+    ):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.target = target
+        self.interval = interval
+        self.queue_timeout = queue_timeout
+        self.pool_wait_target = pool_wait_target
+        self.hash_queue_limit = hash_queue_limit
+        self.pool_stats = pool_stats
+        self.retry_after = str(retry_after)
+
+        self._slots = asyncio.Semaphore(max_in_flight)
+        self.in_flight = 0
+        self.queued = 0
+        self.queue_delay = 0.0  # 最近一次的排队时间
+        self._first_above_time = 0.0
+        self.dropping = False  # CoDel 判定的过载状态
+        self.admitted = 0
+        self.shed = [0, 0, 0, 0]  # 按优先级统计被丢弃的请求数
+        self.queue_timeouts = 0  # 等待槽位超时的请求数
+
+    def classify(self, request: Request, critical_paths: frozenset, verified: bool) -> int:
+        """
+        verified 表示请求携带的令牌已通过签名校验; 只看是否带有 Authorization 头会被任意客户端伪造
+        """
+        if request.url.path in critical_paths:
+            return PRIORITY_CRITICAL
+        if not verified:
+            return PRIORITY_LOW
+        if request.method in ("GET", "HEAD"):
+            return PRIORITY_HIGH
+        return PRIORITY_NORMAL
+
+    def _record_queue_delay(self, delay: float):
+        """
+        CoDel: 排队时间低于 target 时退出过载状态; 持续高于 target 超过 interval 时进入过载状态
+        """
+        now = time.monotonic()
+        self.queue_delay = delay
+        if delay < self.target:
+            self._first_above_time = 0.0
+            self.dropping = False
+        elif not self._first_above_time:
+            self._first_above_time = now + self.interval
+        elif now >= self._first_above_time:
+            self.dropping = True
+
+    def _resources_saturated(self) -> bool:
+        if hash_pool_stats()["queued"] > self.hash_queue_limit:
+            return True
+        if self.pool_stats is not None:
+            try:
+                pool = self.pool_stats()
+            except Exception:
+                return False
+            # 平均等待只反映过去; 还要当前有请求在等待连接, 池空闲下来后立即停止丢弃
+            return pool.get("waiting", 0) > 0 and pool.get("wait_ewma_ms", 0) / 1000 > self.pool_wait_target
+        return False
+
+    def should_shed(self, priority: int) -> bool:
+        """
+        过载时丢弃低优先级请求; 排队过长时丢弃除高优先级以外的所有请求
+        """
+        if priority <= PRIORITY_HIGH:
+            return False
+        if self.queued >= self.max_queue:
+            return True
+        if self.dropping and not self.queued and self.in_flight < self.max_in_flight:
+            # 有空闲槽位且无人排队, 说明拥塞已经消退
+            self.dropping = False
+            self._first_above_time = 0.0
+        overloaded = self.dropping or self._resources_saturated()
+        return overloaded and priority >= PRIORITY_LOW
+
+    async def acquire(self) -> bool:
+        self.queued += 1
+        start = time.monotonic()
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            self.queued -= 1
+        self._record_queue_delay(time.monotonic() - start)
+        self.in_flight += 1
+        return True
+
+    def release(self):
+        self.in_flight -= 1
+        self._slots.release()
+
+    def metrics(self) -> dict:
+        metrics = {
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "max_in_flight": self.max_in_flight,
+            "queue_delay_ms": round(self.queue_delay * 1000, 3),
+            "dropping": self.dropping,
+            "admitted": self.admitted,
+            "shed": {
+                "normal": self.shed[PRIORITY_NORMAL],
+                "low": self.shed[PRIORITY_LOW],
+                "queue_timeout": self.queue_timeouts,
+            },
+            "hash_pool": hash_pool_stats(),
+        }
+        if self.pool_stats is not None:
+            try:
+                metrics["db_pool"] = self.pool_stats()
+            except Exception:
+                pass
+        return metrics
+
+
+def create_admission_controller(pool_stats: Optional[Callable[[], dict]] = None) -> AdmissionController:
+    """
+    从环境变量创建准入控制器
+    """
+    return AdmissionController(
+        max_in_flight=int(os.getenv("ADMISSION_MAX_IN_FLIGHT", "64")),
+        max_queue=int(os.getenv("ADMISSION_MAX_QUEUE", "256")),
+        target=float(os.getenv("ADMISSION_TARGET_DELAY_MS", "50")) / 1000,
+        interval=float(os.getenv("ADMISSION_INTERVAL_MS", "500")) / 1000,
+        queue_timeout=float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "5")),
+        pool_wait_target=float(os.getenv("ADMISSION_POOL_WAIT_TARGET_MS", "100")) / 1000,
+        hash_queue_limit=int(os.getenv("ADMISSION_HASH_QUEUE_LIMIT", "16")),
+        pool_stats=pool_stats,
+        retry_after=int(os.getenv("ADMISSION_RETRY_AFTER", "1")),
+    )
+
+
+@traced_class
+class AdmissionMiddleware(BaseHTTPMiddleware):
+    """
+    异步准入控制中间件
+    过载时以 503 + Retry-After 提前拒绝低优先级请求, 健康检查和已认证的读请求始终放行
+    优先级在校验令牌签名之后确定, 校验结果保存在 request.state 中供 AuthMiddleware 复用
+    """
+
+    def __init__(
+        self,
+        app,
+        controller: AdmissionController = None,
+        token_service: TokenService = None,
+        public_paths: PublicPathTrie = None,
+    ):
+        super().__init__(app)
+        self.controller = controller or create_admission_controller()
+        self.token_service = token_service
+        self.public_paths = public_paths
+        # 不受准入控制的路径
+        self.critical_paths = frozenset({"/health"})
+
+    def _verified(self, request: Request) -> bool:
+        """
+        公开接口一律按未认证处理; 其余请求校验令牌签名和有效期
+        """
+        if self.token_service is None:
+            return False
+        if self.public_paths is not None and self.public_paths.compiled and \
+                self.public_paths.match(request.method, request.url.path):
+            return False
+        token = extract_token(request)
+        if not token:
+            return False
+        try:
+            request.state.token_payload = self.token_service.verify_token(token)
+        except HTTPException:
+            return False
+        return True
+
+    async def dispatch(self, request: Request, call_next) -> Response:
+        """
+        异步处理请求, 根据优先级和负载决定是否放行
+        """
+        controller = self.controller
+        priority = controller.classify(request, self.critical_paths, self._verified(request))
+        if priority == PRIORITY_CRITICAL:
+            return await call_next(request)
+
+        if controller.should_shed(priority):
+            controller.shed[priority] += 1
+            return self._overloaded_response()
+
+        if not await controller.acquire():
+            # 等待槽位超时
+            controller.queue_timeouts += 1
+            return self._overloaded_response()
+
+        controller.admitted += 1
+        try:
+            return await call_next(request)
+        finally:
+            controller.release()
+
+    def _overloaded_response(self) -> Response:
+        return Response(
+            content='{"detail": "服务繁忙, 请稍后重试"}',
+            status_code=503,
+            media_type="application/json",
+            headers={"Retry-After": self.controller.retry_after},
+        )
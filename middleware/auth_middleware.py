@@ -4,49 +4,86 @@ from fastapi import Request, Response, HTTPException
 from fastapi.security import HTTPBearer
 from starlette.middleware.base import BaseHTTPMiddleware
 
+from middleware.public_routes import PublicPathTrie
+from persist.tenant import DEFAULT_TENANT_ID, TENANT_HEADER, parse_tenant_id, reset_tenant_id, set_tenant_id
 from services.token_service import TokenService
+from utils.request_profiler import RequestProfiler
+from utils.tracing import traced_class
 
 
+def extract_token(request: Request) -> Optional[str]:
+    """
+    从请求中提取JWT令牌
+    支持Authorization头和查询参数
+    """
+    # 从Authorization头提取
+    authorization = request.headers.get("Authorization")
+    if authorization and authorization.startswith("Bearer "):
+        return authorization.split(" ")[1]
+
+    # 从查询参数提取（备用方案）
+    return request.query_params.get("token") or None
+
+
+@traced_class
 class AuthMiddleware(BaseHTTPMiddleware):
     """
     异步身份验证中间件
     验证JWT令牌并将用户信息注入到请求上下文中
+    同时确定请求所属的租户: 认证请求以令牌中的 tid 为准, 公开接口使用 X-Tenant-ID 请求头
+    配置了剖析器时, 携带 X-Profile 请求头的请求在租户上下文确定后交由剖析器执行
     """
     
-    def __init__(self, app, token_service: TokenService = None):
+    def __init__(
+        self,
+        app,
+        token_service: TokenService = None,
+        public_paths: PublicPathTrie = None,
+        profiler: Optional[RequestProfiler] = None,
+    ):
         super().__init__(app)
         self.token_service = token_service or TokenService(
             secret_key=os.getenv("SECRET_KEY", "97548834e9fe67fc52c597958581362fdd0b53a6abeda7965f698627599552b6")
         )
         self.security = HTTPBearer(auto_error=False)
         
-        # 不需要认证的路径
-        self.public_paths = {
-            "/",
-            "/docs",
-            "/openapi.json",
-            "/redoc",
-            "/api/v1/users/login",
-            "/api/v1/users/register"
-        }
+        # 不需要认证的路径, 由路由上的 @public 标记在启动时编译而成
+        self.public_paths = public_paths or PublicPathTrie()
+        self.profiler = profiler
     
     async def dispatch(self, request: Request, call_next) -> Response:
         """
         异步处理请求，验证身份并注入用户信息
         """
         # 检查是否为公开路径
-        if self._is_public_path(request.url.path):
-            return await call_next(request)
+        if self._is_public_path(request):
+            try:
+                tenant_id = parse_tenant_id(request.headers.get(TENANT_HEADER, DEFAULT_TENANT_ID))
+            except ValueError:
+                return Response(
+                    content='{"detail": "无效的租户ID"}',
+                    status_code=400,
+                    media_type="application/json"
+                )
+            return await self._call_in_tenant(request, call_next, tenant_id)
         
         # 提取并验证令牌
         token = self._extract_token(request)
         if token:
             try:
-                # 验证令牌并获取用户信息
-                payload = self.token_service.verify_token(token)
+                # 验证令牌并获取用户信息, 准入控制已校验过的直接复用
+                payload = getattr(request.state, "token_payload", None) or self.token_service.verify_token(token)
                 # 将用户ID注入到请求状态中
                 request.state.user_id = payload.get("sub")
                 request.state.authenticated = True
+                # 租户只来自签名过的令牌, 客户端无法通过请求头切换
+                tenant_id = parse_tenant_id(payload.get("tid", DEFAULT_TENANT_ID))
+            except (TypeError, ValueError):
+                return Response(
+                    content='{"detail": "令牌中的租户ID无效"}',
+                    status_code=401,
+                    media_type="application/json"
+                )
             except HTTPException as e:
                 # 令牌验证失败
                 request.state.user_id = None
@@ -68,34 +105,32 @@ class AuthMiddleware(BaseHTTPMiddleware):
             )
         
         # 继续处理请求
-        response = await call_next(request)
-        return response
+        return await self._call_in_tenant(request, call_next, tenant_id)
+
+    async def _call_in_tenant(self, request: Request, call_next, tenant_id: int) -> Response:
+        """
+        在租户上下文中处理请求, 下游的 DAO 和缓存通过 persist.tenant 读取
+        """
+        request.state.tenant_id = tenant_id
+        token = set_tenant_id(tenant_id)
+        try:
+            if self.profiler is not None and self.profiler.requested(request):
+                return await self.profiler.profile(request, call_next)
+            return await call_next(request)
+        finally:
+            reset_tenant_id(token)
     
-    def _is_public_path(self, path: str) -> bool:
+    def _is_public_path(self, request: Request) -> bool:
         """
         检查路径是否为公开路径（不需要认证）
         """
-        # 精确匹配
-        if path in self.public_paths:
-            return True
-        
-        # 路径前缀匹配（如静态文件）
-        public_prefixes = ["/static", "/health"]
-        return any(path.startswith(prefix) for prefix in public_prefixes)
+        if not self.public_paths.compiled:
+            # 未在启动时编译时, 从当前应用的路由表编译一次
+            self.public_paths.compile(request.app)
+        return self.public_paths.match(request.method, request.url.path)
     
     def _extract_token(self, request: Request) -> Optional[str]:
         """
         从请求中提取JWT令牌
-        支持Authorization头和查询参数
         """
-        # 从Authorization头提取
-        authorization = request.headers.get("Authorization")
-        if authorization and authorization.startswith("Bearer "):
-            return authorization.split(" ")[1]
-        
-        # 从查询参数提取（备用方案）
-        token = request.query_params.get("token")
-        if token:
-            return token
-        
-        return None 
\ No newline at end of file
+        return extract_token(request)
@@ -1,10 +1,13 @@
 import os
-from typing import List, Set
+import re
+from typing import Dict, List, Optional, Pattern, Set, Tuple
 from fastapi import Request, Response
 from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.responses import PlainTextResponse
+from utils.tracing import traced_class
 
 
+@traced_class
 class CORSMiddleware(BaseHTTPMiddleware):
     """
     异步CORS中间件
@@ -35,16 +38,39 @@ class CORSMiddleware(BaseHTTPMiddleware):
             "Content-Type",
             "Authorization",
             "X-Requested-With",
-            "X-API-Key"
+            "X-API-Key",
+            "Idempotency-Key"
         ]
         self.allow_credentials = allow_credentials
-        self.expose_headers = expose_headers or ["X-Process-Time"]
+        self.expose_headers = expose_headers or ["X-Process-Time", "Idempotent-Replayed"]
         self.max_age = max_age
         
         # 转换为集合以提高查找性能
         self.allow_origins_set: Set[str] = set(self.allow_origins)
         self.allow_methods_set: Set[str] = set(self.allow_methods)
         self.allow_headers_set: Set[str] = {header.lower() for header in self.allow_headers}
+        self.allow_all_origins = "*" in self.allow_origins_set
+
+        # 启动时把通配符来源编译为单个正则, 避免逐个模式匹配
+        self.origin_pattern: Optional[Pattern[str]] = self._compile_origin_patterns(self.allow_origins)
+
+        # 预先生成与来源无关的固定响应头
+        self.base_headers: Dict[str, str] = {}
+        if self.allow_credentials:
+            self.base_headers["Access-Control-Allow-Credentials"] = "true"
+        if self.expose_headers:
+            self.base_headers["Access-Control-Expose-Headers"] = ", ".join(self.expose_headers)
+        # 预检请求的特殊头
+        self.preflight_headers: Dict[str, str] = {
+            **self.base_headers,
+            "Access-Control-Allow-Methods": ", ".join(self.allow_methods),
+            "Access-Control-Allow-Headers": ", ".join(self.allow_headers),
+            "Access-Control-Max-Age": str(self.max_age),
+        }
+
+        # 预检响应缓存: (origin, 请求方法, 请求头) -> (状态码, 响应体, 响应头)
+        self.preflight_cache: Dict[Tuple[str, str, str], Tuple[int, str, Dict[str, str]]] = {}
+        self.preflight_cache_size = int(os.getenv("CORS_PREFLIGHT_CACHE_SIZE", "1024"))
     
     async def dispatch(self, request: Request, call_next) -> Response:
         """
@@ -66,58 +92,62 @@ class CORSMiddleware(BaseHTTPMiddleware):
     
     def _handle_preflight_request(self, request: Request, origin: str) -> Response:
         """
-        处理OPTIONS预检请求
+        处理OPTIONS预检请求, 相同来源、方法和请求头的预检结果直接复用缓存
+        """
+        key = (
+            origin or "",
+            request.headers.get("access-control-request-method") or "",
+            request.headers.get("access-control-request-headers") or "",
+        )
+        cached = self.preflight_cache.get(key)
+        if cached is None:
+            cached = self._build_preflight_response(*key)
+            if len(self.preflight_cache) >= self.preflight_cache_size:
+                # 缓存已满时淘汰最早写入的条目
+                self.preflight_cache.pop(next(iter(self.preflight_cache)))
+            self.preflight_cache[key] = cached
+
+        status_code, content, headers = cached
+        return PlainTextResponse(content, status_code=status_code, headers=headers)
+
+    def _build_preflight_response(
+        self, origin: str, request_method: str, request_headers: str
+    ) -> Tuple[int, str, Dict[str, str]]:
+        """
+        计算预检响应的状态码、响应体和响应头
         """
         # 检查来源是否被允许
         if not self._is_origin_allowed(origin):
-            return PlainTextResponse(
-                "CORS预检失败：来源不被允许",
-                status_code=403
-            )
-        
+            return 403, "CORS预检失败：来源不被允许", {}
+
         # 检查请求方法是否被允许
-        request_method = request.headers.get("access-control-request-method")
         if request_method and request_method.upper() not in self.allow_methods_set:
-            return PlainTextResponse(
-                "CORS预检失败：请求方法不被允许",
-                status_code=403
-            )
-        
+            return 403, "CORS预检失败：请求方法不被允许", {}
+
         # 检查请求头是否被允许
-        request_headers = request.headers.get("access-control-request-headers")
         if request_headers:
             headers = [h.strip().lower() for h in request_headers.split(",")]
             if not all(header in self.allow_headers_set for header in headers):
-                return PlainTextResponse(
-                    "CORS预检失败：请求头不被允许",
-                    status_code=403
-                )
-        
-        # 创建预检响应
-        response = PlainTextResponse("CORS预检成功", status_code=200)
-        self._add_cors_headers(response, origin, is_preflight=True)
-        
-        return response
-    
+                return 403, "CORS预检失败：请求头不被允许", {}
+
+        # 创建预检响应头
+        return 200, "CORS预检成功", self._cors_headers(origin, is_preflight=True)
+
     def _add_cors_headers(self, response: Response, origin: str, is_preflight: bool = False):
         """
         添加CORS响应头
         """
+        response.headers.update(self._cors_headers(origin, is_preflight))
+
+    def _cors_headers(self, origin: str, is_preflight: bool = False) -> Dict[str, str]:
+        """
+        生成CORS响应头
+        """
+        headers = dict(self.preflight_headers if is_preflight else self.base_headers)
         if self._is_origin_allowed(origin):
-            response.headers["Access-Control-Allow-Origin"] = origin
-        
-        if self.allow_credentials:
-            response.headers["Access-Control-Allow-Credentials"] = "true"
-        
-        if self.expose_headers:
-            response.headers["Access-Control-Expose-Headers"] = ", ".join(self.expose_headers)
-        
-        # 预检请求的特殊头
-        if is_preflight:
-            response.headers["Access-Control-Allow-Methods"] = ", ".join(self.allow_methods)
-            response.headers["Access-Control-Allow-Headers"] = ", ".join(self.allow_headers)
-            response.headers["Access-Control-Max-Age"] = str(self.max_age)
-    
+            headers["Access-Control-Allow-Origin"] = origin
+        return headers
+
     def _is_origin_allowed(self, origin: str) -> bool:
         """
         检查来源是否被允许
@@ -126,7 +156,7 @@ class CORSMiddleware(BaseHTTPMiddleware):
             return False
         
         # 检查通配符
-        if "*" in self.allow_origins_set:
+        if self.allow_all_origins:
             return True
         
         # 检查精确匹配
@@ -134,22 +164,18 @@ class CORSMiddleware(BaseHTTPMiddleware):
             return True
         
         # 检查模式匹配（支持子域名）
-        for allowed_origin in self.allow_origins:
-            if self._match_origin_pattern(origin, allowed_origin):
-                return True
-        
-        return False
+        return self.origin_pattern is not None and self.origin_pattern.fullmatch(origin) is not None
     
-    def _match_origin_pattern(self, origin: str, pattern: str) -> bool:
+    def _compile_origin_patterns(self, allow_origins: List[str]) -> Optional[Pattern[str]]:
         """
-        匹配来源模式，支持通配符和子域名
+        将 *.example.com 格式的来源模式编译为单个正则
+        匹配 example.com 的任意子域名, 以及 example.com 本身
         """
-        # 支持 *.example.com 格式
-        if pattern.startswith("*."):
-            domain = pattern[2:]
-            return origin.endswith(f".{domain}") or origin == domain
-        
-        return origin == pattern
+        domains = [re.escape(pattern[2:]) for pattern in allow_origins if pattern.startswith("*.")]
+        if not domains:
+            return None
+        alternatives = "|".join(domains)
+        return re.compile(rf"(?:.*\.(?:{alternatives})|(?:{alternatives}))")
     
     def _get_allowed_origins(self) -> List[str]:
         """
@@ -1,3 +1,4 @@
+import os
 import traceback
 import logging
 from typing import Dict, Any
@@ -7,20 +8,26 @@ from starlette.middleware.base import BaseHTTPMiddleware
 from sqlalchemy.exc import SQLAlchemyError
 from pydantic import ValidationError
 
+from middleware.error_sampler import ErrorLogSampler, create_error_sampler
+from utils.tracing import traced_class
+
 
 # 配置错误日志记录器
 error_logger = logging.getLogger("ErrorHandler")
 
 
+@traced_class
 class ErrorHandlerMiddleware(BaseHTTPMiddleware):
     """
     异步错误处理中间件
     统一处理应用中的异常，返回标准化的错误响应
     """
     
-    def __init__(self, app):
+    def __init__(self, app, error_sampler: ErrorLogSampler = None):
         super().__init__(app)
         self.include_details = self._should_include_details()
+        # 相同指纹的错误在窗口内只记录前几条完整日志, 避免故障期间日志风暴
+        self.error_sampler = error_sampler or create_error_sampler()
     
     async def dispatch(self, request: Request, call_next) -> Response:
         """
@@ -109,7 +116,8 @@ class ErrorHandlerMiddleware(BaseHTTPMiddleware):
         """
         处理数据库异常
         """
-        error_id = self._generate_error_id()
+        fingerprint = self.error_sampler.fingerprint(exc)
+        error_id = self._generate_error_id(fingerprint)
         
         error_data = {
             "error": {
@@ -127,11 +135,13 @@ class ErrorHandlerMiddleware(BaseHTTPMiddleware):
         if self.include_details:
             error_data["error"]["details"] = str(exc)
         
-        # 记录详细的数据库错误
-        error_logger.error(
-            f"数据库错误 [{error_id}] - {request.method} {request.url.path}: {str(exc)}\n"
-            f"Traceback: {traceback.format_exc()}"
-        )
+        # 记录详细的数据库错误, 仅对采样到的错误格式化堆栈
+        if self.error_sampler.should_log(fingerprint, error_id):
+            error_logger.error(
+                f"数据库错误 [{error_id}] - {request.method} {request.url.path}: {str(exc)}\n"
+                f"Traceback: {traceback.format_exc()}"
+            )
+        self.error_sampler.flush_summaries()
         
         return JSONResponse(
             status_code=500,
@@ -142,7 +152,8 @@ class ErrorHandlerMiddleware(BaseHTTPMiddleware):
         """
         处理一般异常
         """
-        error_id = self._generate_error_id()
+        fingerprint = self.error_sampler.fingerprint(exc)
+        error_id = self._generate_error_id(fingerprint)
         
         error_data = {
             "error": {
@@ -161,12 +172,14 @@ class ErrorHandlerMiddleware(BaseHTTPMiddleware):
             error_data["error"]["details"] = str(exc)
             error_data["error"]["exception_type"] = type(exc).__name__
         
-        # 记录详细的异常信息
-        error_logger.error(
-            f"未处理异常 [{error_id}] - {request.method} {request.url.path}: {str(exc)}\n"
-            f"异常类型: {type(exc).__name__}\n"
-            f"Traceback: {traceback.format_exc()}"
-        )
+        # 记录详细的异常信息, 仅对采样到的错误格式化堆栈
+        if self.error_sampler.should_log(fingerprint, error_id):
+            error_logger.error(
+                f"未处理异常 [{error_id}] - {request.method} {request.url.path}: {str(exc)}\n"
+                f"异常类型: {type(exc).__name__}\n"
+                f"Traceback: {traceback.format_exc()}"
+            )
+        self.error_sampler.flush_summaries()
         
         return JSONResponse(
             status_code=500,
@@ -180,12 +193,13 @@ class ErrorHandlerMiddleware(BaseHTTPMiddleware):
         import time
         return time.strftime("%Y-%m-%d %H:%M:%S")
     
-    def _generate_error_id(self) -> str:
+    def _generate_error_id(self, fingerprint: str) -> str:
         """
         生成唯一的错误ID用于追踪
+        以错误指纹为前缀, 未记录完整日志的错误可通过前缀关联到同指纹的采样日志
         """
         import uuid
-        return str(uuid.uuid4())[:8]
+        return f"{fingerprint}-{str(uuid.uuid4())[:8]}"
     
     def _should_include_details(self) -> bool:
         """
@@ -0,0 +1,147 @@
+import asyncio
+import hashlib
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+logger = logging.getLogger("ErrorHandler")
+
+# 项目根目录, 指纹取该目录下(不含第三方包)最内层的栈帧
+PROJECT_ROOT = str(Path(__file__).resolve().parent.parent) + os.sep
+
+
+class _FingerprintState:
+    __slots__ = ("window_start", "logged", "suppressed", "last_error_id")
+
+    def __init__(self, now: float):
+        self.window_start = now
+        self.logged = 0
+        self.suppressed = 0
+        self.last_error_id = ""
+
+
+class ErrorLogSampler:
+    """
+    错误日志采样器
+    以 异常类型 + 抛出位置 作为指纹, 每个指纹在一个时间窗口内最多记录 burst 条完整日志,
+    其余只计数, 窗口结束后汇总为一条 "另有 N 次" 日志
+    汇总由 run_flush 后台任务按窗口周期输出, 不依赖之后是否还有新的错误
+    """
+
+    def __init__(self, burst: int = 5, window: float = 60.0, max_fingerprints: int = 1024):
+        self.burst = burst
+        self.window = window
+        self.max_fingerprints = max_fingerprints
+        self._states: Dict[str, _FingerprintState] = {}
+        # (异常类型, 代码对象, 行号) -> 指纹, 避免重复计算哈希
+        self._fingerprints: Dict[tuple, str] = {}
+        # 已结束但尚未输出的窗口汇总
+        self._pending: List[Tuple[str, int, str]] = []
+        self._next_sweep = time.monotonic() + window
+
+    @staticmethod
+    def _in_project(filename: str) -> bool:
+        return filename.startswith(PROJECT_ROOT) and f"{os.sep}site-packages{os.sep}" not in filename
+
+    def fingerprint(self, exc: BaseException) -> str:
+        """
+        计算异常指纹: 异常类型与抛出位置的短哈希
+        抛出位置取项目代码中最内层的栈帧, 同一处调用在库内部不同位置出错时归为同一指纹; 没有项目栈帧时取最内层
+        """
+        tb = exc.__traceback__
+        innermost = project = None
+        while tb is not None:
+            innermost = tb
+            if self._in_project(tb.tb_frame.f_code.co_filename):
+                project = tb
+            tb = tb.tb_next
+        site = project or innermost
+        if site is None:
+            key = (type(exc), None, 0)
+        else:
+            key = (type(exc), site.tb_frame.f_code, site.tb_lineno)
+        fingerprint = self._fingerprints.get(key)
+        if fingerprint is None:
+            code = key[1]
+            site = f"{code.co_filename}:{code.co_name}:{key[2]}" if code else ""
+            raw = f"{type(exc).__module__}.{type(exc).__qualname__}@{site}"
+            fingerprint = hashlib.blake2s(raw.encode(), digest_size=3).hexdigest()
+            if len(self._fingerprints) >= self.max_fingerprints:
+                self._fingerprints.pop(next(iter(self._fingerprints)))
+            self._fingerprints[key] = fingerprint
+        return fingerprint
+
+    def _close_window(self, fingerprint: str, state: _FingerprintState, now: float):
+        """
+        结束指纹的当前窗口, 有被抑制的错误时留下汇总
+        """
+        if state.suppressed:
+            self._pending.append((fingerprint, state.suppressed, state.last_error_id))
+        state.window_start = now
+        state.logged = 0
+        state.suppressed = 0
+
+    def should_log(self, fingerprint: str, error_id: str) -> bool:
+        """
+        判断该错误是否需要记录完整日志, 不记录的只计入汇总
+        """
+        now = time.monotonic()
+        state = self._states.get(fingerprint)
+        if state is None:
+            if len(self._states) >= self.max_fingerprints:
+                evicted = next(iter(self._states))
+                self._close_window(evicted, self._states.pop(evicted), now)
+            state = self._states[fingerprint] = _FingerprintState(now)
+        elif now - state.window_start >= self.window:
+            self._close_window(fingerprint, state, now)
+
+        if state.logged < self.burst:
+            state.logged += 1
+            return True
+        state.suppressed += 1
+        state.last_error_id = error_id
+        return False
+
+    def collect_summaries(self, close_all: bool = False) -> List[Tuple[str, int, str]]:
+        """
+        收集已结束窗口中被抑制的错误汇总: (指纹, 次数, 最后一次的错误ID)
+        最多每个窗口扫描一次全部指纹, 其间结束的窗口随下一次调用返回; close_all 时立即结束所有窗口(关闭时使用)
+        """
+        now = time.monotonic()
+        if close_all or now >= self._next_sweep:
+            self._next_sweep = now + self.window
+            for fingerprint, state in self._states.items():
+                if close_all or now - state.window_start >= self.window:
+                    self._close_window(fingerprint, state, now)
+        summaries, self._pending = self._pending, []
+        return summaries
+
+    def flush_summaries(self, close_all: bool = False):
+        """
+        输出已结束窗口的错误汇总; close_all 时连同未结束的窗口一起输出, 进程退出时不丢失计数
+        """
+        for fingerprint, count, last_error_id in self.collect_summaries(close_all):
+            logger.error(
+                f"错误 [{fingerprint}] 在过去 {self.window:g}s 内另有 {count} 次未记录详细日志, "
+                f"最后一次错误ID: {last_error_id}"
+            )
+
+    async def run_flush(self):
+        """
+        周期性输出错误汇总, 在 lifespan 中作为后台任务运行
+        """
+        while True:
+            await asyncio.sleep(self.window)
+            self.flush_summaries()
+
+
+def create_error_sampler() -> ErrorLogSampler:
+    """
+    从环境变量创建错误日志采样器
+    """
+    return ErrorLogSampler(
+        burst=int(os.getenv("ERROR_LOG_BURST", "5")),
+        window=float(os.getenv("ERROR_LOG_WINDOW", "60")),
+    )
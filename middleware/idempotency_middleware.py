@@ -0,0 +1,168 @@
+import asyncio
+import hashlib
+import os
+from typing import Dict, Tuple
+
+from fastapi import Request, Response
+from fastapi.responses import ORJSONResponse
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from persist.cache import MISS, LRUTTLCache
+from utils.client_ip import get_client_ip
+from utils.tracing import traced_class
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+WRITE_METHODS = frozenset({"POST", "PUT", "PATCH", "DELETE"})
+MAX_KEY_LENGTH = 255
+
+
+class CachedResponse:
+    __slots__ = ("status_code", "raw_headers", "body")
+
+    def __init__(self, status_code: int, raw_headers: list, body: bytes):
+        self.status_code = status_code
+        self.raw_headers = raw_headers
+        self.body = body
+
+    def to_response(self, replayed: bool) -> Response:
+        response = Response(self.body, status_code=self.status_code)
+        response.raw_headers = list(self.raw_headers)
+        if replayed:
+            response.headers[REPLAYED_HEADER] = "true"
+        return response
+
+
+class IdempotencyStore:
+    """
+    进程内幂等响应存储
+    已完成的响应放在容量有界的 LRU + TTL 缓存中; 执行中的请求以 Future 登记, 并发的重复请求等待它的结果
+    多 worker 部署时每个进程各自去重, 同一客户端的重试通常落在同一连接上
+    """
+
+    def __init__(self, max_keys: int = 10000, ttl: float = 86400.0, max_body: int = 65536, wait_timeout: float = 30.0):
+        self.max_body = max_body
+        self.wait_timeout = wait_timeout
+        # 键 -> (请求指纹, 响应)
+        self.completed = LRUTTLCache(max_keys, ttl)
+        self.in_flight: Dict[str, Tuple[bytes, asyncio.Future]] = {}
+        self.stored = 0
+        self.replayed = 0
+        self.waited = 0
+        self.mismatched = 0
+
+    def cacheable(self, status_code: int, body: bytes) -> bool:
+        """
+        5xx 和 429 是暂时性的失败, 重试应当重新执行
+        """
+        return status_code < 500 and status_code != 429 and len(body) <= self.max_body
+
+    def stats(self) -> dict:
+        return {
+            "keys": len(self.completed),
+            "in_flight": len(self.in_flight),
+            "stored": self.stored,
+            "replayed": self.replayed,
+            "waited": self.waited,
+            "mismatched": self.mismatched,
+        }
+
+
+def create_idempotency_store() -> IdempotencyStore:
+    """
+    从环境变量创建幂等响应存储
+    """
+    return IdempotencyStore(
+        max_keys=int(os.getenv("IDEMPOTENCY_MAX_KEYS", "10000")),
+        ttl=float(os.getenv("IDEMPOTENCY_TTL", "86400")),
+        max_body=int(os.getenv("IDEMPOTENCY_MAX_BODY", "65536")),
+        wait_timeout=float(os.getenv("IDEMPOTENCY_WAIT_TIMEOUT", "30")),
+    )
+
+
+@traced_class
+class IdempotencyMiddleware(BaseHTTPMiddleware):
+    """
+    异步幂等中间件
+    携带 Idempotency-Key 的写请求只执行一次: 首次的响应按 (租户, 用户或客户端IP, 键) 保存,
+    之后的重试直接重放(响应头 Idempotent-Replayed: true); 原请求仍在执行时, 重复请求等待其结果而不是再次执行
+    同一个键用于不同的请求(方法、路径或请求体不同)时返回 422
+    位于身份验证中间件之后, 以便按租户和用户隔离
+    """
+
+    def __init__(self, app, store: IdempotencyStore = None):
+        super().__init__(app)
+        self.store = store or create_idempotency_store()
+
+    async def dispatch(self, request: Request, call_next) -> Response:
+        """
+        异步处理请求，对携带幂等键的写请求去重
+        """
+        idempotency_key = request.headers.get(IDEMPOTENCY_HEADER)
+        if idempotency_key is None or request.method not in WRITE_METHODS:
+            return await call_next(request)
+        if not idempotency_key or len(idempotency_key) > MAX_KEY_LENGTH:
+            return ORJSONResponse({"detail": f"{IDEMPOTENCY_HEADER} 长度应为 1~{MAX_KEY_LENGTH}"}, status_code=400)
+
+        key = self._scoped_key(request, idempotency_key)
+        fingerprint = self._fingerprint(request.method, request.url.path, request.url.query, await request.body())
+        store = self.store
+        while True:
+            entry = store.completed.get(key)
+            if entry is not MISS:
+                if entry[0] != fingerprint:
+                    return self._mismatch()
+                store.replayed += 1
+                return entry[1].to_response(replayed=True)
+
+            pending = store.in_flight.get(key)
+            if pending is None:
+                break
+            if pending[0] != fingerprint:
+                return self._mismatch()
+            store.waited += 1
+            try:
+                cached = await asyncio.wait_for(asyncio.shield(pending[1]), store.wait_timeout)
+            except asyncio.TimeoutError:
+                return ORJSONResponse(
+                    {"detail": "相同幂等键的请求仍在处理中"},
+                    status_code=409,
+                    headers={"Retry-After": "1"},
+                )
+            if cached is not None:
+                store.replayed += 1
+                return cached.to_response(replayed=True)
+            # 原请求失败且未保存结果, 由当前请求重新执行
+
+        future = asyncio.get_running_loop().create_future()
+        store.in_flight[key] = (fingerprint, future)
+        cached = None
+        try:
+            response = await call_next(request)
+            body = b"".join([chunk async for chunk in response.body_iterator])
+            result = CachedResponse(response.status_code, response.raw_headers, body)
+            if store.cacheable(response.status_code, body):
+                store.completed.set(key, (fingerprint, result))
+                store.stored += 1
+                cached = result
+            return result.to_response(replayed=False)
+        finally:
+            del store.in_flight[key]
+            future.set_result(cached)
+
+    def _scoped_key(self, request: Request, idempotency_key: str) -> str:
+        tenant_id = getattr(request.state, "tenant_id", None)
+        user_id = getattr(request.state, "user_id", None)
+        principal = f"user:{user_id}" if user_id is not None else f"ip:{get_client_ip(request)}"
+        return f"{tenant_id}:{principal}:{idempotency_key}"
+
+    def _fingerprint(self, method: str, path: str, query: str, body: bytes) -> bytes:
+        digest = hashlib.blake2b(digest_size=16)
+        for part in (method.encode(), path.encode(), query.encode(), body):
+            digest.update(len(part).to_bytes(8, "little"))
+            digest.update(part)
+        return digest.digest()
+
+    def _mismatch(self) -> Response:
+        self.store.mismatched += 1
+        return ORJSONResponse({"detail": f"{IDEMPOTENCY_HEADER} 已用于不同的请求"}, status_code=422)
@@ -5,6 +5,9 @@ from typing import Dict, Any
 from fastapi import Request, Response
 from starlette.middleware.base import BaseHTTPMiddleware
 
+from utils.client_ip import get_client_ip
+from utils.tracing import current_trace_id, traced_class
+
 
 # 配置日志记录器
 logging.basicConfig(
@@ -19,6 +22,7 @@ logging.basicConfig(
 logger = logging.getLogger("RequestLogger")
 
 
+@traced_class
 class LoggingMiddleware(BaseHTTPMiddleware):
     """
     异步请求日志中间件
@@ -90,7 +94,8 @@ class LoggingMiddleware(BaseHTTPMiddleware):
             "client_ip": self._get_client_ip(request),
             "user_agent": request.headers.get("user-agent", ""),
             "user_id": getattr(request.state, "user_id", None),
-            "authenticated": getattr(request.state, "authenticated", False)
+            "authenticated": getattr(request.state, "authenticated", False),
+            "trace_id": current_trace_id()
         }
     
     def _collect_response_info(self, response: Response, process_time: float) -> Dict[str, Any]:
@@ -165,14 +170,4 @@ class LoggingMiddleware(BaseHTTPMiddleware):
         """
         获取客户端真实IP地址
         """
-        # 检查代理头
-        forwarded_for = request.headers.get("x-forwarded-for")
-        if forwarded_for:
-            return forwarded_for.split(",")[0].strip()
-        
-        real_ip = request.headers.get("x-real-ip")
-        if real_ip:
-            return real_ip
-        
-        # 返回直接连接的客户端IP
-        return getattr(request.client, "host", "unknown") 
\ No newline at end of file
+        return get_client_ip(request)
\ No newline at end of file
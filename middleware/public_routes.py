@@ -0,0 +1,95 @@
+from typing import Dict, Iterable, Optional, Set
+
+from fastapi import FastAPI
+from fastapi.routing import APIRoute
+
+
+# 路由端点上标记公开的属性名
+PUBLIC_ATTR = "__rpac_public__"
+# 匹配任意请求方法
+ANY_METHOD = "*"
+
+
+def public(endpoint):
+    """
+    将路由标记为公开(不需要认证)
+    需要放在 @router.xxx 之下、@inject 之上, 使标记落在实际注册的端点函数上
+    """
+    setattr(endpoint, PUBLIC_ATTR, True)
+    return endpoint
+
+
+def is_public(endpoint) -> bool:
+    return getattr(endpoint, PUBLIC_ATTR, False)
+
+
+class _Node:
+    __slots__ = ("children", "param", "methods", "prefix_methods")
+
+    def __init__(self):
+        self.children: Dict[str, "_Node"] = {}
+        self.param: Optional["_Node"] = None  # 路径参数段, 如 {user_id}
+        self.methods: Set[str] = set()  # 路径在此结束时公开的请求方法
+        self.prefix_methods: Set[str] = set()  # 此节点下的所有路径对这些方法公开
+
+
+class PublicPathTrie:
+    """
+    公开路径前缀树
+    启动时根据路由表上的公开标记构建, 按路径段逐级匹配, 判断耗时只与路径长度相关
+    公开的是 (请求方法, 路径): 同一路径上未标记公开的其他方法仍需认证
+    路由挂载前缀来自实际注册的完整路径, API_PREFIX 变化时无需修改
+    """
+
+    def __init__(self):
+        self.root = _Node()
+        self.compiled = False
+
+    def add(self, path: str, methods: Iterable[str] = (ANY_METHOD,), prefix: bool = False):
+        node = self.root
+        for segment in path.strip("/").split("/"):
+            if not segment:
+                continue
+            if segment.startswith("{") and segment.endswith("}"):
+                if node.param is None:
+                    node.param = _Node()
+                node = node.param
+            else:
+                node = node.children.setdefault(segment, _Node())
+        (node.prefix_methods if prefix else node.methods).update(method.upper() for method in methods)
+
+    def compile(self, app: FastAPI, prefixes: Iterable[str] = ("/static",)):
+        """
+        从应用的路由表构建前缀树: 标记为公开的路由、文档路由以及公开前缀
+        """
+        for route in app.routes:
+            if isinstance(route, APIRoute) and is_public(route.endpoint):
+                self.add(route.path, route.methods)
+        for path in (app.openapi_url, app.docs_url, app.redoc_url, app.swagger_ui_oauth2_redirect_url):
+            if path:
+                self.add(path, ("GET", "HEAD"))
+        for path in prefixes:
+            self.add(path, ("GET", "HEAD"), prefix=True)
+        self.compiled = True
+
+    def match(self, method: str, path: str) -> bool:
+        return self._match(self.root, method.upper(), path, 1 if path.startswith("/") else 0)
+
+    @staticmethod
+    def _allows(methods: Set[str], method: str) -> bool:
+        return method in methods or ANY_METHOD in methods
+
+    def _match(self, node: _Node, method: str, path: str, start: int) -> bool:
+        if self._allows(node.prefix_methods, method):
+            return True
+        if start >= len(path):
+            return self._allows(node.methods, method)
+        end = path.find("/", start)
+        if end == -1:
+            end = len(path)
+        segment = path[start:end]
+        child = node.children.get(segment)
+        if child is not None and self._match(child, method, path, end + 1):
+            return True
+        # 字面段不匹配时尝试路径参数段
+        return node.param is not None and bool(segment) and self._match(node.param, method, path, end + 1)
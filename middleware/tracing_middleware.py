@@ -0,0 +1,40 @@
+from fastapi import Request, Response
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from utils.tracing import TRACE_ID_HEADER, Tracer, activate, deactivate
+
+
+class TracingMiddleware(BaseHTTPMiddleware):
+    """
+    异步请求追踪中间件
+    为每个被采样的请求创建根 span, 其余中间件、路由、服务和 DAO 的 span 都挂在它下面;
+    响应头 X-Trace-ID 返回追踪ID, 上游传入 W3C traceparent 时沿用其追踪ID和采样决定
+    """
+
+    def __init__(self, app, tracer: Tracer):
+        super().__init__(app)
+        self.tracer = tracer
+
+    async def dispatch(self, request: Request, call_next) -> Response:
+        span = self.tracer.start_trace(f"{request.method} {request.url.path}", request.headers.get("traceparent"))
+        if span is None:
+            return await call_next(request)
+
+        span.attributes.update({"http.method": request.method, "url.path": request.url.path})
+        token = activate(span)
+        try:
+            response = await call_next(request)
+            span.attributes["http.status_code"] = response.status_code
+            response.headers[TRACE_ID_HEADER] = span.trace_id
+            return response
+        except BaseException as e:
+            span.record_exception(e)
+            raise
+        finally:
+            deactivate(token)
+            # 路由匹配后以路径模板命名, 同一接口的请求归为一类
+            route = request.scope.get("route")
+            if route is not None:
+                span.name = f"{request.method} {route.path}"
+                span.attributes["http.route"] = route.path
+            self.tracer.end(span)
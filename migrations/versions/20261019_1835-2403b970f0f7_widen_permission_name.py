@@ -0,0 +1,36 @@
+"""widen_permission_name
+
+Revision ID: 2403b970f0f7
+Revises: 0a1329500997
+Create Date: 2026-10-19 18:35:12.408113+00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2403b970f0f7'
+down_revision: Union[str, None] = '0a1329500997'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # 分层权限名(如 users:profile:update)和通配模式(如 users:*)需要更长的名称
+    op.alter_column('permission', 'name',
+               existing_type=sa.String(length=50),
+               type_=sa.String(length=255),
+               existing_nullable=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.alter_column('permission', 'name',
+               existing_type=sa.String(length=255),
+               type_=sa.String(length=50),
+               existing_nullable=False)
@@ -0,0 +1,30 @@
+"""add_role_permission_condition
+
+Revision ID: 497bdc808531
+Revises: 2403b970f0f7
+Create Date: 2026-10-19 18:50:41.772305+00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '497bdc808531'
+down_revision: Union[str, None] = '2403b970f0f7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # 授权条件表达式, 为空表示无条件授权, 已有授权不受影响
+    op.add_column('role_permission', sa.Column('condition', sa.Text(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('role_permission', 'condition')
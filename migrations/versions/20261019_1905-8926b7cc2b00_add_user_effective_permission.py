@@ -0,0 +1,167 @@
+"""add_user_effective_permission
+
+Revision ID: 8926b7cc2b00
+Revises: 497bdc808531
+Create Date: 2026-10-19 19:05:27.193840+00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8926b7cc2b00'
+down_revision: Union[str, None] = '497bdc808531'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# 语句级触发器 + 转换表: 批量写入 userrole/role_permission 时每条语句只执行一次维护 SQL
+# 同一角色的授权变更(包括删除)先对 role 行加锁, 避免并发的 "给用户加/撤角色" 与 "给角色加/撤权限" 互相看不到对方而漏行或留下残行
+TRIGGER_FUNCTIONS = """
+CREATE OR REPLACE FUNCTION uep_lock_roles(role_ids integer[]) RETURNS void LANGUAGE plpgsql AS $$
+BEGIN
+    PERFORM 1 FROM role WHERE id = ANY(role_ids) ORDER BY id FOR NO KEY UPDATE;
+END $$;
+
+CREATE OR REPLACE FUNCTION uep_userrole_insert() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    PERFORM uep_lock_roles(ARRAY(SELECT DISTINCT role_id FROM new_rows));
+    INSERT INTO user_effective_permission (user_id, permission_id, role_id, condition)
+    SELECT n.user_id, rp.permission_id, n.role_id, rp.condition
+    FROM new_rows n JOIN role_permission rp ON rp.role_id = n.role_id
+    ON CONFLICT DO NOTHING;
+    RETURN NULL;
+END $$;
+
+CREATE OR REPLACE FUNCTION uep_userrole_delete() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    PERFORM uep_lock_roles(ARRAY(SELECT DISTINCT role_id FROM old_rows));
+    DELETE FROM user_effective_permission e
+    USING old_rows o
+    WHERE e.user_id = o.user_id AND e.role_id = o.role_id;
+    RETURN NULL;
+END $$;
+
+CREATE OR REPLACE FUNCTION uep_userrole_update() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    PERFORM uep_lock_roles(ARRAY(SELECT role_id FROM old_rows UNION SELECT role_id FROM new_rows));
+    DELETE FROM user_effective_permission e
+    USING old_rows o
+    WHERE e.user_id = o.user_id AND e.role_id = o.role_id;
+    INSERT INTO user_effective_permission (user_id, permission_id, role_id, condition)
+    SELECT n.user_id, rp.permission_id, n.role_id, rp.condition
+    FROM new_rows n JOIN role_permission rp ON rp.role_id = n.role_id
+    ON CONFLICT DO NOTHING;
+    RETURN NULL;
+END $$;
+
+CREATE OR REPLACE FUNCTION uep_role_permission_insert() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    PERFORM uep_lock_roles(ARRAY(SELECT DISTINCT role_id FROM new_rows));
+    INSERT INTO user_effective_permission (user_id, permission_id, role_id, condition)
+    SELECT ur.user_id, n.permission_id, n.role_id, n.condition
+    FROM new_rows n JOIN userrole ur ON ur.role_id = n.role_id
+    ON CONFLICT DO NOTHING;
+    RETURN NULL;
+END $$;
+
+CREATE OR REPLACE FUNCTION uep_role_permission_delete() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    PERFORM uep_lock_roles(ARRAY(SELECT DISTINCT role_id FROM old_rows));
+    DELETE FROM user_effective_permission e
+    USING old_rows o
+    WHERE e.role_id = o.role_id AND e.permission_id = o.permission_id;
+    RETURN NULL;
+END $$;
+
+CREATE OR REPLACE FUNCTION uep_role_permission_update() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    PERFORM uep_lock_roles(ARRAY(SELECT role_id FROM old_rows UNION SELECT role_id FROM new_rows));
+    DELETE FROM user_effective_permission e
+    USING old_rows o
+    WHERE e.role_id = o.role_id AND e.permission_id = o.permission_id;
+    INSERT INTO user_effective_permission (user_id, permission_id, role_id, condition)
+    SELECT ur.user_id, n.permission_id, n.role_id, n.condition
+    FROM new_rows n JOIN userrole ur ON ur.role_id = n.role_id
+    ON CONFLICT DO NOTHING;
+    RETURN NULL;
+END $$;
+
+CREATE OR REPLACE FUNCTION uep_truncate() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    TRUNCATE user_effective_permission;
+    RETURN NULL;
+END $$;
+"""
+
+TRIGGERS = """
+CREATE TRIGGER uep_userrole_insert AFTER INSERT ON userrole
+    REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION uep_userrole_insert();
+CREATE TRIGGER uep_userrole_delete AFTER DELETE ON userrole
+    REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION uep_userrole_delete();
+CREATE TRIGGER uep_userrole_update AFTER UPDATE ON userrole
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION uep_userrole_update();
+CREATE TRIGGER uep_userrole_truncate AFTER TRUNCATE ON userrole
+    FOR EACH STATEMENT EXECUTE FUNCTION uep_truncate();
+
+CREATE TRIGGER uep_role_permission_insert AFTER INSERT ON role_permission
+    REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION uep_role_permission_insert();
+CREATE TRIGGER uep_role_permission_delete AFTER DELETE ON role_permission
+    REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION uep_role_permission_delete();
+CREATE TRIGGER uep_role_permission_update AFTER UPDATE ON role_permission
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION uep_role_permission_update();
+CREATE TRIGGER uep_role_permission_truncate AFTER TRUNCATE ON role_permission
+    FOR EACH STATEMENT EXECUTE FUNCTION uep_truncate();
+"""
+
+DROP_TRIGGERS = """
+DROP TRIGGER IF EXISTS uep_userrole_insert ON userrole;
+DROP TRIGGER IF EXISTS uep_userrole_delete ON userrole;
+DROP TRIGGER IF EXISTS uep_userrole_update ON userrole;
+DROP TRIGGER IF EXISTS uep_userrole_truncate ON userrole;
+DROP TRIGGER IF EXISTS uep_role_permission_insert ON role_permission;
+DROP TRIGGER IF EXISTS uep_role_permission_delete ON role_permission;
+DROP TRIGGER IF EXISTS uep_role_permission_update ON role_permission;
+DROP TRIGGER IF EXISTS uep_role_permission_truncate ON role_permission;
+DROP FUNCTION IF EXISTS uep_userrole_insert();
+DROP FUNCTION IF EXISTS uep_userrole_delete();
+DROP FUNCTION IF EXISTS uep_userrole_update();
+DROP FUNCTION IF EXISTS uep_role_permission_insert();
+DROP FUNCTION IF EXISTS uep_role_permission_delete();
+DROP FUNCTION IF EXISTS uep_role_permission_update();
+DROP FUNCTION IF EXISTS uep_truncate();
+DROP FUNCTION IF EXISTS uep_lock_roles(integer[]);
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('user_effective_permission',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('permission_id', sa.Integer(), nullable=False),
+    sa.Column('role_id', sa.Integer(), nullable=False),
+    sa.Column('condition', sa.Text(), nullable=True),
+    sa.PrimaryKeyConstraint('user_id', 'permission_id', 'role_id')
+    )
+    op.create_index('ix_user_effective_permission_role_permission', 'user_effective_permission', ['role_id', 'permission_id'], unique=False)
+    op.create_index('ix_userrole_role_id', 'userrole', ['role_id'], unique=False)
+    op.execute(TRIGGER_FUNCTIONS)
+    op.execute(TRIGGERS)
+    # 回填已有数据
+    op.execute(
+        "INSERT INTO user_effective_permission (user_id, permission_id, role_id, condition) "
+        "SELECT ur.user_id, rp.permission_id, ur.role_id, rp.condition "
+        "FROM userrole ur JOIN role_permission rp ON rp.role_id = ur.role_id"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute(DROP_TRIGGERS)
+    op.drop_index('ix_userrole_role_id', table_name='userrole')
+    op.drop_index('ix_user_effective_permission_role_permission', table_name='user_effective_permission')
+    op.drop_table('user_effective_permission')
@@ -0,0 +1,281 @@
+"""partition_rbac_tables_by_tenant
+
+Revision ID: 5b3e9c07a1d4
+Revises: 8926b7cc2b00
+Create Date: 2026-10-19 19:20:41.508612+00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b3e9c07a1d4'
+down_revision: Union[str, None] = '8926b7cc2b00'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# 每张表的哈希分区数; 分区数变更需要重建表, 按预期的租户规模一次性选定
+PARTITIONS = 16
+# 存量数据归属的租户, 与 persist.tenant.DEFAULT_TENANT_ID 的默认值一致
+DEFAULT_TENANT_ID = 1
+
+# 表名 -> (列定义, 需要复制的存量列)
+TABLES = {
+    "user": (
+        """
+        tenant_id integer NOT NULL,
+        id integer NOT NULL,
+        username varchar(50) NOT NULL,
+        email varchar(100),
+        password varchar(255) NOT NULL,
+        created_at timestamp without time zone NOT NULL,
+        updated_at timestamp without time zone NOT NULL
+        """,
+        "id, username, email, password, created_at, updated_at",
+    ),
+    "role": (
+        """
+        tenant_id integer NOT NULL,
+        id integer NOT NULL,
+        name varchar(50) NOT NULL,
+        description varchar(255),
+        created_at timestamp without time zone NOT NULL,
+        updated_at timestamp without time zone NOT NULL
+        """,
+        "id, name, description, created_at, updated_at",
+    ),
+    "permission": (
+        """
+        tenant_id integer NOT NULL,
+        id integer NOT NULL,
+        name varchar(255) NOT NULL,
+        description varchar(255),
+        created_at timestamp without time zone NOT NULL,
+        updated_at timestamp without time zone NOT NULL
+        """,
+        "id, name, description, created_at, updated_at",
+    ),
+    "userrole": (
+        """
+        tenant_id integer NOT NULL,
+        user_id integer NOT NULL,
+        role_id integer NOT NULL,
+        created_at timestamp without time zone NOT NULL,
+        updated_at timestamp without time zone NOT NULL
+        """,
+        "user_id, role_id, created_at, updated_at",
+    ),
+    "role_permission": (
+        """
+        tenant_id integer NOT NULL,
+        role_id integer NOT NULL,
+        permission_id integer NOT NULL,
+        condition text,
+        created_at timestamp without time zone NOT NULL,
+        updated_at timestamp without time zone NOT NULL
+        """,
+        "role_id, permission_id, condition, created_at, updated_at",
+    ),
+    "user_effective_permission": (
+        """
+        tenant_id integer NOT NULL,
+        user_id integer NOT NULL,
+        permission_id integer NOT NULL,
+        role_id integer NOT NULL,
+        condition text
+        """,
+        "user_id, permission_id, role_id, condition",
+    ),
+}
+
+# 实体表的 id 继续使用原来的序列, 各租户共享, 因此 id 全局唯一
+SEQUENCES = {"user": "user_id_seq", "role": "role_id_seq", "permission": "permission_id_seq"}
+
+# 分区表上的主键和唯一索引都必须包含分区键 tenant_id
+CONSTRAINTS = """
+ALTER TABLE "user" ADD CONSTRAINT user_pkey PRIMARY KEY (tenant_id, id);
+CREATE UNIQUE INDEX uq_user_tenant_username ON "user" (tenant_id, username);
+ALTER TABLE role ADD CONSTRAINT role_pkey PRIMARY KEY (tenant_id, id);
+CREATE UNIQUE INDEX uq_role_tenant_name ON role (tenant_id, name);
+ALTER TABLE permission ADD CONSTRAINT permission_pkey PRIMARY KEY (tenant_id, id);
+CREATE UNIQUE INDEX uq_permission_tenant_name ON permission (tenant_id, name);
+
+ALTER TABLE userrole ADD CONSTRAINT userrole_pkey PRIMARY KEY (tenant_id, user_id, role_id);
+ALTER TABLE userrole ADD CONSTRAINT userrole_tenant_id_user_id_fkey
+    FOREIGN KEY (tenant_id, user_id) REFERENCES "user" (tenant_id, id);
+ALTER TABLE userrole ADD CONSTRAINT userrole_tenant_id_role_id_fkey
+    FOREIGN KEY (tenant_id, role_id) REFERENCES role (tenant_id, id);
+CREATE INDEX ix_userrole_role_id ON userrole (tenant_id, role_id);
+
+ALTER TABLE role_permission ADD CONSTRAINT role_permission_pkey PRIMARY KEY (tenant_id, role_id, permission_id);
+ALTER TABLE role_permission ADD CONSTRAINT role_permission_tenant_id_role_id_fkey
+    FOREIGN KEY (tenant_id, role_id) REFERENCES role (tenant_id, id);
+ALTER TABLE role_permission ADD CONSTRAINT role_permission_tenant_id_permission_id_fkey
+    FOREIGN KEY (tenant_id, permission_id) REFERENCES permission (tenant_id, id);
+
+ALTER TABLE user_effective_permission ADD CONSTRAINT user_effective_permission_pkey
+    PRIMARY KEY (tenant_id, user_id, permission_id, role_id);
+CREATE INDEX ix_user_effective_permission_role_permission
+    ON user_effective_permission (tenant_id, role_id, permission_id);
+"""
+
+# 与 8926b7cc2b00 相同的语句级触发器(删除同样先锁 role 行), 所有连接和删除都带上 tenant_id, 只触及本租户的分区
+TRIGGER_FUNCTIONS = """
+DROP FUNCTION IF EXISTS uep_lock_roles(integer[]);
+
+CREATE OR REPLACE FUNCTION uep_userrole_insert() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    PERFORM 1 FROM role r
+    WHERE (r.tenant_id, r.id) IN (SELECT tenant_id, role_id FROM new_rows)
+    ORDER BY r.tenant_id, r.id FOR NO KEY UPDATE;
+    INSERT INTO user_effective_permission (tenant_id, user_id, permission_id, role_id, condition)
+    SELECT n.tenant_id, n.user_id, rp.permission_id, n.role_id, rp.condition
+    FROM new_rows n JOIN role_permission rp ON rp.tenant_id = n.tenant_id AND rp.role_id = n.role_id
+    ON CONFLICT DO NOTHING;
+    RETURN NULL;
+END $$;
+
+CREATE OR REPLACE FUNCTION uep_userrole_delete() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    PERFORM 1 FROM role r
+    WHERE (r.tenant_id, r.id) IN (SELECT tenant_id, role_id FROM old_rows)
+    ORDER BY r.tenant_id, r.id FOR NO KEY UPDATE;
+    DELETE FROM user_effective_permission e
+    USING old_rows o
+    WHERE e.tenant_id = o.tenant_id AND e.user_id = o.user_id AND e.role_id = o.role_id;
+    RETURN NULL;
+END $$;
+
+CREATE OR REPLACE FUNCTION uep_userrole_update() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    PERFORM 1 FROM role r
+    WHERE (r.tenant_id, r.id) IN (SELECT tenant_id, role_id FROM old_rows UNION SELECT tenant_id, role_id FROM new_rows)
+    ORDER BY r.tenant_id, r.id FOR NO KEY UPDATE;
+    DELETE FROM user_effective_permission e
+    USING old_rows o
+    WHERE e.tenant_id = o.tenant_id AND e.user_id = o.user_id AND e.role_id = o.role_id;
+    INSERT INTO user_effective_permission (tenant_id, user_id, permission_id, role_id, condition)
+    SELECT n.tenant_id, n.user_id, rp.permission_id, n.role_id, rp.condition
+    FROM new_rows n JOIN role_permission rp ON rp.tenant_id = n.tenant_id AND rp.role_id = n.role_id
+    ON CONFLICT DO NOTHING;
+    RETURN NULL;
+END $$;
+
+CREATE OR REPLACE FUNCTION uep_role_permission_insert() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    PERFORM 1 FROM role r
+    WHERE (r.tenant_id, r.id) IN (SELECT tenant_id, role_id FROM new_rows)
+    ORDER BY r.tenant_id, r.id FOR NO KEY UPDATE;
+    INSERT INTO user_effective_permission (tenant_id, user_id, permission_id, role_id, condition)
+    SELECT n.tenant_id, ur.user_id, n.permission_id, n.role_id, n.condition
+    FROM new_rows n JOIN userrole ur ON ur.tenant_id = n.tenant_id AND ur.role_id = n.role_id
+    ON CONFLICT DO NOTHING;
+    RETURN NULL;
+END $$;
+
+CREATE OR REPLACE FUNCTION uep_role_permission_delete() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    PERFORM 1 FROM role r
+    WHERE (r.tenant_id, r.id) IN (SELECT tenant_id, role_id FROM old_rows)
+    ORDER BY r.tenant_id, r.id FOR NO KEY UPDATE;
+    DELETE FROM user_effective_permission e
+    USING old_rows o
+    WHERE e.tenant_id = o.tenant_id AND e.role_id = o.role_id AND e.permission_id = o.permission_id;
+    RETURN NULL;
+END $$;
+
+CREATE OR REPLACE FUNCTION uep_role_permission_update() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    PERFORM 1 FROM role r
+    WHERE (r.tenant_id, r.id) IN (SELECT tenant_id, role_id FROM old_rows UNION SELECT tenant_id, role_id FROM new_rows)
+    ORDER BY r.tenant_id, r.id FOR NO KEY UPDATE;
+    DELETE FROM user_effective_permission e
+    USING old_rows o
+    WHERE e.tenant_id = o.tenant_id AND e.role_id = o.role_id AND e.permission_id = o.permission_id;
+    INSERT INTO user_effective_permission (tenant_id, user_id, permission_id, role_id, condition)
+    SELECT n.tenant_id, ur.user_id, n.permission_id, n.role_id, n.condition
+    FROM new_rows n JOIN userrole ur ON ur.tenant_id = n.tenant_id AND ur.role_id = n.role_id
+    ON CONFLICT DO NOTHING;
+    RETURN NULL;
+END $$;
+
+CREATE OR REPLACE FUNCTION uep_truncate() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    TRUNCATE user_effective_permission;
+    RETURN NULL;
+END $$;
+"""
+
+# 分区表父表上的语句级触发器可以使用转换表, 覆盖写入所有分区的行
+TRIGGERS = """
+CREATE TRIGGER uep_userrole_insert AFTER INSERT ON userrole
+    REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION uep_userrole_insert();
+CREATE TRIGGER uep_userrole_delete AFTER DELETE ON userrole
+    REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION uep_userrole_delete();
+CREATE TRIGGER uep_userrole_update AFTER UPDATE ON userrole
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION uep_userrole_update();
+CREATE TRIGGER uep_userrole_truncate AFTER TRUNCATE ON userrole
+    FOR EACH STATEMENT EXECUTE FUNCTION uep_truncate();
+
+CREATE TRIGGER uep_role_permission_insert AFTER INSERT ON role_permission
+    REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION uep_role_permission_insert();
+CREATE TRIGGER uep_role_permission_delete AFTER DELETE ON role_permission
+    REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION uep_role_permission_delete();
+CREATE TRIGGER uep_role_permission_update AFTER UPDATE ON role_permission
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION uep_role_permission_update();
+CREATE TRIGGER uep_role_permission_truncate AFTER TRUNCATE ON role_permission
+    FOR EACH STATEMENT EXECUTE FUNCTION uep_truncate();
+"""
+
+
+def partitioned_tables_sql(suffix: str = "") -> str:
+    """
+    建立按 tenant_id 哈希分区的父表及其分区, 分区命名为 <表名>_p<序号>
+    """
+    statements = []
+    for table, (columns, _) in TABLES.items():
+        statements.append(f'CREATE TABLE "{table}{suffix}" ({columns}) PARTITION BY HASH (tenant_id);')
+        for remainder in range(PARTITIONS):
+            statements.append(
+                f'CREATE TABLE "{table}_p{remainder}" PARTITION OF "{table}{suffix}" '
+                f"FOR VALUES WITH (MODULUS {PARTITIONS}, REMAINDER {remainder});"
+            )
+    return "\n".join(statements)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # 期间阻止所有写入, 保证复制的数据完整
+    tables = ", ".join(f'"{table}"' for table in TABLES)
+    op.execute(f"LOCK TABLE {tables} IN ACCESS EXCLUSIVE MODE")
+    op.execute(partitioned_tables_sql("_partitioned"))
+    for table, (_, columns) in TABLES.items():
+        op.execute(
+            f'INSERT INTO "{table}_partitioned" (tenant_id, {columns}) '
+            f'SELECT {DEFAULT_TENANT_ID}, {columns} FROM "{table}"'
+        )
+    # 序列原本属于旧表的 id 列, 先解除归属, 避免随旧表一起删除
+    for sequence in SEQUENCES.values():
+        op.execute(f"ALTER SEQUENCE {sequence} OWNED BY NONE")
+    op.execute(
+        "DROP TABLE user_effective_permission, role_permission, userrole, permission, role, \"user\""
+    )
+    for table in TABLES:
+        op.execute(f'ALTER TABLE "{table}_partitioned" RENAME TO "{table}"')
+    for table, sequence in SEQUENCES.items():
+        op.execute(f"ALTER TABLE \"{table}\" ALTER COLUMN id SET DEFAULT nextval('{sequence}')")
+        op.execute(f'ALTER SEQUENCE {sequence} OWNED BY "{table}".id')
+    op.execute(CONSTRAINTS)
+    op.execute(TRIGGER_FUNCTIONS)
+    op.execute(TRIGGERS)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # 不同租户的用户名、角色名、权限名可以重复, 合并回单租户表会违反原有的语义, 需从备份恢复
+    raise RuntimeError("按租户分区的迁移不支持自动降级, 请从升级前的备份恢复")
@@ -0,0 +1,125 @@
+"""add_rbac_change_log
+
+Revision ID: c41d7e2f9a60
+Revises: 5b3e9c07a1d4
+Create Date: 2026-10-19 19:35:12.407315+00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c41d7e2f9a60'
+down_revision: Union[str, None] = '5b3e9c07a1d4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# 权限图增量追赶所需的变更: 每条受影响的行记录一次, 更新记为删除旧行 + 插入新行
+# txid 为写入事务的ID, 读取方以快照的 xmin 为标记, 之后只需读取 txid >= 标记 的行
+TRIGGER_FUNCTIONS = """
+CREATE OR REPLACE FUNCTION rbac_log_userrole() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP IN ('DELETE', 'UPDATE') THEN
+        INSERT INTO rbac_change_log (tenant_id, entity, op, user_id, role_id)
+        SELECT tenant_id, 'userrole', 'D', user_id, role_id FROM old_rows;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO rbac_change_log (tenant_id, entity, op, user_id, role_id)
+        SELECT tenant_id, 'userrole', 'I', user_id, role_id FROM new_rows;
+    END IF;
+    RETURN NULL;
+END $$;
+
+CREATE OR REPLACE FUNCTION rbac_log_role_permission() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP IN ('DELETE', 'UPDATE') THEN
+        INSERT INTO rbac_change_log (tenant_id, entity, op, role_id, permission_id)
+        SELECT tenant_id, 'role_permission', 'D', role_id, permission_id FROM old_rows;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO rbac_change_log (tenant_id, entity, op, role_id, permission_id, condition)
+        SELECT tenant_id, 'role_permission', 'I', role_id, permission_id, condition FROM new_rows;
+    END IF;
+    RETURN NULL;
+END $$;
+
+CREATE OR REPLACE FUNCTION rbac_log_permission() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP IN ('DELETE', 'UPDATE') THEN
+        INSERT INTO rbac_change_log (tenant_id, entity, op, permission_id)
+        SELECT tenant_id, 'permission', 'D', id FROM old_rows;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO rbac_change_log (tenant_id, entity, op, permission_id, name)
+        SELECT tenant_id, 'permission', 'I', id, name FROM new_rows;
+    END IF;
+    RETURN NULL;
+END $$;
+
+-- TRUNCATE 没有转换表, 记一条整表清空, 读取方据此全量重新加载
+CREATE OR REPLACE FUNCTION rbac_log_truncate() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    INSERT INTO rbac_change_log (entity, op) VALUES (TG_TABLE_NAME, 'T');
+    RETURN NULL;
+END $$;
+"""
+
+TRIGGERS = "\n".join(
+    f"""
+CREATE TRIGGER rbac_log_{table}_insert AFTER INSERT ON {table}
+    REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION rbac_log_{table}();
+CREATE TRIGGER rbac_log_{table}_delete AFTER DELETE ON {table}
+    REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION rbac_log_{table}();
+CREATE TRIGGER rbac_log_{table}_update AFTER UPDATE ON {table}
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION rbac_log_{table}();
+CREATE TRIGGER rbac_log_{table}_truncate AFTER TRUNCATE ON {table}
+    FOR EACH STATEMENT EXECUTE FUNCTION rbac_log_truncate();
+"""
+    for table in ("userrole", "role_permission", "permission")
+)
+
+DROP_TRIGGERS = "\n".join(
+    f"DROP TRIGGER IF EXISTS rbac_log_{table}_{event} ON {table};"
+    for table in ("userrole", "role_permission", "permission")
+    for event in ("insert", "delete", "update", "truncate")
+) + """
+DROP FUNCTION IF EXISTS rbac_log_userrole();
+DROP FUNCTION IF EXISTS rbac_log_role_permission();
+DROP FUNCTION IF EXISTS rbac_log_permission();
+DROP FUNCTION IF EXISTS rbac_log_truncate();
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('rbac_change_log',
+    sa.Column('id', sa.BigInteger(), sa.Identity(), nullable=False),
+    sa.Column('txid', sa.BigInteger(), server_default=sa.text('txid_current()'), nullable=False),
+    sa.Column('tenant_id', sa.Integer(), nullable=True),
+    sa.Column('entity', sa.String(length=20), nullable=False),
+    sa.Column('op', sa.String(length=1), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('role_id', sa.Integer(), nullable=True),
+    sa.Column('permission_id', sa.Integer(), nullable=True),
+    sa.Column('name', sa.String(length=255), nullable=True),
+    sa.Column('condition', sa.Text(), nullable=True),
+    sa.Column('changed_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_rbac_change_log_txid', 'rbac_change_log', ['txid'], unique=False)
+    op.create_index('ix_rbac_change_log_changed_at', 'rbac_change_log', ['changed_at'], unique=False)
+    op.execute(TRIGGER_FUNCTIONS)
+    op.execute(TRIGGERS)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute(DROP_TRIGGERS)
+    op.drop_index('ix_rbac_change_log_changed_at', table_name='rbac_change_log')
+    op.drop_index('ix_rbac_change_log_txid', table_name='rbac_change_log')
+    op.drop_table('rbac_change_log')
@@ -0,0 +1,296 @@
+import logging
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+import orjson
+from sqlmodel import SQLModel
+
+from persist.tenant import get_tenant_id
+
+
+logger = logging.getLogger("EntityCache")
+
+# 缓存未命中
+MISS = object()
+# 负缓存: 记录 "数据库中不存在" 的结果
+NOT_FOUND = object()
+_NOT_FOUND_BYTES = b"null"
+# 不进入缓存的敏感字段(如用户的密码哈希), 缓存中记为 None, 需要这些字段的查询直接读数据库
+UNCACHED_FIELDS = frozenset({"password"})
+
+
+def _decode(model: type[SQLModel], raw: bytes) -> SQLModel:
+    """
+    从 L2 的 JSON 还原实体; 数据已经过数据库约束, 不再做校验, 只还原时间字段的类型
+    """
+    data = orjson.loads(raw)
+    for name, field in model.model_fields.items():
+        if field.annotation is datetime and isinstance(data.get(name), str):
+            data[name] = datetime.fromisoformat(data[name])
+    return model.model_construct(**data)
+
+
+class LRUTTLCache:
+    """
+    进程内 L1 缓存: 容量有界的 LRU, 每个条目带过期时间
+    """
+
+    def __init__(self, max_size: int = 10000, ttl: float = 30.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+
+    def get(self, key: str) -> Any:
+        entry = self._data.get(key)
+        if entry is None:
+            return MISS
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._data[key]
+            return MISS
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+
+    def delete(self, key: str):
+        self._data.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class TenantPartitionedCache:
+    """
+    按租户划分的 L1: 每个租户一个独立容量的 LRUTTLCache, 某个租户的大量访问只会淘汰它自己的条目
+    租户分区的数量同样有上限, 超出时整体淘汰最久未访问的租户分区;
+    公开接口的租户来自未经验证的请求头, 只有写入数据库中存在的实体时才新建分区, 读取和负缓存不会新建
+    """
+
+    def __init__(self, max_size_per_tenant: int = 10000, ttl: float = 30.0, max_tenants: int = 64):
+        self.max_size_per_tenant = max_size_per_tenant
+        self.ttl = ttl
+        self.max_tenants = max_tenants
+        self._partitions: "OrderedDict[int, LRUTTLCache]" = OrderedDict()
+
+    def find(self, tenant_id: int) -> Optional[LRUTTLCache]:
+        """
+        返回已有的租户分区, 不存在时返回 None 而不新建
+        """
+        partition = self._partitions.get(tenant_id)
+        if partition is not None:
+            self._partitions.move_to_end(tenant_id)
+        return partition
+
+    def partition(self, tenant_id: int) -> LRUTTLCache:
+        partition = self._partitions.get(tenant_id)
+        if partition is None:
+            partition = self._partitions[tenant_id] = LRUTTLCache(self.max_size_per_tenant, self.ttl)
+            while len(self._partitions) > self.max_tenants:
+                self._partitions.popitem(last=False)
+        else:
+            self._partitions.move_to_end(tenant_id)
+        return partition
+
+    def tenants(self) -> int:
+        return len(self._partitions)
+
+    def __len__(self) -> int:
+        return sum(len(partition) for partition in self._partitions.values())
+
+
+class CacheBackend(ABC):
+    """
+    L2 共享缓存后端接口, 值为序列化后的字节串
+    """
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[bytes]:
+        ...
+
+    @abstractmethod
+    async def set(self, key: str, value: bytes, ttl: float):
+        ...
+
+    @abstractmethod
+    async def delete(self, *keys: str):
+        ...
+
+
+class InMemoryCacheBackend(CacheBackend):
+    """
+    进程内的 L2 实现, 用于单进程部署和测试
+    """
+
+    def __init__(self):
+        self._data: Dict[str, Tuple[float, bytes]] = {}
+
+    async def get(self, key: str) -> Optional[bytes]:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._data[key]
+            return None
+        return value
+
+    async def set(self, key: str, value: bytes, ttl: float):
+        self._data[key] = (time.monotonic() + ttl, value)
+
+    async def delete(self, *keys: str):
+        for key in keys:
+            self._data.pop(key, None)
+
+
+class RedisCacheBackend(CacheBackend):
+    """
+    基于 Redis 的 L2 实现, 接受任意 redis.asyncio 兼容的客户端(包括 fakeredis)
+    """
+
+    def __init__(self, client, prefix: str = "rpac:cache:"):
+        self.client = client
+        self.prefix = prefix
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await self.client.get(self.prefix + key)
+
+    async def set(self, key: str, value: bytes, ttl: float):
+        await self.client.set(self.prefix + key, value, px=int(ttl * 1000))
+
+    async def delete(self, *keys: str):
+        if keys:
+            await self.client.delete(*(self.prefix + key for key in keys))
+
+
+def create_cache_backend(redis_url: str = "") -> Optional[CacheBackend]:
+    """
+    配置了 Redis 地址时使用 Redis 作为 L2, 否则不启用 L2
+    """
+    if not redis_url:
+        return None
+    try:
+        from redis import asyncio as redis
+    except ImportError as e:
+        raise RuntimeError("使用 CACHE_REDIS_URL 需要安装 redis 包: pip install redis") from e
+    return RedisCacheBackend(redis.from_url(redis_url))
+
+
+class EntityCache:
+    """
+    用户、角色、权限实体的两级读穿透缓存
+    L1 为进程内按租户分区的 LRU, L2 为可选的共享后端; 未命中时调用 loader 查询数据库并回填两级缓存,
+    数据库中不存在的结果也会以较短的 TTL 缓存
+    键在当前租户(persist.tenant)内解析, L2 的键带租户前缀, 不同租户的同名用户、角色互不干扰
+    缓存返回的对象在调用者之间共享, 调用方不应修改
+    """
+
+    def __init__(
+        self,
+        l1: TenantPartitionedCache,
+        l2: Optional[CacheBackend] = None,
+        l2_ttl: float = 300.0,
+        negative_ttl: float = 5.0,
+    ):
+        self.l1 = l1
+        self.l2 = l2
+        self.l2_ttl = l2_ttl
+        self.negative_ttl = negative_ttl
+        self.hits_l1 = 0
+        self.hits_l2 = 0
+        self.misses = 0
+        self.l2_errors = 0
+
+    async def get_or_load(
+        self,
+        key: str,
+        model: type[SQLModel],
+        loader: Callable[[], Awaitable[Optional[SQLModel]]],
+    ) -> Optional[SQLModel]:
+        tenant_id = get_tenant_id()
+        l1 = self.l1.find(tenant_id)
+        value = MISS if l1 is None else l1.get(key)
+        if value is not MISS:
+            self.hits_l1 += 1
+            return None if value is NOT_FOUND else value
+
+        if self.l2 is not None:
+            raw = await self._l2_call(self.l2.get, f"{tenant_id}:{key}")
+            if raw is not None:
+                self.hits_l2 += 1
+                if raw == _NOT_FOUND_BYTES:
+                    if l1 is not None:
+                        l1.set(key, NOT_FOUND, self.negative_ttl)
+                    return None
+                value = _decode(model, raw)
+                self.l1.partition(tenant_id).set(key, value)
+                return value
+
+        self.misses += 1
+        return await self._store(tenant_id, key, await loader())
+
+    async def put(self, entity: SQLModel, *keys: str):
+        """
+        写穿透: 创建实体后直接写入缓存, 同时覆盖之前的负缓存
+        """
+        tenant_id = get_tenant_id()
+        for key in keys:
+            await self._store(tenant_id, key, entity)
+
+    async def invalidate(self, *keys: str):
+        tenant_id = get_tenant_id()
+        l1 = self.l1.find(tenant_id)
+        if l1 is not None:
+            for key in keys:
+                l1.delete(key)
+        if self.l2 is not None:
+            await self._l2_call(self.l2.delete, *(f"{tenant_id}:{key}" for key in keys))
+
+    async def _store(self, tenant_id: int, key: str, entity: Optional[SQLModel]) -> Optional[SQLModel]:
+        """
+        写入两级缓存并返回缓存中的实体; 敏感字段不写入, 首次加载和命中缓存时返回的字段一致
+        """
+        l2_key = f"{tenant_id}:{key}"
+        if entity is None:
+            # 不存在的租户只会得到负缓存, 不为它新建分区(否则伪造的租户头可以淘汰真实租户的分区)
+            l1 = self.l1.find(tenant_id)
+            if l1 is not None:
+                l1.set(key, NOT_FOUND, self.negative_ttl)
+            if self.l2 is not None:
+                await self._l2_call(self.l2.set, l2_key, _NOT_FOUND_BYTES, self.negative_ttl)
+            return None
+        data = entity.model_dump()
+        data.update(dict.fromkeys(UNCACHED_FIELDS & data.keys()))
+        cached = type(entity).model_construct(**data)
+        self.l1.partition(tenant_id).set(key, cached)
+        if self.l2 is not None:
+            await self._l2_call(self.l2.set, l2_key, orjson.dumps(data), self.l2_ttl)
+        return cached
+
+    async def _l2_call(self, method, *args):
+        """
+        L2 不可用时降级为只使用 L1 和数据库, 不影响请求
+        """
+        try:
+            return await method(*args)
+        except Exception as e:
+            self.l2_errors += 1
+            logger.warning(f"L2 缓存访问失败: {e}")
+            return None
+
+    def stats(self) -> dict:
+        return {
+            "l1_size": len(self.l1),
+            "l1_tenants": self.l1.tenants(),
+            "hits_l1": self.hits_l1,
+            "hits_l2": self.hits_l2,
+            "misses": self.misses,
+            "l2_errors": self.l2_errors,
+        }
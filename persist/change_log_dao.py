@@ -0,0 +1,85 @@
+from typing import Optional
+
+from sqlalchemy import bindparam, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlmodel import select
+
+from persist.models.rbac_change_log_model import RbacChangeLog
+from persist.permission_dao import SELECT_PERMISSION_NAMES
+from persist.role_dao import SELECT_ROLE_PERMISSIONS
+from persist.user_dao import SELECT_USER_ROLES
+from utils.tracing import traced_class
+
+# 标记为当前快照中最早的未完成事务: 小于它的事务都已结束, 其写入对本快照可见;
+# 同时返回快照本身(文本形式 xmin:xmax:未完成事务列表), 下次追赶时据此跳过已读过的变更
+SELECT_SNAPSHOT = text("SELECT txid_snapshot_xmin(txid_current_snapshot()), txid_current_snapshot()::text")
+# 上次读取时尚不可见(未提交或之后开始)的事务写入的变更; 先转为 text 再转换, 参数以字符串传入
+NOT_SEEN = text("NOT txid_visible_in_snapshot(rbac_change_log.txid, CAST(CAST(:snapshot AS text) AS txid_snapshot))")
+SELECT_CHANGES = (
+    select(
+        RbacChangeLog.entity,
+        RbacChangeLog.op,
+        RbacChangeLog.user_id,
+        RbacChangeLog.role_id,
+        RbacChangeLog.permission_id,
+        RbacChangeLog.tenant_id,
+        RbacChangeLog.name,
+        RbacChangeLog.condition,
+    )
+    .where(RbacChangeLog.txid >= bindparam("marker"))
+    .order_by(RbacChangeLog.id)
+    .limit(bindparam("limit"))
+)
+SELECT_NEW_CHANGES = SELECT_CHANGES.where(NOT_SEEN)
+# changed_at 由数据库的 now() 写入, 按数据库时间计算过期, 不受应用服务器时钟影响
+DELETE_EXPIRED = text("DELETE FROM rbac_change_log WHERE changed_at < now() - make_interval(secs => :retention)")
+
+
+@traced_class
+class ChangeLogDao:
+    """
+    rbac_change_log 的读取与清理, 供权限图在快照之后增量追赶
+    标记与数据在同一个 REPEATABLE READ 事务中读取, 二者对应同一个快照; 只读主库, 副本延迟不会造成遗漏
+    """
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def load_graph_state(self) -> tuple[int, str, list, list, list]:
+        """
+        在同一个快照中读出标记、快照和全部 (id, name)、(role_id, permission_id, condition)、(tenant_id, user_id, role_id)
+        """
+        async with self.session() as session:
+            await session.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+            marker, snapshot = (await session.execute(SELECT_SNAPSHOT)).one()
+            permissions = (await session.execute(SELECT_PERMISSION_NAMES)).all()
+            role_permissions = (await session.execute(SELECT_ROLE_PERMISSIONS)).all()
+            user_roles = (await session.execute(SELECT_USER_ROLES)).all()
+        return marker, snapshot, permissions, role_permissions, user_roles
+
+    async def list_changes(self, marker: int, snapshot: Optional[str], limit: int) -> tuple[int, str, list]:
+        """
+        读取标记之后的事务写入的变更, 最多 limit 条, 按写入顺序返回, 同时返回新的标记和快照
+        传入上次读取时的快照后, 只返回在该快照中不可见的变更: 长事务使标记停滞时也不会重复读取已应用的行;
+        变更的 id 按插入顺序而非提交顺序分配, 不能用 "id 大于上次最大值" 来跳过
+        全量加载和快照文件都会带上读取数据时的快照; 没有快照时(旧格式的快照文件)读取标记之后的全部变更,
+        其中可能有已应用的, 按最后写入为准应用即可
+        """
+        params = {"marker": marker, "limit": limit}
+        async with self.session() as session:
+            await session.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+            next_marker, next_snapshot = (await session.execute(SELECT_SNAPSHOT)).one()
+            if snapshot is None:
+                changes = (await session.execute(SELECT_CHANGES, params)).all()
+            else:
+                changes = (await session.execute(SELECT_NEW_CHANGES, {**params, "snapshot": snapshot})).all()
+        return next_marker, next_snapshot, changes
+
+    async def trim(self, retention: float) -> int:
+        """
+        删除早于保留时长(秒)的变更, 返回删除的行数
+        """
+        async with self.session() as session:
+            result = await session.execute(DELETE_EXPIRED, {"retention": retention})
+            await session.commit()
+        return result.rowcount
@@ -0,0 +1,107 @@
+import time
+
+from sqlalchemy import bindparam, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlmodel import select
+
+from persist.models.permission_model import Permission
+from persist.models.user_effective_permission_model import UserEffectivePermission
+from persist.routing import ReplicaRouter
+from persist.tenant import get_tenant_id
+
+# 单索引查找: 主键 (tenant_id, user_id, permission_id, role_id) 的前缀, 只访问该租户的分区
+SELECT_HAS_PERMISSION = (
+    select(UserEffectivePermission.role_id)
+    .where(
+        UserEffectivePermission.tenant_id == bindparam("tenant_id"),
+        UserEffectivePermission.user_id == bindparam("user_id"),
+        UserEffectivePermission.permission_id == bindparam("permission_id"),
+    )
+    .limit(1)
+)
+SELECT_USER_PERMISSIONS = (
+    select(Permission.name, UserEffectivePermission.condition)
+    .join(
+        Permission,
+        (Permission.tenant_id == UserEffectivePermission.tenant_id)
+        & (Permission.id == UserEffectivePermission.permission_id),
+    )
+    .where(
+        UserEffectivePermission.tenant_id == bindparam("tenant_id"),
+        UserEffectivePermission.user_id == bindparam("user_id"),
+    )
+)
+
+# 由 userrole 与 role_permission 连接得到的期望内容
+EXPECTED_ROWS = (
+    "SELECT ur.tenant_id, ur.user_id, rp.permission_id, ur.role_id, rp.condition "
+    "FROM userrole ur JOIN role_permission rp ON rp.tenant_id = ur.tenant_id AND rp.role_id = ur.role_id"
+)
+ACTUAL_ROWS = "SELECT tenant_id, user_id, permission_id, role_id, condition FROM user_effective_permission"
+
+COUNT_MISSING = text(f"SELECT count(*) FROM ({EXPECTED_ROWS} EXCEPT {ACTUAL_ROWS}) AS missing")
+COUNT_EXTRA = text(f"SELECT count(*) FROM ({ACTUAL_ROWS} EXCEPT {EXPECTED_ROWS}) AS extra")
+SAMPLE_MISSING = text(f"{EXPECTED_ROWS} EXCEPT {ACTUAL_ROWS} LIMIT :limit")
+SAMPLE_EXTRA = text(f"{ACTUAL_ROWS} EXCEPT {EXPECTED_ROWS} LIMIT :limit")
+
+# 重建期间阻止授权写入, 读操作不受影响
+LOCK_SOURCES = text("LOCK TABLE userrole, role_permission IN SHARE MODE")
+TRUNCATE_EFFECTIVE = text("TRUNCATE user_effective_permission")
+INSERT_EXPECTED = text(
+    f"INSERT INTO user_effective_permission (tenant_id, user_id, permission_id, role_id, condition) {EXPECTED_ROWS}"
+)
+
+
+class EffectivePermissionDao:
+    """
+    user_effective_permission 的读路径与一致性维护
+    表内容由数据库触发器维护(见迁移 8926b7cc2b00 与 5b3e9c07a1d4), 这里不做增量写入
+    单用户的查询限定在当前租户内, 一致性检查和重建覆盖所有租户
+    """
+
+    def __init__(self, session: AsyncSession, router: ReplicaRouter):
+        self.session = session
+        self.router = router
+
+    async def has_permission(self, user_id: int, permission_id: int) -> bool:
+        """
+        用户是否通过任一角色拥有该权限(具体权限ID, 不含通配与条件判断)
+        """
+        role_id = await self.router.execute_read(
+            SELECT_HAS_PERMISSION, {"tenant_id": get_tenant_id(), "user_id": user_id, "permission_id": permission_id}
+        )
+        return role_id is not None
+
+    async def list_user_permissions(self, user_id: int) -> list[tuple[str, str | None]]:
+        """
+        用户的全部有效授权 (权限名, 条件), 权限名可能是通配模式
+        """
+        return await self.router.execute_read_all(
+            SELECT_USER_PERMISSIONS, {"tenant_id": get_tenant_id(), "user_id": user_id}
+        )
+
+    async def check_consistency(self, sample: int = 10) -> dict:
+        """
+        对比有效权限表与 userrole x role_permission 的连接结果
+        """
+        async with self.session() as session:
+            missing = (await session.execute(COUNT_MISSING)).scalar()
+            extra = (await session.execute(COUNT_EXTRA)).scalar()
+            report = {"missing": missing, "extra": extra, "consistent": not missing and not extra}
+            if missing:
+                report["missing_sample"] = [tuple(row) for row in await session.execute(SAMPLE_MISSING, {"limit": sample})]
+            if extra:
+                report["extra_sample"] = [tuple(row) for row in await session.execute(SAMPLE_EXTRA, {"limit": sample})]
+            return report
+
+    async def rebuild(self) -> dict:
+        """
+        在一个事务内清空并重新生成有效权限表, 期间授权写入会等待
+        """
+        start = time.perf_counter()
+        async with self.session() as session:
+            async with session.begin():
+                await session.execute(LOCK_SOURCES)
+                await session.execute(TRUNCATE_EFFECTIVE)
+                rows = (await session.execute(INSERT_EXPECTED)).rowcount
+        return {"rows": rows, "seconds": round(time.perf_counter() - start, 3)}
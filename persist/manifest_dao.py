@@ -0,0 +1,200 @@
+import time
+from datetime import datetime
+from typing import Callable
+
+from sqlalchemy import bindparam, delete, insert, tuple_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlmodel import select
+
+from persist.cache import EntityCache
+from persist.models.permission_model import Permission
+from persist.models.role_model import Role
+from persist.models.role_permission_model import RolePermission
+from persist.routing import ReplicaRouter
+from persist.tenant import get_tenant_id
+
+# 整个租户的角色、权限和授权各用一条查询读出, 只扫描该租户的分区
+SELECT_TENANT_PERMISSIONS = select(Permission.id, Permission.name, Permission.description).where(
+    Permission.tenant_id == bindparam("tenant_id")
+)
+SELECT_TENANT_ROLES = select(Role.id, Role.name, Role.description).where(Role.tenant_id == bindparam("tenant_id"))
+SELECT_TENANT_GRANTS = select(RolePermission.role_id, RolePermission.permission_id, RolePermission.condition).where(
+    RolePermission.tenant_id == bindparam("tenant_id")
+)
+
+_permissions = Permission.__table__
+_roles = Role.__table__
+_grants = RolePermission.__table__
+
+UPDATE_PERMISSION = (
+    update(_permissions)
+    .where(_permissions.c.tenant_id == bindparam("b_tenant_id"), _permissions.c.id == bindparam("b_id"))
+    .values(description=bindparam("b_description"), updated_at=bindparam("b_updated_at"))
+)
+UPDATE_ROLE = (
+    update(_roles)
+    .where(_roles.c.tenant_id == bindparam("b_tenant_id"), _roles.c.id == bindparam("b_id"))
+    .values(description=bindparam("b_description"), updated_at=bindparam("b_updated_at"))
+)
+UPDATE_GRANT = (
+    update(_grants)
+    .where(
+        _grants.c.tenant_id == bindparam("b_tenant_id"),
+        _grants.c.role_id == bindparam("b_role_id"),
+        _grants.c.permission_id == bindparam("b_permission_id"),
+    )
+    .values(condition=bindparam("b_condition"), updated_at=bindparam("b_updated_at"))
+)
+# 带 RETURNING 的 executemany 会被 SQLAlchemy 合并为每批 1000 行的 INSERT ... VALUES,
+# 不带时驱动逐行执行, 语句级触发器也会逐行触发
+INSERT_GRANTS = insert(_grants).returning(_grants.c.role_id)
+DELETE_GRANTS = delete(_grants).where(
+    _grants.c.tenant_id == bindparam("tenant_id"),
+    tuple_(_grants.c.role_id, _grants.c.permission_id).in_(bindparam("pairs", expanding=True)),
+)
+
+
+class ManifestState:
+    """
+    租户当前的角色、权限和授权, 以名称和ID索引, 供计算差异使用
+    """
+
+    def __init__(self, permissions, roles, grants):
+        # 名称 -> (ID, 描述)
+        self.permissions: dict[str, tuple[int, str | None]] = {
+            name: (id_, description) for id_, name, description in permissions
+        }
+        self.permission_names: dict[int, str] = {id_: name for id_, name, _ in permissions}
+        self.roles: dict[str, tuple[int, str | None]] = {name: (id_, description) for id_, name, description in roles}
+        # 角色ID -> {权限ID: 条件}
+        self.grants: dict[int, dict[int, str | None]] = {}
+        for role_id, permission_id, condition in grants:
+            self.grants.setdefault(role_id, {})[permission_id] = condition
+
+
+class ManifestPlan:
+    """
+    清单与数据库之间的差异, 新建的实体还没有ID, 授权中以名称引用
+    """
+
+    def __init__(self):
+        # {"name", "description"}
+        self.create_permissions: list[dict] = []
+        # {"id", "name", "description"}
+        self.update_permissions: list[dict] = []
+        self.create_roles: list[dict] = []
+        self.update_roles: list[dict] = []
+        # (角色名, 权限名, 条件)
+        self.create_grants: list[tuple[str, str, str | None]] = []
+        # (角色ID, 权限ID, 条件, 角色名, 权限名)
+        self.update_grants: list[tuple[int, int, str | None, str, str]] = []
+        # (角色ID, 权限ID, 角色名, 权限名)
+        self.delete_grants: list[tuple[int, int, str, str]] = []
+        self.timing: dict[str, float] = {}
+
+    def is_empty(self) -> bool:
+        return not (
+            self.create_permissions or self.update_permissions or self.create_roles or self.update_roles
+            or self.create_grants or self.update_grants or self.delete_grants
+        )
+
+
+class ManifestDao:
+    """
+    在一个事务内读取租户的当前状态、计算差异并只写入变更
+    """
+
+    # 每条 DELETE 语句删除的授权数, 触发器按语句执行, 批量越大维护开销越低
+    CHUNK_SIZE = 1000
+
+    def __init__(self, session: AsyncSession, router: ReplicaRouter, cache: EntityCache):
+        self.session = session
+        self.router = router
+        self.cache = cache
+
+    async def sync(self, build_plan: Callable[[ManifestState], ManifestPlan], dry_run: bool = False) -> ManifestPlan:
+        """
+        build_plan 根据当前状态计算差异, 抛出异常时事务回滚; dry_run 时只计算不写入
+        状态读取与写入在同一事务内的主库上进行, 不受副本延迟影响
+        """
+        tenant_id = get_tenant_id()
+        params = {"tenant_id": tenant_id}
+        async with self.session() as session:
+            async with session.begin():
+                start = time.perf_counter()
+                state = ManifestState(
+                    (await session.execute(SELECT_TENANT_PERMISSIONS, params)).all(),
+                    (await session.execute(SELECT_TENANT_ROLES, params)).all(),
+                    (await session.execute(SELECT_TENANT_GRANTS, params)).all(),
+                )
+                loaded = time.perf_counter()
+                plan = build_plan(state)
+                planned = time.perf_counter()
+                plan.timing.update(load=round(loaded - start, 3), diff=round(planned - loaded, 3))
+                if dry_run or plan.is_empty():
+                    return plan
+                await self._apply(session, tenant_id, state, plan)
+            plan.timing["apply"] = round(time.perf_counter() - planned, 3)
+        self.router.mark_write()
+        await self._invalidate(state, plan)
+        return plan
+
+    async def _apply(self, session, tenant_id: int, state: ManifestState, plan: ManifestPlan):
+        now = datetime.now()
+        permission_ids = {name: id_ for name, (id_, _) in state.permissions.items()}
+        role_ids = {name: id_ for name, (id_, _) in state.roles.items()}
+
+        for table, rows, ids in (
+            (_permissions, plan.create_permissions, permission_ids),
+            (_roles, plan.create_roles, role_ids),
+        ):
+            if rows:
+                result = await session.execute(insert(table).returning(table.c.id, table.c.name), [
+                    {"tenant_id": tenant_id, "name": row["name"], "description": row["description"],
+                     "created_at": now, "updated_at": now}
+                    for row in rows
+                ])
+                ids.update({name: id_ for id_, name in result})
+
+        for statement, rows in ((UPDATE_PERMISSION, plan.update_permissions), (UPDATE_ROLE, plan.update_roles)):
+            if rows:
+                await session.execute(statement, [
+                    {"b_tenant_id": tenant_id, "b_id": row["id"], "b_description": row["description"], "b_updated_at": now}
+                    for row in rows
+                ])
+
+        # 先删除再插入, 两者不会涉及同一授权
+        pairs = [(role_id, permission_id) for role_id, permission_id, _, _ in plan.delete_grants]
+        for chunk in self._chunks(pairs):
+            await session.execute(DELETE_GRANTS, {"tenant_id": tenant_id, "pairs": chunk})
+        if plan.update_grants:
+            await session.execute(UPDATE_GRANT, [
+                {"b_tenant_id": tenant_id, "b_role_id": role_id, "b_permission_id": permission_id,
+                 "b_condition": condition, "b_updated_at": now}
+                for role_id, permission_id, condition, _, _ in plan.update_grants
+            ])
+        if plan.create_grants:
+            await session.execute(INSERT_GRANTS, [
+                {"tenant_id": tenant_id, "role_id": role_ids[role], "permission_id": permission_ids[permission],
+                 "condition": condition, "created_at": now, "updated_at": now}
+                for role, permission, condition in plan.create_grants
+            ])
+
+    async def _invalidate(self, state: ManifestState, plan: ManifestPlan):
+        """
+        新建实体的名称可能有负缓存, 更新的实体和授权变更的角色需要重新加载
+        """
+        keys = [f"permission:name:{row['name']}" for row in plan.create_permissions]
+        keys += [f"role:name:{row['name']}" for row in plan.create_roles]
+        for row in plan.update_permissions:
+            keys += [f"permission:id:{row['id']}", f"permission:name:{row['name']}"]
+        for row in plan.update_roles:
+            keys += [f"role:id:{row['id']}", f"role:name:{row['name']}"]
+        changed_roles = {role_id for role_id, *_ in plan.update_grants} | {role_id for role_id, *_ in plan.delete_grants}
+        changed_roles |= {state.roles[role][0] for role, _, _ in plan.create_grants if role in state.roles}
+        keys += [f"role:id:{role_id}" for role_id in changed_roles]
+        if keys:
+            await self.cache.invalidate(*keys)
+
+    def _chunks(self, rows: list) -> list[list]:
+        return [rows[start:start + self.CHUNK_SIZE] for start in range(0, len(rows), self.CHUNK_SIZE)]
@@ -2,4 +2,6 @@ from .user_model import User
 from .role_model import Role
 from .user_role_model import UserRole
 from .permission_model import Permission
-from .role_permission_model import RolePermission
\ No newline at end of file
+from .role_permission_model import RolePermission
+from .user_effective_permission_model import UserEffectivePermission
+from .rbac_change_log_model import RbacChangeLog
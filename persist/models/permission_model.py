@@ -1,11 +1,16 @@
+from sqlalchemy import Index
 from sqlmodel import Field, SQLModel, String
 
 from datetime import datetime
 
 
 class Permission(SQLModel, table=True):
-    id: int = Field(default=None, primary_key=True, description="权限ID")
-    name: str = Field(sa_type=String(length=50), nullable=False, description="权限名")
+    # 数据库中按 tenant_id 哈希分区, 权限名在租户内唯一
+    __table_args__ = (Index("uq_permission_tenant_name", "tenant_id", "name", unique=True),)
+
+    tenant_id: int = Field(primary_key=True, description="租户ID")
+    id: int = Field(default=None, primary_key=True, sa_column_kwargs={"autoincrement": True}, description="权限ID")
+    name: str = Field(sa_type=String(length=255), nullable=False, description="权限名, 按 : 分段, 支持 * 通配")
     description: str = Field(sa_type=String(length=255), nullable=True, description="权限描述")
     created_at: datetime = Field(default=datetime.now(), description="创建时间")
     updated_at: datetime = Field(default=datetime.now(), description="更新时间")
\ No newline at end of file
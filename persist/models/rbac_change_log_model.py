@@ -0,0 +1,30 @@
+from datetime import datetime
+
+from sqlalchemy import BigInteger, Column, Identity, Index, text
+from sqlmodel import Field, SQLModel, String, Text
+
+
+class RbacChangeLog(SQLModel, table=True):
+    """
+    userrole、role_permission、permission 的变更记录, 由数据库触发器写入(见迁移 c41d7e2f9a60), 应用不直接写入
+    权限图以快照的 xmin 为标记, 重启后只读取标记之后的变更
+    """
+    __tablename__ = "rbac_change_log"
+    __table_args__ = (
+        Index("ix_rbac_change_log_txid", "txid"),
+        Index("ix_rbac_change_log_changed_at", "changed_at"),
+    )
+    id: int = Field(sa_column=Column(BigInteger, Identity(), primary_key=True), description="变更序号")
+    txid: int = Field(sa_column=Column(BigInteger, nullable=False, server_default=text("txid_current()")), description="写入事务ID")
+    tenant_id: int | None = Field(default=None, nullable=True, description="租户ID, 整表清空时为空")
+    entity: str = Field(sa_type=String(length=20), nullable=False, description="表名: userrole / role_permission / permission")
+    op: str = Field(sa_type=String(length=1), nullable=False, description="I 插入, D 删除, T 整表清空")
+    user_id: int | None = Field(default=None, nullable=True, description="用户ID")
+    role_id: int | None = Field(default=None, nullable=True, description="角色ID")
+    permission_id: int | None = Field(default=None, nullable=True, description="权限ID")
+    name: str | None = Field(default=None, sa_type=String(length=255), nullable=True, description="权限名")
+    condition: str | None = Field(default=None, sa_type=Text, nullable=True, description="授权条件表达式")
+    changed_at: datetime = Field(sa_column_kwargs={"server_default": text("now()")}, description="变更时间")
+
+    def __repr__(self):
+        return f"<RbacChangeLog {self.id} {self.entity} {self.op}>"
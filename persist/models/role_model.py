@@ -1,10 +1,15 @@
+from sqlalchemy import Index
 from sqlmodel import Field, SQLModel, String
 
 from datetime import datetime
 
 
 class Role(SQLModel, table=True):
-    id: int = Field(default=None, primary_key=True, description="角色ID")
+    # 数据库中按 tenant_id 哈希分区, 角色名在租户内唯一
+    __table_args__ = (Index("uq_role_tenant_name", "tenant_id", "name", unique=True),)
+
+    tenant_id: int = Field(primary_key=True, description="租户ID")
+    id: int = Field(default=None, primary_key=True, sa_column_kwargs={"autoincrement": True}, description="角色ID")
     name: str = Field(sa_type=String(length=50), nullable=False, description="角色名")
     description: str = Field(sa_type=String(length=255), nullable=True, description="角色描述")
     created_at: datetime = Field(default=datetime.now(), description="创建时间")
@@ -1,12 +1,19 @@
-from sqlmodel import Field, SQLModel
+from sqlalchemy import ForeignKeyConstraint
+from sqlmodel import Field, SQLModel, Text
 
 from datetime import datetime
 
 
 class RolePermission(SQLModel, table=True):
     __tablename__ = "role_permission"
-    role_id: int = Field(primary_key=True, foreign_key="role.id", description="角色ID")
-    permission_id: int = Field(primary_key=True, foreign_key="permission.id", description="权限ID")
+    __table_args__ = (
+        ForeignKeyConstraint(["tenant_id", "role_id"], ["role.tenant_id", "role.id"]),
+        ForeignKeyConstraint(["tenant_id", "permission_id"], ["permission.tenant_id", "permission.id"]),
+    )
+    tenant_id: int = Field(primary_key=True, description="租户ID")
+    role_id: int = Field(primary_key=True, description="角色ID")
+    permission_id: int = Field(primary_key=True, description="权限ID")
+    condition: str | None = Field(default=None, sa_type=Text, nullable=True, description="授权条件表达式, 为空表示无条件")
     created_at: datetime = Field(default=datetime.now(), description="创建时间")
     updated_at: datetime = Field(default=datetime.now(), description="更新时间")
     
@@ -0,0 +1,21 @@
+from sqlalchemy import Index
+from sqlmodel import Field, SQLModel, Text
+
+
+class UserEffectivePermission(SQLModel, table=True):
+    """
+    用户的有效权限: userrole 与 role_permission 连接结果的物化
+    由两张表上的触发器维护, 应用不直接写入
+    """
+    __tablename__ = "user_effective_permission"
+    __table_args__ = (
+        Index("ix_user_effective_permission_role_permission", "tenant_id", "role_id", "permission_id"),
+    )
+    tenant_id: int = Field(primary_key=True, description="租户ID")
+    user_id: int = Field(primary_key=True, description="用户ID")
+    permission_id: int = Field(primary_key=True, description="权限ID")
+    role_id: int = Field(primary_key=True, description="授予该权限的角色ID")
+    condition: str | None = Field(default=None, sa_type=Text, nullable=True, description="授权条件表达式")
+
+    def __repr__(self):
+        return f"<UserEffectivePermission {self.user_id} {self.permission_id} {self.role_id}>"
@@ -1,9 +1,14 @@
 from datetime import datetime
+from sqlalchemy import Index
 from sqlmodel import Field, SQLModel, String
 
 
 class User(SQLModel, table=True):
-    id: int = Field(default=None, primary_key=True, description="用户ID")
+    # 数据库中按 tenant_id 哈希分区(见迁移 5b3e9c07a1d4), 用户名在租户内唯一
+    __table_args__ = (Index("uq_user_tenant_username", "tenant_id", "username", unique=True),)
+
+    tenant_id: int = Field(primary_key=True, description="租户ID")
+    id: int = Field(default=None, primary_key=True, sa_column_kwargs={"autoincrement": True}, description="用户ID")
     username: str = Field(sa_type=String(length=50), nullable=False, description="用户名")
     email: str = Field(sa_type=String(length=100), nullable=True, description="邮箱")
     password: str = Field(sa_type=String(length=255), nullable=False, description="密码")
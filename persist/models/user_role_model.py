@@ -1,12 +1,21 @@
+from sqlalchemy import ForeignKeyConstraint, Index
 from sqlmodel import Field, SQLModel
 
 from datetime import datetime
 
 
 class UserRole(SQLModel, table=True):
+    __table_args__ = (
+        # 外键带上租户ID, 由数据库保证用户和角色属于同一租户
+        ForeignKeyConstraint(["tenant_id", "user_id"], ["user.tenant_id", "user.id"]),
+        ForeignKeyConstraint(["tenant_id", "role_id"], ["role.tenant_id", "role.id"]),
+        # 按角色查找用户, 供有效权限表的触发器使用
+        Index("ix_userrole_role_id", "tenant_id", "role_id"),
+    )
     
-    user_id: int = Field(primary_key=True, foreign_key="user.id", description="用户ID")
-    role_id: int = Field(primary_key=True, foreign_key="role.id", description="角色ID")
+    tenant_id: int = Field(primary_key=True, description="租户ID")
+    user_id: int = Field(primary_key=True, description="用户ID")
+    role_id: int = Field(primary_key=True, description="角色ID")
     created_at: datetime = Field(default=datetime.now(), description="创建时间")
     updated_at: datetime = Field(default=datetime.now(), description="更新时间")
     
@@ -1,22 +1,59 @@
 
 
+from sqlalchemy import bindparam
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlmodel import select
 
+from persist.cache import EntityCache
 from persist.models.permission_model import Permission
+from persist.routing import ReplicaRouter
+from persist.tenant import get_tenant_id
+from utils.tracing import traced_class
 
+# 热点查询只构建一次, 复用 SQLAlchemy 的编译缓存和 asyncpg 的预编译语句
+SELECT_PERMISSION_BY_ID = select(Permission).where(
+    Permission.tenant_id == bindparam("tenant_id"), Permission.id == bindparam("permission_id")
+)
+SELECT_PERMISSION_BY_NAME = select(Permission).where(
+    Permission.tenant_id == bindparam("tenant_id"), Permission.name == bindparam("name")
+)
+SELECT_PERMISSION_NAMES = select(Permission.id, Permission.name)
 
+
+@traced_class
 class PermissionDao:
-    def __init__(self, session: AsyncSession):
+    def __init__(self, session: AsyncSession, router: ReplicaRouter, cache: EntityCache):
         self.session = session
+        self.router = router
+        self.cache = cache
 
     async def create_permission(self, permission: Permission) -> Permission:
+        permission.tenant_id = get_tenant_id()
         async with self.session() as session:
             session.add(permission)
             await session.commit()
+            self.router.mark_write()
+            await self.cache.put(permission, f"permission:id:{permission.id}", f"permission:name:{permission.name}")
             return permission
+
+    async def get_permission_by_id(self, permission_id: int) -> Permission:
+        return await self.cache.get_or_load(
+            f"permission:id:{permission_id}",
+            Permission,
+            lambda: self.router.execute_read(
+                SELECT_PERMISSION_BY_ID, {"tenant_id": get_tenant_id(), "permission_id": permission_id}
+            ),
+        )
         
     async def get_permission_by_name(self, name: str) -> Permission:
-        async with self.session() as session:
-            result = await session.execute(select(Permission).where(Permission.name == name))
-            return result.scalar_one_or_none()
\ No newline at end of file
+        return await self.cache.get_or_load(
+            f"permission:name:{name}",
+            Permission,
+            lambda: self.router.execute_read(SELECT_PERMISSION_BY_NAME, {"tenant_id": get_tenant_id(), "name": name}),
+        )
+
+    async def list_permission_names(self) -> list[tuple[int, str]]:
+        """
+        批量加载所有租户的 (id, name), 权限ID全局唯一
+        """
+        return await self.router.execute_read_all(SELECT_PERMISSION_NAMES)
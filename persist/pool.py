@@ -0,0 +1,120 @@
+import asyncio
+import logging
+import time
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+
+logger = logging.getLogger("PersistPool")
+
+# 预热查询: 建立连接后执行, 让数据库和 asyncpg 提前加载目录信息与语句缓存
+WARMUP_QUERIES = [
+    'SELECT 1',
+    'SELECT id, username FROM "user" LIMIT 0',
+    'SELECT id, name FROM role LIMIT 0',
+    'SELECT id, name FROM permission LIMIT 0',
+    'SELECT user_id, role_id FROM userrole LIMIT 0',
+    'SELECT role_id, permission_id FROM role_permission LIMIT 0',
+]
+
+
+class MonitoredQueuePool(AsyncAdaptedQueuePool):
+    """
+    记录连接获取等待时间的连接池, 供准入控制判断数据库连接是否饱和
+    只统计池满时的等待, 新建连接的耗时不计入; 平均值按时间衰减, 没有新的等待时逐渐回落
+    """
+
+    # 等待时间指数滑动平均的平滑系数
+    EWMA_ALPHA = 0.2
+    # 平均值的半衰期(秒)
+    EWMA_HALF_LIFE = 5.0
+    # 最大等待时间的统计窗口(秒)
+    MAX_WAIT_WINDOW = 60.0
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.waiting = 0
+        self._wait_ewma = 0.0
+        self._wait_updated = time.monotonic()
+        self.max_wait = 0.0
+        self._max_wait_since = self._wait_updated
+
+    def _exhausted(self) -> bool:
+        return self._max_overflow > -1 and self.checkedout() >= self.size() + self._max_overflow
+
+    def _decayed(self, now: float) -> float:
+        return self._wait_ewma * 0.5 ** ((now - self._wait_updated) / self.EWMA_HALF_LIFE)
+
+    def _roll_max_wait(self, now: float):
+        if now - self._max_wait_since > self.MAX_WAIT_WINDOW:
+            self.max_wait = 0.0
+            self._max_wait_since = now
+
+    @property
+    def wait_ewma(self) -> float:
+        return self._decayed(time.monotonic())
+
+    def connect(self):
+        if not self._exhausted():
+            # 池中有空闲连接或可以新建, 不需要等待
+            return super().connect()
+        self.waiting += 1
+        start = time.monotonic()
+        try:
+            return super().connect()
+        finally:
+            self.waiting -= 1
+            now = time.monotonic()
+            wait = now - start
+            ewma = self._decayed(now)
+            self._wait_ewma = ewma + self.EWMA_ALPHA * (wait - ewma)
+            self._wait_updated = now
+            self._roll_max_wait(now)
+            self.max_wait = max(self.max_wait, wait)
+
+    def stats(self) -> dict:
+        self._roll_max_wait(time.monotonic())
+        return {
+            "size": self.size(),
+            "checked_out": self.checkedout(),
+            "overflow": self.overflow(),
+            "capacity": self.size() + self._max_overflow,
+            "waiting": self.waiting,
+            "wait_ewma_ms": round(self.wait_ewma * 1000, 3),
+            "max_wait_ms": round(self.max_wait * 1000, 3),
+        }
+
+
+async def _warm_up_connection(engine: AsyncEngine):
+    async with engine.connect() as conn:
+        for query in WARMUP_QUERIES:
+            await conn.execute(text(query))
+
+
+async def warm_up_pool(engine: AsyncEngine, size: int):
+    """
+    启动时并发建立 size 个连接并执行预热查询, 连接归还后保留在池中
+    size 不会超过连接池的 pool_size, 否则多出的溢出连接归还后会被直接关闭
+    """
+    size = min(size, engine.pool.size())
+    if size <= 0:
+        return
+    results = await asyncio.gather(
+        *(_warm_up_connection(engine) for _ in range(size)),
+        return_exceptions=True,
+    )
+    errors = [result for result in results if isinstance(result, Exception)]
+    if errors:
+        # 预热失败不阻止服务启动, 后续请求依赖 pre-ping 重新建立连接
+        logger.warning(f"连接池预热失败 {len(errors)}/{size}: {errors[0]}")
+    else:
+        logger.info(f"连接池预热完成: {size} 个连接")
+
+
+async def dispose_pool(engine: AsyncEngine):
+    """
+    关闭连接池中的所有连接
+    """
+    await engine.dispose()
@@ -1,32 +1,82 @@
+from sqlalchemy import bindparam
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlmodel import select
+from persist.cache import EntityCache
 from persist.models.permission_model import Permission
 from persist.models.role_model import Role
+from persist.models.role_permission_model import RolePermission
+from persist.routing import ReplicaRouter
+from persist.tenant import get_tenant_id
+from utils.tracing import traced_class
 
+# 热点查询只构建一次, 复用 SQLAlchemy 的编译缓存和 asyncpg 的预编译语句
+SELECT_ROLE_BY_ID = select(Role).where(Role.tenant_id == bindparam("tenant_id"), Role.id == bindparam("role_id"))
+SELECT_ROLE_BY_NAME = select(Role).where(Role.tenant_id == bindparam("tenant_id"), Role.name == bindparam("name"))
+SELECT_PERMISSION_NAMES_BY_ROLE = (
+    select(Permission.name)
+    .join(
+        RolePermission,
+        (RolePermission.tenant_id == Permission.tenant_id) & (RolePermission.permission_id == Permission.id),
+    )
+    .where(RolePermission.tenant_id == bindparam("tenant_id"), RolePermission.role_id == bindparam("role_id"))
+)
+SELECT_ROLE_PERMISSIONS = select(RolePermission.role_id, RolePermission.permission_id, RolePermission.condition)
+
+
+@traced_class
 class RoleDao:
-    def __init__(self, session: AsyncSession):
+    def __init__(self, session: AsyncSession, router: ReplicaRouter, cache: EntityCache):
         self.session = session
+        self.router = router
+        self.cache = cache
 
-    async def add_permission_to_role(self, role_id: int, permission_id: int) -> Role:
+    async def add_permission_to_role(self, role_id: int, permission_id: int, condition: str = None) -> list[str]:
+        """
+        为角色添加权限(已存在时更新条件), 返回角色当前的全部权限名
+        """
+        tenant_id = get_tenant_id()
         async with self.session() as session:
-            role = await session.get(Role, role_id)
-            permission = await session.get(Permission, permission_id)
-            role.permissions.append(permission)
-            await session.commit()
-            return role
+            grant = await session.get(RolePermission, (tenant_id, role_id, permission_id))
+            if grant is None:
+                session.add(
+                    RolePermission(tenant_id=tenant_id, role_id=role_id, permission_id=permission_id, condition=condition)
+                )
+                await session.commit()
+            elif grant.condition != condition:
+                grant.condition = condition
+                await session.commit()
+            permission_names = (
+                await session.execute(SELECT_PERMISSION_NAMES_BY_ROLE, {"tenant_id": tenant_id, "role_id": role_id})
+            ).scalars().all()
+        self.router.mark_write()
+        await self.cache.invalidate(f"role:id:{role_id}")
+        return list(permission_names)
+
+    async def list_role_permissions(self) -> list[tuple[int, int, str | None]]:
+        """
+        批量加载所有租户的 (role_id, permission_id, condition) 关系, 角色和权限的ID全局唯一
+        """
+        return await self.router.execute_read_all(SELECT_ROLE_PERMISSIONS)
     
     async def get_role_by_id(self, role_id: int) -> Role:
-        async with self.session() as session:
-            result = await session.execute(select(Role).where(Role.id == role_id))
-            return result.scalar_one_or_none()
+        return await self.cache.get_or_load(
+            f"role:id:{role_id}",
+            Role,
+            lambda: self.router.execute_read(SELECT_ROLE_BY_ID, {"tenant_id": get_tenant_id(), "role_id": role_id}),
+        )
     
     async def create_role(self, role: Role) -> Role:
+        role.tenant_id = get_tenant_id()
         async with self.session() as session:
             session.add(role)
             await session.commit()
+            self.router.mark_write()
+            await self.cache.put(role, f"role:id:{role.id}", f"role:name:{role.name}")
             return role
         
     async def get_role_by_name(self, name: str) -> Role:
-        async with self.session() as session:
-            result = await session.execute(select(Role).where(Role.name == name))
-            return result.scalar_one_or_none()
\ No newline at end of file
+        return await self.cache.get_or_load(
+            f"role:name:{name}",
+            Role,
+            lambda: self.router.execute_read(SELECT_ROLE_BY_NAME, {"tenant_id": get_tenant_id(), "name": name}),
+        )
\ No newline at end of file
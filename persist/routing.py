@@ -0,0 +1,155 @@
+import asyncio
+import itertools
+import logging
+import time
+from contextvars import ContextVar
+from typing import List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError, OperationalError
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from persist.single_flight import SingleFlight
+
+
+logger = logging.getLogger("ReplicaRouter")
+
+# 当前请求(上下文)最近一次写入的时间, 用于保证读己之写
+_last_write_at: ContextVar[float] = ContextVar("rpac_last_write_at", default=0.0)
+
+# 副本复制延迟(秒), 已追平主库时为 0, 非副本实例返回 NULL
+REPLICA_LAG_QUERY = text(
+    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END"
+)
+
+# 副本不可用时会抛出的异常, 触发回退到主库
+REPLICA_ERRORS = (OperationalError, DBAPIError, OSError, asyncio.TimeoutError)
+
+
+def _scalar(result):
+    return result.scalar_one_or_none()
+
+
+def _all_rows(result):
+    return result.all()
+
+
+class ReplicaRouter:
+    """
+    DAO 层的读写路由
+    写操作始终走主库; 读操作轮询健康的副本, 副本失败或延迟过大时回退主库
+    同一请求内写入后的一段时间窗口内, 读操作也走主库以保证读己之写
+    """
+
+    def __init__(
+        self,
+        primary: sessionmaker,
+        replica_engines: List[AsyncEngine] = None,
+        read_your_writes_window: float = 2.0,
+        max_lag: float = 5.0,
+        failure_cooldown: float = 30.0,
+    ):
+        self.primary = primary
+        self.replica_engines = replica_engines or []
+        self.replicas = [
+            sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+            for engine in self.replica_engines
+        ]
+        self.read_your_writes_window = read_your_writes_window
+        self.max_lag = max_lag
+        self.failure_cooldown = failure_cooldown
+        # 每个副本恢复可用的时间点, 0 表示健康
+        self._down_until = [0.0] * len(self.replicas)
+        self._round_robin = itertools.cycle(range(len(self.replicas)))
+        # 合并并发的相同只读查询
+        self.single_flight = SingleFlight()
+
+    def mark_write(self):
+        """
+        记录当前上下文的写入时间
+        """
+        _last_write_at.set(time.monotonic())
+
+    def _in_write_window(self) -> bool:
+        last_write = _last_write_at.get()
+        return bool(last_write) and time.monotonic() - last_write < self.read_your_writes_window
+
+    def _pick_replica(self) -> Optional[int]:
+        now = time.monotonic()
+        for _ in range(len(self.replicas)):
+            index = next(self._round_robin)
+            if self._down_until[index] <= now:
+                return index
+        return None
+
+    def mark_unhealthy(self, index: int, reason: str):
+        """
+        将副本标记为不可用, 冷却时间内不再路由读请求
+        """
+        if self._down_until[index] <= time.monotonic():
+            logger.warning(f"副本 {index} 不可用, {self.failure_cooldown}s 内回退主库: {reason}")
+        self._down_until[index] = time.monotonic() + self.failure_cooldown
+
+    async def execute_read(self, statement, params: dict = None):
+        """
+        执行只读查询并返回单个结果, 并发的相同查询(语句 + 参数)只执行一次
+        写入窗口内的读操作需要读主库的最新数据, 不与其他请求合并
+        """
+        if self._in_write_window():
+            return await self._execute_on_primary(statement, params)
+        key = (statement, tuple(sorted(params.items())) if params else ())
+        return await self.single_flight.do(key, lambda: self._execute_read(statement, params))
+
+    async def execute_read_all(self, statement, params: dict = None) -> list:
+        """
+        执行只读查询并返回所有行, 用于批量加载, 不做查询合并
+        """
+        if self._in_write_window():
+            return await self._execute_on_primary(statement, params, _all_rows)
+        return await self._execute_read(statement, params, _all_rows)
+
+    async def _execute_read(self, statement, params: dict = None, fetch=_scalar):
+        """
+        执行只读查询并用 fetch 取出结果, 副本失败时回退主库
+        """
+        index = self._pick_replica() if self.replicas else None
+        if index is not None:
+            try:
+                async with self.replicas[index]() as session:
+                    return fetch(await session.execute(statement, params))
+            except REPLICA_ERRORS as e:
+                self.mark_unhealthy(index, str(e))
+        return await self._execute_on_primary(statement, params, fetch)
+
+    async def _execute_on_primary(self, statement, params: dict = None, fetch=_scalar):
+        async with self.primary() as session:
+            return fetch(await session.execute(statement, params))
+
+    async def check_replicas(self):
+        """
+        检查所有副本的连通性与复制延迟
+        """
+        for index, engine in enumerate(self.replica_engines):
+            try:
+                async with engine.connect() as conn:
+                    lag = (await conn.execute(REPLICA_LAG_QUERY)).scalar() or 0
+            except REPLICA_ERRORS as e:
+                self.mark_unhealthy(index, str(e))
+                continue
+            if lag > self.max_lag:
+                self.mark_unhealthy(index, f"复制延迟 {lag:.1f}s")
+            else:
+                self._down_until[index] = 0.0
+
+    async def run_health_checks(self, interval: float):
+        """
+        周期性检查副本健康状态, 在 lifespan 中作为后台任务运行
+        """
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.check_replicas()
+            except Exception as e:
+                logger.warning(f"副本健康检查失败: {e}")
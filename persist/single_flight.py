@@ -0,0 +1,42 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class SingleFlight:
+    """
+    合并并发的相同查询
+    同一 key 的查询在执行期间, 后到的调用者不再发起新查询, 而是等待同一个结果;
+    查询在独立任务中执行并以 shield 等待, 任何一个调用者被取消都不会影响其他调用者
+    返回的对象会被多个调用者共享, 调用方不应修改
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        self.calls += 1
+        future = self._calls.get(key)
+        if future is not None:
+            self.coalesced += 1
+            return await asyncio.shield(future)
+
+        task = asyncio.ensure_future(fn())
+        self._calls[key] = task
+        task.add_done_callback(lambda done: self._finish(key, done))
+        return await asyncio.shield(task)
+
+    def _finish(self, key: Hashable, task: asyncio.Future):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        # 所有调用者都已取消时取出异常, 避免 "exception was never retrieved" 警告
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> dict:
+        return {
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._calls),
+        }
@@ -0,0 +1,48 @@
+import os
+from contextlib import contextmanager
+from contextvars import ContextVar, Token
+
+
+# 未携带租户信息的请求(以及迁移前的存量数据)归属的租户
+DEFAULT_TENANT_ID = int(os.getenv("DEFAULT_TENANT_ID", "1"))
+# 公开接口(注册、登录)通过该请求头指定租户, 其余接口以令牌中的 tid 为准
+TENANT_HEADER = "X-Tenant-ID"
+
+_tenant_id: ContextVar[int] = ContextVar("tenant_id", default=DEFAULT_TENANT_ID)
+
+
+def get_tenant_id() -> int:
+    """
+    当前请求所属的租户, DAO 的查询、写入和实体缓存都按它隔离
+    """
+    return _tenant_id.get()
+
+
+def set_tenant_id(tenant_id: int) -> Token:
+    return _tenant_id.set(tenant_id)
+
+
+def reset_tenant_id(token: Token):
+    _tenant_id.reset(token)
+
+
+@contextmanager
+def tenant_scope(tenant_id: int):
+    """
+    在请求之外(命令行、后台任务)以指定租户身份访问 DAO
+    """
+    token = _tenant_id.set(tenant_id)
+    try:
+        yield
+    finally:
+        _tenant_id.reset(token)
+
+
+def parse_tenant_id(value) -> int:
+    """
+    解析请求头或令牌中的租户ID, 非正整数时抛出 ValueError
+    """
+    tenant_id = int(value)
+    if tenant_id <= 0:
+        raise ValueError(f"无效的租户ID: {value}")
+    return tenant_id
@@ -1,33 +1,86 @@
+from sqlalchemy import bindparam
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlmodel import select
+from persist.cache import EntityCache
 from persist.models.role_model import Role
 from persist.models.user_model import User
+from persist.models.user_role_model import UserRole
+from persist.routing import ReplicaRouter
+from persist.tenant import get_tenant_id
+from utils.tracing import traced_class
 
+# 热点查询只构建一次, 复用 SQLAlchemy 的编译缓存和 asyncpg 的预编译语句
+# 所有按实体查询的语句都带 tenant_id 条件, 只扫描该租户所在的分区
+SELECT_USER_BY_ID = select(User).where(User.tenant_id == bindparam("tenant_id"), User.id == bindparam("user_id"))
+SELECT_USER_BY_USERNAME = select(User).where(
+    User.tenant_id == bindparam("tenant_id"), User.username == bindparam("username")
+)
+SELECT_ROLE_NAMES_BY_USER = (
+    select(Role.name)
+    .join(UserRole, (UserRole.tenant_id == Role.tenant_id) & (UserRole.role_id == Role.id))
+    .where(UserRole.tenant_id == bindparam("tenant_id"), UserRole.user_id == bindparam("user_id"))
+)
+SELECT_USER_ROLES = select(UserRole.tenant_id, UserRole.user_id, UserRole.role_id)
 
+
+@traced_class
 class UserDao:
-    def __init__(self, session: AsyncSession):
+    def __init__(self, session: AsyncSession, router: ReplicaRouter, cache: EntityCache):
         self.session = session
+        self.router = router
+        self.cache = cache
 
-    async def add_role_to_user(self, user_id: int, role_id: int) -> User:
+    async def add_role_to_user(self, user_id: int, role_id: int) -> list[str]:
+        """
+        为用户添加角色(已存在时忽略), 返回用户当前的全部角色名
+        """
+        tenant_id = get_tenant_id()
         async with self.session() as session:
-            user = await session.get(User, user_id)
-            role = await session.get(Role, role_id)
-            user.roles.append(role)
-            await session.commit()
-            return user
+            if await session.get(UserRole, (tenant_id, user_id, role_id)) is None:
+                session.add(UserRole(tenant_id=tenant_id, user_id=user_id, role_id=role_id))
+                await session.commit()
+            role_names = (
+                await session.execute(SELECT_ROLE_NAMES_BY_USER, {"tenant_id": tenant_id, "user_id": user_id})
+            ).scalars().all()
+        self.router.mark_write()
+        await self.cache.invalidate(f"user:id:{user_id}")
+        return list(role_names)
+
+    async def list_user_roles(self) -> list[tuple[int, int, int]]:
+        """
+        批量加载所有租户的 (tenant_id, user_id, role_id) 关系
+        """
+        return await self.router.execute_read_all(SELECT_USER_ROLES)
     
     async def get_user_by_id(self, user_id: int) -> User:   
-        async with self.session() as session:
-            result = await session.execute(select(User).where(User.id == user_id))
-            return result.scalar_one_or_none()
+        return await self.cache.get_or_load(
+            f"user:id:{user_id}",
+            User,
+            lambda: self.router.execute_read(SELECT_USER_BY_ID, {"tenant_id": get_tenant_id(), "user_id": user_id}),
+        )
     
     async def create_user(self, user: User) -> User:
+        user.tenant_id = get_tenant_id()
         async with self.session() as session:
             session.add(user)
             await session.commit()
+            self.router.mark_write()
+            await self.cache.put(user, f"user:id:{user.id}", f"user:username:{user.username}")
             return user
     
+    async def get_user_credentials(self, username: str) -> User:
+        """
+        登录时读取包含密码哈希的完整用户, 不经过缓存(缓存中的用户不含密码)
+        """
+        return await self.router.execute_read(
+            SELECT_USER_BY_USERNAME, {"tenant_id": get_tenant_id(), "username": username}
+        )
+
     async def get_user_by_username(self, username: str):
-        async with self.session() as session:
-            result = await session.execute(select(User).where(User.username == username))
-            return result.scalar_one_or_none()
\ No newline at end of file
+        return await self.cache.get_or_load(
+            f"user:username:{username}",
+            User,
+            lambda: self.router.execute_read(
+                SELECT_USER_BY_USERNAME, {"tenant_id": get_tenant_id(), "username": username}
+            ),
+        )
\ No newline at end of file
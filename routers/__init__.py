@@ -2,12 +2,16 @@ from routers import (
     user_router,
     role_router,
     permission_router,
+    authz_router,
+    manifest_router,
 )
 
 routers = [
     user_router,
     role_router,
     permission_router,
+    authz_router,
+    manifest_router,
 ]
 
 __all__ = [
@@ -0,0 +1,21 @@
+from fastapi import APIRouter, Request
+from fastapi.responses import ORJSONResponse
+
+from services.model.authz_vo import AuthzCheckRequest, AuthzCheckResponse
+from services.registry import registry
+
+
+router = APIRouter(prefix="/authz", tags=["authz"], default_response_class=ORJSONResponse)
+
+
+@router.post("/check", response_model=AuthzCheckResponse)
+async def check(body: AuthzCheckRequest, request: Request):
+    """
+    批量权限检查, 结果顺序与请求中的 checks 一致
+    调用方只能检查自己; 持有 AUTHZ_ADMIN_PERMISSION 权限时可以检查任意主体
+
+    请求: {"checks": [[1, "user:read"], ["<token>", "role:create", {"resource": {"owner_id": 1}}]]}
+    响应: {"results": [true, false]}
+    """
+    caller = int(request.state.user_id)
+    return ORJSONResponse({"results": await registry.authz_service.check_batch(body.checks, body.context, caller)})
@@ -0,0 +1,29 @@
+from fastapi import APIRouter, Request
+from fastapi.responses import ORJSONResponse
+
+from services.manifest_service import parse_manifest
+from services.registry import registry
+
+
+router = APIRouter(prefix="/manifest", tags=["manifest"], default_response_class=ORJSONResponse)
+
+YAML_CONTENT_TYPES = ("application/yaml", "application/x-yaml", "text/yaml")
+
+
+@router.post("/sync")
+async def sync(
+    request: Request,
+    dry_run: bool = False,
+    details: bool | None = None,
+):
+    """
+    按清单同步当前租户的角色、权限和授权, 只写入差异
+
+    请求体为 JSON, Content-Type 为 application/yaml 时按 YAML 解析:
+    {"permissions": [{"name": "users:read"}], "roles": [{"name": "admin", "grants": ["users:*"]}]}
+    dry_run=true 时只返回将要执行的变更; 调用方需要持有 MANIFEST_ADMIN_PERMISSION 权限
+    """
+    registry.manifest_service.authorize_caller(int(request.state.user_id))
+    fmt = "yaml" if request.headers.get("content-type", "").split(";")[0].strip() in YAML_CONTENT_TYPES else "json"
+    manifest = parse_manifest(await request.body(), fmt)
+    return ORJSONResponse(await registry.manifest_service.sync(manifest, dry_run=dry_run, details=details))
@@ -1,20 +1,14 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter
+from fastapi.responses import ORJSONResponse
 
-from dependency_injector.wiring import Provide, inject
+from services.model.permission_vo import PermissionCreate, PermissionRead
+from services.registry import registry
+from utils.responses import read_response
 
-from persist.models.permission_model import Permission
-from services import ServiceContainer
-from services.model.permission_vo import PermissionCreate
-from services.permission_service import PermissionService
 
+router = APIRouter(prefix="/permissions", tags=["permissions"], default_response_class=ORJSONResponse)
 
-router = APIRouter(prefix="/permissions", tags=["permissions"])
 
-
-@router.post("/create")
-@inject
-async def create_permission(
-    permission: PermissionCreate,
-    permission_service: PermissionService = Depends(Provide[ServiceContainer.permission_service]),
-) -> Permission:
-    return await permission_service.create_permission(permission)
\ No newline at end of file
+@router.post("/create", response_model=PermissionRead)
+async def create_permission(permission: PermissionCreate):
+    return read_response(PermissionRead, await registry.permission_service.create_permission(permission))
\ No newline at end of file
@@ -1,28 +1,18 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter
+from fastapi.responses import ORJSONResponse
 
-from dependency_injector.wiring import Provide, inject
+from services.model.role_vo import RoleCreate, RolePermission, RolePermissions, RoleRead
+from services.registry import registry
+from utils.responses import read_response
 
-from persist.models.role_model import Role
-from services import ServiceContainer
-from services.model.role_vo import RoleCreate, RolePermission
-from services.role_service import RoleService
 
+router = APIRouter(prefix="/roles", tags=["roles"], default_response_class=ORJSONResponse)
 
-router = APIRouter(prefix="/roles", tags=["roles"])
 
+@router.post("/{role_id}/permissions", response_model=RolePermissions)
+async def add_permission_to_role(role_permission: RolePermission):
+    return ORJSONResponse(await registry.role_service.add_permission_to_role(role_permission))
 
-@router.post("/{role_id}/permissions")
-@inject
-async def add_permission_to_role(
-    role_permission: RolePermission,
-    role_service: RoleService = Depends(Provide[ServiceContainer.role_service]),
-) -> Role:
-    return await role_service.add_permission_to_role(role_permission)
-
-@router.post("/create")
-@inject
-async def create_role(
-    role: RoleCreate,
-    role_service: RoleService = Depends(Provide[ServiceContainer.role_service]),
-) -> Role:
-    return await role_service.create_role(role)
\ No newline at end of file
+@router.post("/create", response_model=RoleRead)
+async def create_role(role: RoleCreate):
+    return read_response(RoleRead, await registry.role_service.create_role(role))
\ No newline at end of file
@@ -1,45 +1,37 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Request
+from fastapi.responses import ORJSONResponse
 
-from dependency_injector.wiring import Provide, inject
+from middleware.public_routes import public
+from services.model.user_vo import UserCreate, UserLogin, UserRead, UserRole, UserRoles, UserToken
+from services.registry import registry
+from utils.client_ip import get_client_ip
+from utils.responses import read_response
 
-from persist.models.user_model import User
-from services import ServiceContainer
-from services.model.user_vo import UserCreate, UserLogin, UserRole
-from services.user_service import UserService
 
+router = APIRouter(prefix="/users", tags=["users"], default_response_class=ORJSONResponse)
 
-router = APIRouter(prefix="/users", tags=["users"])
 
+@router.post("/{user_id}/roles", response_model=UserRoles)
+async def add_role_to_user(user_role: UserRole):
+    return ORJSONResponse(await registry.user_service.add_role_to_user(user_role))
 
-@router.post("/{user_id}/roles")
-@inject
-async def add_role_to_user(
-    user_role: UserRole,
-    user_service: UserService = Depends(Provide[ServiceContainer.user_service]),
-) -> User:
-    return await user_service.add_role_to_user(UserRole)
 
-
-@router.post("/register")
-@inject
-async def register(
-    user: UserCreate,
-    user_service: UserService = Depends(Provide[ServiceContainer.user_service]),
-) -> User:
+@router.post("/register", response_model=UserRead)
+@public
+async def register(user: UserCreate):
     """
     注册用户
 
     Args:
         user (UserCreate): 用户注册信息
-        user_service (UserService, optional): 用户服务. Defaults to Depends(Provide[ServiceContainer.user_service]).
     """
-    return await user_service.create_user(user)
+    return read_response(UserRead, await registry.user_service.create_user(user))
 
 
-@router.post("/login")
-@inject
-async def login(
-    user: UserLogin,
-    user_service: UserService = Depends(Provide[ServiceContainer.user_service]),
-) -> User:
-    return await user_service.login(user)
\ No newline at end of file
+@router.post("/login", response_model=UserToken)
+@public
+async def login(user: UserLogin, request: Request):
+    # 先限流再登录, 被拒绝的请求不查询数据库也不做 bcrypt 校验
+    await registry.login_rate_limiter.check(get_client_ip(request), user.username)
+    token = await registry.user_service.login(user)
+    return ORJSONResponse({"access_token": token, "token_type": "bearer"})
\ No newline at end of file
@@ -2,11 +2,35 @@ import os
 from persist import PersistContainer
 from dependency_injector import containers, providers
 
+from services.authz_service import AuthzService
+from services.manifest_service import ManifestService
+from services.permission_graph import PermissionGraph
 from services.permission_service import PermissionService
+from services.rate_limit_service import LoginRateLimiter, create_token_bucket_store
 from services.role_service import RoleService
 from services.token_service import TokenService
 from services.user_service import UserService
 SECRET_KEY = os.getenv("SECRET_KEY", default="97548834e9fe67fc52c597958581362fdd0b53a6abeda7965f698627599552b6")
+# 登录限流配置: 桶容量与每秒补充的令牌数; 配置 Redis 地址后多 worker 共享限流状态
+RATE_LIMIT_REDIS_URL = os.getenv("RATE_LIMIT_REDIS_URL", "")
+LOGIN_IP_CAPACITY = float(os.getenv("LOGIN_RATE_LIMIT_IP_CAPACITY", "20"))
+LOGIN_IP_REFILL_RATE = float(os.getenv("LOGIN_RATE_LIMIT_IP_REFILL_RATE", "0.5"))
+LOGIN_USERNAME_CAPACITY = float(os.getenv("LOGIN_RATE_LIMIT_USERNAME_CAPACITY", "5"))
+LOGIN_USERNAME_REFILL_RATE = float(os.getenv("LOGIN_RATE_LIMIT_USERNAME_REFILL_RATE", "0.1"))
+# 批量权限检查配置
+AUTHZ_MAX_BATCH = int(os.getenv("AUTHZ_MAX_BATCH", "50000"))  # 单次请求最多检查条数
+AUTHZ_TOKEN_CACHE_SIZE = int(os.getenv("AUTHZ_TOKEN_CACHE_SIZE", "10000"))
+AUTHZ_TOKEN_CACHE_TTL = float(os.getenv("AUTHZ_TOKEN_CACHE_TTL", "60"))  # 秒
+AUTHZ_ADMIN_PERMISSION = os.getenv("AUTHZ_ADMIN_PERMISSION", "authz:check")  # 持有该权限的调用方可以检查任意主体
+AUTHZ_GRAPH_REFRESH_INTERVAL = float(os.getenv("AUTHZ_GRAPH_REFRESH_INTERVAL", "5"))  # 秒, 权限图按变更日志增量追赶的间隔
+AUTHZ_GRAPH_SNAPSHOT_PATH = os.getenv("AUTHZ_GRAPH_SNAPSHOT_PATH", "")  # 权限图快照文件, 未配置时每次启动全量加载
+AUTHZ_CHANGE_LOG_RETENTION = float(os.getenv("AUTHZ_CHANGE_LOG_RETENTION", "604800"))  # 秒, 变更日志保留时长, 更早的快照不再使用
+AUTHZ_CATCH_UP_MAX_CHANGES = int(os.getenv("AUTHZ_CATCH_UP_MAX_CHANGES", "50000"))  # 一次追赶超过这么多条变更时全量加载
+AUTHZ_SOCKET_PATH = os.getenv("AUTHZ_SOCKET_PATH", "")  # 权限检查 Unix 套接字路径, 未配置时不启动
+AUTHZ_SOCKET_MODE = int(os.getenv("AUTHZ_SOCKET_MODE", "660"), 8)  # 套接字文件权限, 只有同组进程可以连接
+MANIFEST_ADMIN_PERMISSION = os.getenv("MANIFEST_ADMIN_PERMISSION", "rbac:manage")  # 通过 HTTP 同步权限清单需要的权限
+# 启动时一次性解析路由使用的服务; 关闭后每次访问都从容器解析, 运行中对容器的 override 立即生效
+SERVICE_PREBIND = os.getenv("SERVICE_PREBIND", "true").lower() in ("1", "true", "yes")
 
 class ServiceContainer(containers.DeclarativeContainer):
     config = providers.Configuration()
@@ -21,21 +45,68 @@ class ServiceContainer(containers.DeclarativeContainer):
         secret_key=SECRET_KEY,
     )
     
+    rate_limit_store = providers.Singleton(
+        create_token_bucket_store,
+        redis_url=RATE_LIMIT_REDIS_URL,
+    )
+    
+    login_rate_limiter = providers.Singleton(
+        LoginRateLimiter,
+        store=rate_limit_store,
+        ip_capacity=LOGIN_IP_CAPACITY,
+        ip_refill_rate=LOGIN_IP_REFILL_RATE,
+        username_capacity=LOGIN_USERNAME_CAPACITY,
+        username_refill_rate=LOGIN_USERNAME_REFILL_RATE,
+    )
+    
+    permission_graph = providers.Singleton(
+        PermissionGraph,
+        user_dao=persist_container.user_dao,
+        role_dao=persist_container.role_dao,
+        permission_dao=persist_container.permission_dao,
+        change_log_dao=persist_container.change_log_dao,
+        snapshot_path=AUTHZ_GRAPH_SNAPSHOT_PATH,
+        change_log_retention=AUTHZ_CHANGE_LOG_RETENTION,
+        max_catch_up_changes=AUTHZ_CATCH_UP_MAX_CHANGES,
+    )
+    
     user_service = providers.Singleton(
         UserService,
         session=persist_container.session,
         user_dao=persist_container.user_dao,
         token_service=token_service,
+        role_dao=persist_container.role_dao,
+        permission_graph=permission_graph,
     )
     
     role_service = providers.Singleton(
         RoleService,
         session=persist_container.session,
         role_dao=persist_container.role_dao,
+        permission_dao=persist_container.permission_dao,
+        permission_graph=permission_graph,
     )
     
     permission_service = providers.Singleton(
         PermissionService,
         session=persist_container.session,
         permission_dao=persist_container.permission_dao,
+        permission_graph=permission_graph,
+    )
+    
+    manifest_service = providers.Singleton(
+        ManifestService,
+        manifest_dao=persist_container.manifest_dao,
+        permission_graph=permission_graph,
+        admin_permission=MANIFEST_ADMIN_PERMISSION,
+    )
+    
+    authz_service = providers.Singleton(
+        AuthzService,
+        token_service=token_service,
+        permission_graph=permission_graph,
+        max_batch=AUTHZ_MAX_BATCH,
+        token_cache_size=AUTHZ_TOKEN_CACHE_SIZE,
+        token_cache_ttl=AUTHZ_TOKEN_CACHE_TTL,
+        admin_permission=AUTHZ_ADMIN_PERMISSION,
     )
\ No newline at end of file
@@ -0,0 +1,120 @@
+import asyncio
+import time
+from typing import Optional
+
+from fastapi import HTTPException
+
+from persist.cache import MISS, LRUTTLCache
+from persist.tenant import DEFAULT_TENANT_ID, get_tenant_id
+from services.permission_graph import PermissionGraph
+from services.token_service import TokenService
+
+
+class AuthzService:
+    """
+    批量权限检查, 供网关和 sidecar 使用
+    主体可以是用户ID或访问令牌; 令牌校验结果按令牌缓存, 网关反复提交同一令牌时只校验一次
+    令牌主体在令牌所属的租户内检查, 用户ID主体在显式指定的租户(未指定时为当前请求的租户)内检查
+    HTTP 调用方只能检查自己, 持有 admin_permission 的调用方(如网关的服务账号)可以检查任意主体
+    """
+
+    # 每处理这么多条检查让出一次事件循环, 大批量请求不会长时间阻塞其他请求
+    CHUNK_SIZE = 4096
+
+    def __init__(
+        self,
+        token_service: TokenService,
+        permission_graph: PermissionGraph,
+        max_batch: int = 50000,
+        token_cache_size: int = 10000,
+        token_cache_ttl: float = 60.0,
+        admin_permission: str = "authz:check",
+    ):
+        self.token_service = token_service
+        self.permission_graph = permission_graph
+        self.max_batch = max_batch
+        self.token_cache_ttl = token_cache_ttl
+        self.admin_permission = admin_permission
+        self._tokens = LRUTTLCache(max_size=token_cache_size, ttl=token_cache_ttl)
+
+    def _resolve(self, token: str) -> Optional[tuple[int, int]]:
+        """
+        校验令牌并返回 (用户ID, 租户ID), 无效令牌返回 None
+        """
+        subject = self._tokens.get(token)
+        if subject is not MISS:
+            return subject
+        try:
+            payload = self.token_service.verify_token(token)
+            subject = (int(payload["sub"]), int(payload.get("tid", DEFAULT_TENANT_ID)))
+            # 缓存时间不超过令牌剩余有效期
+            ttl = min(self.token_cache_ttl, payload["exp"] - time.time())
+        except (HTTPException, KeyError, TypeError, ValueError):
+            subject, ttl = None, self.token_cache_ttl
+        self._tokens.set(token, subject, ttl)
+        return subject
+
+    def resolve_token(self, token: str) -> Optional[int]:
+        """
+        校验令牌并返回用户ID, 无效令牌返回 None
+        """
+        subject = self._resolve(token)
+        return subject[0] if subject is not None else None
+
+    def check(
+        self, subject: int | str, permission: str, context: Optional[dict] = None, tenant_id: Optional[int] = None
+    ) -> bool:
+        """
+        context 为请求上下文, 供带条件的授权求值
+        tenant_id 为用户ID主体所在的租户; 请求之外(如套接字)调用时必须指定, 否则会落到默认租户
+        """
+        if isinstance(subject, str):
+            resolved = self._resolve(subject)
+            if resolved is None:
+                return False
+            user_id, tenant_id = resolved
+        else:
+            user_id, tenant_id = subject, tenant_id if tenant_id is not None else get_tenant_id()
+        return self.permission_graph.check(user_id, permission, context, tenant_id)
+
+    def check_many(self, checks: list, context: Optional[dict] = None, tenant_id: Optional[int] = None) -> list[bool]:
+        """
+        每条检查为 (主体, 权限名) 或 (主体, 权限名, 上下文), 未单独指定上下文时使用 context
+        """
+        check = self.check
+        return [check(item[0], item[1], item[2] if len(item) > 2 else context, tenant_id) for item in checks]
+
+    def _is_self(self, subject: int | str, caller: int) -> bool:
+        if isinstance(subject, str):
+            return self._resolve(subject) == (caller, get_tenant_id())
+        return subject == caller
+
+    def authorize_caller(self, checks: list, caller: int):
+        """
+        调用方没有 admin_permission 时, 所有检查的主体都必须是调用方自己, 否则返回 403
+        """
+        if self.permission_graph.check(caller, self.admin_permission, None, get_tenant_id()):
+            return
+        if not all(self._is_self(item[0], caller) for item in checks):
+            raise HTTPException(status_code=403, detail="无权检查其他用户的权限")
+
+    async def check_batch(
+        self,
+        checks: list,
+        context: Optional[dict] = None,
+        caller: Optional[int] = None,
+        tenant_id: Optional[int] = None,
+    ) -> list[bool]:
+        """
+        按请求顺序返回每条检查的结果; caller 为 HTTP 请求的认证用户, 为 None 时不限制主体(本机套接字)
+        """
+        if len(checks) > self.max_batch:
+            raise HTTPException(status_code=413, detail=f"单次最多检查 {self.max_batch} 条")
+        if caller is not None:
+            self.authorize_caller(checks, caller)
+        results = []
+        for start in range(0, len(checks), self.CHUNK_SIZE):
+            if start:
+                await asyncio.sleep(0)
+            results.extend(self.check_many(checks[start:start + self.CHUNK_SIZE], context, tenant_id))
+        return results
@@ -0,0 +1,296 @@
+import heapq
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import time
+import zlib
+from array import array
+from bisect import bisect_left
+from typing import Iterator, Optional
+
+# 文件格式: 头部 + 段表 + 各段数据
+# 头部: 魔数、版本、段数、段表及数据的 CRC32、变更日志标记、生成时间; 标记对应的数据库快照文本存放在 change_snapshot 段
+# 每段为一个定长整数数组(int64, 8 字节对齐)或字节串, 加载时 mmap 后直接以 memoryview.cast 访问, 不复制
+MAGIC = b"RBACGRPH"
+VERSION = 2
+HEADER = struct.Struct("<8sHHIqd")
+SECTION = struct.Struct("<QQ")
+SECTIONS = (
+    ("permission_ids", "q"),
+    ("permission_name_offsets", "q"),
+    ("permission_names", "B"),
+    ("condition_offsets", "q"),
+    ("conditions", "B"),
+    ("role_ids", "q"),
+    ("grant_offsets", "q"),
+    ("grant_permission_ids", "q"),
+    # 条件在 conditions 中的下标, -1 表示无条件
+    ("grant_conditions", "q"),
+    # 用户按ID升序, 查找时二分
+    ("user_ids", "q"),
+    ("user_tenants", "q"),
+    ("user_offsets", "q"),
+    ("user_role_ids", "q"),
+    # 读取数据时的 txid 快照文本, 空表示没有
+    ("change_snapshot", "B"),
+)
+ALIGNMENT = 8
+
+
+class SnapshotError(ValueError):
+    """
+    快照文件缺失、损坏或版本不兼容, 调用方应回退到从数据库全量加载
+    """
+
+
+class UserRoleIndex:
+    """
+    用户 -> (租户, 角色) 的索引
+    基础数据来自快照的有序数组(mmap, 按需二分查找), 之后的变更写入覆盖层;
+    覆盖层中的角色集合整体替换而不原地修改, copy() 只需浅复制字典即可得到一致的副本
+    """
+
+    def __init__(self, user_ids=None, tenants=None, offsets=None, role_ids=None):
+        self._user_ids = user_ids if user_ids is not None else ()
+        self._tenants = tenants
+        self._offsets = offsets
+        self._role_ids = role_ids
+        self._overlay_roles: dict[int, frozenset] = {}
+        self._overlay_tenants: dict[int, int] = {}
+        # 覆盖层中不在基础数据里的用户数
+        self._added = 0
+
+    @classmethod
+    def from_rows(cls, user_roles) -> "UserRoleIndex":
+        """
+        由 (tenant_id, user_id, role_id) 行构建, 不使用基础数组
+        """
+        index = cls()
+        roles: dict[int, set[int]] = {}
+        for tenant_id, user_id, role_id in user_roles:
+            roles.setdefault(user_id, set()).add(role_id)
+            index._overlay_tenants[user_id] = tenant_id
+        index._overlay_roles = {user_id: frozenset(role_ids) for user_id, role_ids in roles.items()}
+        index._added = len(roles)
+        return index
+
+    def _find(self, user_id: int) -> int:
+        user_ids = self._user_ids
+        i = bisect_left(user_ids, user_id)
+        return i if i < len(user_ids) and user_ids[i] == user_id else -1
+
+    def roles(self, user_id: int):
+        roles = self._overlay_roles.get(user_id)
+        if roles is not None:
+            return roles
+        i = self._find(user_id)
+        if i < 0:
+            return None
+        return self._role_ids[self._offsets[i]:self._offsets[i + 1]]
+
+    def tenant(self, user_id: int) -> Optional[int]:
+        tenant_id = self._overlay_tenants.get(user_id)
+        if tenant_id is not None:
+            return tenant_id
+        i = self._find(user_id)
+        return self._tenants[i] if i >= 0 else None
+
+    def add(self, user_id: int, role_id: int, tenant_id: int):
+        roles = self.roles(user_id)
+        if user_id not in self._overlay_roles and roles is None:
+            self._added += 1
+        self._overlay_roles[user_id] = frozenset(roles or ()) | {role_id}
+        self._overlay_tenants[user_id] = tenant_id
+
+    def remove(self, user_id: int, role_id: int):
+        roles = self.roles(user_id)
+        if roles is not None and role_id in roles:
+            self._overlay_roles[user_id] = frozenset(roles) - {role_id}
+
+    def copy(self) -> "UserRoleIndex":
+        index = UserRoleIndex(self._user_ids, self._tenants, self._offsets, self._role_ids)
+        index._overlay_roles = dict(self._overlay_roles)
+        index._overlay_tenants = dict(self._overlay_tenants)
+        index._added = self._added
+        return index
+
+    def items(self) -> Iterator[tuple[int, int, tuple]]:
+        """
+        按用户ID升序返回 (user_id, tenant_id, 角色ID), 跳过没有角色的用户
+        """
+        added = sorted(user_id for user_id in self._overlay_roles if self._find(user_id) < 0)
+        for user_id in heapq.merge(self._user_ids, added):
+            roles = self.roles(user_id)
+            if roles:
+                yield user_id, self.tenant(user_id), tuple(roles)
+
+    def __len__(self) -> int:
+        return len(self._user_ids) + self._added
+
+
+class GraphSnapshot:
+    """
+    从快照文件读出的权限图数据; 用户部分保持为 mmap 上的数组, 权限名和授权在读取时解码(规模为角色数 x 授权数)
+    """
+
+    def __init__(self, marker: int, change_snapshot: Optional[str], created_at: float, permission_names: dict,
+                 role_permissions: dict, users: UserRoleIndex, size: int):
+        self.marker = marker
+        self.change_snapshot = change_snapshot
+        self.created_at = created_at
+        self.permission_names = permission_names
+        self.role_permissions = role_permissions
+        self.users = users
+        self.size = size
+
+
+def _strings(values: list[str]) -> tuple[array, bytes]:
+    offsets = array("q", [0])
+    encoded = []
+    total = 0
+    for value in values:
+        data = value.encode()
+        encoded.append(data)
+        total += len(data)
+        offsets.append(total)
+    return offsets, b"".join(encoded)
+
+
+def write_snapshot(path: str, marker: int, change_snapshot: Optional[str], permission_names: dict[int, str],
+                   role_permissions: dict[int, dict[int, Optional[str]]], users: UserRoleIndex) -> int:
+    """
+    写入快照文件并返回字节数; 先写临时文件再原子替换, 读取方不会看到写了一半的文件
+    调用方传入的字典和索引在写入期间不能被修改(在线程中写入时先 copy)
+    """
+    if sys.byteorder != "little":
+        raise SnapshotError("快照只支持小端平台")
+    permission_ids = array("q", permission_names)
+    name_offsets, names = _strings([permission_names[permission_id] for permission_id in permission_ids])
+
+    conditions: dict[str, int] = {}
+    role_ids = array("q")
+    grant_offsets = array("q", [0])
+    grant_permission_ids = array("q")
+    grant_conditions = array("q")
+    for role_id, grants in role_permissions.items():
+        role_ids.append(role_id)
+        for permission_id, condition in grants.items():
+            grant_permission_ids.append(permission_id)
+            grant_conditions.append(conditions.setdefault(condition, len(conditions)) if condition else -1)
+        grant_offsets.append(len(grant_permission_ids))
+    condition_offsets, condition_data = _strings(list(conditions))
+
+    user_ids = array("q")
+    user_tenants = array("q")
+    user_offsets = array("q", [0])
+    user_role_ids = array("q")
+    for user_id, tenant_id, roles in users.items():
+        user_ids.append(user_id)
+        user_tenants.append(tenant_id)
+        user_role_ids.extend(roles)
+        user_offsets.append(len(user_role_ids))
+
+    sections = {
+        "permission_ids": permission_ids,
+        "permission_name_offsets": name_offsets,
+        "permission_names": names,
+        "condition_offsets": condition_offsets,
+        "conditions": condition_data,
+        "role_ids": role_ids,
+        "grant_offsets": grant_offsets,
+        "grant_permission_ids": grant_permission_ids,
+        "grant_conditions": grant_conditions,
+        "user_ids": user_ids,
+        "user_tenants": user_tenants,
+        "user_offsets": user_offsets,
+        "user_role_ids": user_role_ids,
+        "change_snapshot": (change_snapshot or "").encode(),
+    }
+    table = bytearray()
+    body = bytearray()
+    offset = HEADER.size + SECTION.size * len(SECTIONS)
+    for name, _ in SECTIONS:
+        data = memoryview(sections[name]).cast("B")
+        padding = -(offset + len(body)) % ALIGNMENT
+        body += b"\0" * padding
+        table += SECTION.pack(offset + len(body), len(data))
+        body += data
+    checksum = zlib.crc32(body, zlib.crc32(table))
+    header = HEADER.pack(MAGIC, VERSION, len(SECTIONS), checksum, marker, time.time())
+
+    # 临时文件名唯一, 多个 worker 同时写入同一路径时互不覆盖, 最后一次替换生效
+    fd, temp_path = tempfile.mkstemp(prefix=f"{os.path.basename(path)}.", suffix=".tmp", dir=os.path.dirname(path) or ".")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(header)
+            f.write(table)
+            f.write(body)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+        raise
+    return len(header) + len(table) + len(body)
+
+
+def read_snapshot(path: str) -> GraphSnapshot:
+    """
+    mmap 读取快照, 校验魔数、版本和 CRC32 后返回; 任何不一致都抛出 SnapshotError
+    """
+    if sys.byteorder != "little":
+        raise SnapshotError("快照只支持小端平台")
+    try:
+        with open(path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError) as e:
+        raise SnapshotError(f"无法读取快照 {path}: {e}") from e
+    view = memoryview(mapped)
+    if len(view) < HEADER.size:
+        raise SnapshotError("快照文件不完整")
+    magic, version, count, checksum, marker, created_at = HEADER.unpack_from(view)
+    if magic != MAGIC:
+        raise SnapshotError("不是权限图快照文件")
+    if version != VERSION or count != len(SECTIONS):
+        raise SnapshotError(f"快照版本 {version} 与当前版本 {VERSION} 不兼容")
+    if zlib.crc32(view[HEADER.size:]) != checksum:
+        raise SnapshotError("快照校验和不一致")
+
+    sections = {}
+    for i, (name, typecode) in enumerate(SECTIONS):
+        offset, length = SECTION.unpack_from(view, HEADER.size + SECTION.size * i)
+        if offset + length > len(view):
+            raise SnapshotError(f"快照段 {name} 越界")
+        sections[name] = view[offset:offset + length].cast(typecode)
+
+    names = sections["permission_names"].tobytes()
+    name_offsets = sections["permission_name_offsets"]
+    permission_names = {
+        permission_id: names[name_offsets[i]:name_offsets[i + 1]].decode()
+        for i, permission_id in enumerate(sections["permission_ids"])
+    }
+    condition_data = sections["conditions"].tobytes()
+    condition_offsets = sections["condition_offsets"]
+    conditions = [
+        condition_data[condition_offsets[i]:condition_offsets[i + 1]].decode()
+        for i in range(len(condition_offsets) - 1)
+    ]
+    grant_offsets = sections["grant_offsets"]
+    grant_permission_ids = sections["grant_permission_ids"].tolist()
+    grant_conditions = sections["grant_conditions"].tolist()
+    role_permissions = {}
+    for i, role_id in enumerate(sections["role_ids"]):
+        start, end = grant_offsets[i], grant_offsets[i + 1]
+        role_permissions[role_id] = {
+            permission_id: conditions[condition] if condition >= 0 else None
+            for permission_id, condition in zip(grant_permission_ids[start:end], grant_conditions[start:end])
+        }
+
+    users = UserRoleIndex(
+        sections["user_ids"], sections["user_tenants"], sections["user_offsets"], sections["user_role_ids"]
+    )
+    change_snapshot = sections["change_snapshot"].tobytes().decode() or None
+    return GraphSnapshot(marker, change_snapshot, created_at, permission_names, role_permissions, users, len(view))
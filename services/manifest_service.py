@@ -0,0 +1,174 @@
+import time
+
+import orjson
+from fastapi import HTTPException
+from pydantic import ValidationError
+
+from persist.manifest_dao import ManifestDao, ManifestPlan, ManifestState
+from persist.tenant import get_tenant_id
+from services.model.manifest_vo import ManifestGrant, RbacManifest
+from services.permission_graph import PermissionGraph
+from services.permission_trie import is_valid_permission_name
+from services.policy_condition import ConditionError, compile_condition
+
+
+def parse_manifest(raw: bytes, fmt: str = "json") -> RbacManifest:
+    """
+    解析 JSON 或 YAML 格式的清单, YAML 需要安装 pyyaml
+    """
+    if fmt == "yaml":
+        try:
+            import yaml
+        except ImportError:
+            raise HTTPException(status_code=415, detail="解析 YAML 清单需要安装 pyyaml 包: pip install pyyaml")
+        try:
+            data = yaml.safe_load(raw)
+        except yaml.YAMLError as e:
+            raise HTTPException(status_code=400, detail=f"清单格式错误: {e}")
+    else:
+        try:
+            data = orjson.loads(raw)
+        except orjson.JSONDecodeError as e:
+            raise HTTPException(status_code=400, detail=f"清单格式错误: {e}")
+    try:
+        return RbacManifest.model_validate(data or {})
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors(include_url=False, include_context=False))
+
+
+def build_plan(manifest: RbacManifest, state: ManifestState) -> ManifestPlan:
+    """
+    对比清单与数据库的当前状态, 清单中的错误(重复、无效名称、引用不存在的权限、无效条件)以 400 拒绝
+    """
+    plan = ManifestPlan()
+
+    declared_permissions = set()
+    for permission in manifest.permissions:
+        if not is_valid_permission_name(permission.name):
+            raise HTTPException(status_code=400, detail=f"权限名格式错误: {permission.name}")
+        if permission.name in declared_permissions:
+            raise HTTPException(status_code=400, detail=f"权限重复: {permission.name}")
+        declared_permissions.add(permission.name)
+        existing = state.permissions.get(permission.name)
+        if existing is None:
+            plan.create_permissions.append({"name": permission.name, "description": permission.description})
+        elif existing[1] != permission.description:
+            plan.update_permissions.append(
+                {"id": existing[0], "name": permission.name, "description": permission.description}
+            )
+
+    # 相同条件只编译一次
+    conditions: set[str] = set()
+    declared_roles = set()
+    for role in manifest.roles:
+        if role.name in declared_roles:
+            raise HTTPException(status_code=400, detail=f"角色重复: {role.name}")
+        declared_roles.add(role.name)
+        existing = state.roles.get(role.name)
+        role_id = existing[0] if existing else None
+        if existing is None:
+            plan.create_roles.append({"name": role.name, "description": role.description})
+        elif existing[1] != role.description:
+            plan.update_roles.append({"id": role_id, "name": role.name, "description": role.description})
+
+        # 该角色当前的授权 {权限ID: 条件}, 新角色为空
+        current = state.grants.get(role_id, {}) if role_id is not None else {}
+        granted = set()
+        for grant in role.grants:
+            if isinstance(grant, ManifestGrant):
+                name, condition = grant.permission, grant.condition or None
+            else:
+                name, condition = grant, None
+            if name in granted:
+                raise HTTPException(status_code=400, detail=f"角色 {role.name} 重复授权: {name}")
+            granted.add(name)
+            if name not in declared_permissions and name not in state.permissions:
+                raise HTTPException(status_code=400, detail=f"角色 {role.name} 引用了不存在的权限: {name}")
+            if condition and condition not in conditions:
+                try:
+                    compile_condition(condition)
+                except ConditionError as e:
+                    raise HTTPException(status_code=400, detail=f"角色 {role.name} 对 {name} 的授权条件无效: {e}")
+                conditions.add(condition)
+
+            permission = state.permissions.get(name)
+            if permission is None or permission[0] not in current:
+                plan.create_grants.append((role.name, name, condition))
+            elif current[permission[0]] != condition:
+                plan.update_grants.append((role_id, permission[0], condition, role.name, name))
+
+        # 清单中的角色以清单为准, 删除多余的授权
+        granted_ids = {state.permissions[name][0] for name in granted if name in state.permissions}
+        for permission_id in current:
+            if permission_id not in granted_ids:
+                plan.delete_grants.append((role_id, permission_id, role.name, state.permission_names[permission_id]))
+    return plan
+
+
+def summarize(plan: ManifestPlan, details: bool) -> dict:
+    changes = {
+        "permissions": {"create": len(plan.create_permissions), "update": len(plan.update_permissions)},
+        "roles": {"create": len(plan.create_roles), "update": len(plan.update_roles)},
+        "grants": {
+            "create": len(plan.create_grants),
+            "update": len(plan.update_grants),
+            "delete": len(plan.delete_grants),
+        },
+    }
+    if not details:
+        return changes
+    changes["permissions"]["items"] = {
+        "create": [row["name"] for row in plan.create_permissions],
+        "update": [row["name"] for row in plan.update_permissions],
+    }
+    changes["roles"]["items"] = {
+        "create": [row["name"] for row in plan.create_roles],
+        "update": [row["name"] for row in plan.update_roles],
+    }
+    changes["grants"]["items"] = {
+        "create": [[role, permission, condition] for role, permission, condition in plan.create_grants],
+        "update": [[role, permission, condition] for _, _, condition, role, permission in plan.update_grants],
+        "delete": [[role, permission] for _, _, role, permission in plan.delete_grants],
+    }
+    return changes
+
+
+class ManifestService:
+    """
+    声明式同步角色、权限和授权: 少量集合查询读取租户现状, 在内存中计算差异, 一个事务内只写入变更
+    HTTP 调用方需要持有 admin_permission; 命令行直接访问数据库, 不做检查
+    """
+
+    def __init__(
+        self, manifest_dao: ManifestDao, permission_graph: PermissionGraph, admin_permission: str = "rbac:manage"
+    ):
+        self.manifest_dao = manifest_dao
+        self.permission_graph = permission_graph
+        self.admin_permission = admin_permission
+
+    def authorize_caller(self, caller: int):
+        """
+        调用方在当前租户没有 admin_permission 时返回 403
+        """
+        if not self.permission_graph.check(caller, self.admin_permission, None, get_tenant_id()):
+            raise HTTPException(status_code=403, detail="无权同步权限清单")
+
+    async def sync(self, manifest: RbacManifest, dry_run: bool = False, details: bool | None = None) -> dict:
+        """
+        details 默认在 dry_run 时输出变更明细, 否则只输出数量
+        """
+        start = time.perf_counter()
+        plan = await self.manifest_dao.sync(lambda state: build_plan(manifest, state), dry_run)
+        applied = not dry_run and not plan.is_empty()
+        # 本进程已加载权限图时立即追赶变更日志; 其他进程依靠周期性追赶
+        if applied and self.permission_graph.loaded_at:
+            graph_start = time.perf_counter()
+            await self.permission_graph.refresh()
+            plan.timing["graph_refresh"] = round(time.perf_counter() - graph_start, 3)
+        plan.timing["total"] = round(time.perf_counter() - start, 3)
+        return {
+            "dry_run": dry_run,
+            "applied": applied,
+            "changes": summarize(plan, dry_run if details is None else details),
+            "timing": plan.timing,
+        }
@@ -0,0 +1,13 @@
+from pydantic import BaseModel
+
+
+class AuthzCheckRequest(BaseModel):
+    # 每条检查为 [主体, 权限名] 或 [主体, 权限名, 上下文], 主体是用户ID(整数)或访问令牌(字符串)
+    checks: list[tuple[int | str, str] | tuple[int | str, str, dict]]
+    # 带条件的授权求值时使用的默认上下文, 如 {"resource": {"owner_id": 1}, "request": {"ip": "10.0.0.1"}}
+    context: dict | None = None
+
+
+class AuthzCheckResponse(BaseModel):
+    # 与 checks 一一对应
+    results: list[bool]
@@ -0,0 +1,27 @@
+from pydantic import BaseModel, Field
+
+
+class ManifestGrant(BaseModel):
+    permission: str
+    condition: str | None = None
+
+
+class ManifestRole(BaseModel):
+    name: str = Field(max_length=50)
+    description: str | None = Field(default=None, max_length=255)
+    # 权限名, 或 {"permission": 权限名, "condition": 条件表达式}
+    grants: list[str | ManifestGrant] = []
+
+
+class ManifestPermission(BaseModel):
+    name: str
+    description: str | None = Field(default=None, max_length=255)
+
+
+class RbacManifest(BaseModel):
+    """
+    声明式的角色、权限和授权清单
+    清单中出现的角色, 其授权以清单为准(多余的授权会被删除); 未出现的角色和权限保持不变
+    """
+    permissions: list[ManifestPermission] = []
+    roles: list[ManifestRole] = []
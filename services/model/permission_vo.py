@@ -1,8 +1,18 @@
 
 
+from datetime import datetime
+
 from pydantic import BaseModel
 
 
 class PermissionCreate(BaseModel):
     name: str
-    description: str | None = None  
\ No newline at end of file
+    description: str | None = None
+
+
+class PermissionRead(BaseModel):
+    id: int
+    name: str
+    description: str | None = None
+    created_at: datetime
+    updated_at: datetime
\ No newline at end of file
@@ -1,11 +1,28 @@
+from datetime import datetime
+
 from pydantic import BaseModel
 
 
 class RolePermission(BaseModel):
     role_id: int
     permission_id: int
+    # 授权条件, 如 "resource.owner_id == user.id and ip_in(request.ip, '10.0.0.0/8')"
+    condition: str | None = None
     
 
 class RoleCreate(BaseModel):
     name: str
-    description: str | None = None
\ No newline at end of file
+    description: str | None = None
+
+
+class RoleRead(BaseModel):
+    id: int
+    name: str
+    description: str | None = None
+    created_at: datetime
+    updated_at: datetime
+
+
+class RolePermissions(BaseModel):
+    role: str
+    permission: list[str]
\ No newline at end of file
@@ -1,5 +1,7 @@
 
 
+from datetime import datetime
+
 from pydantic import BaseModel
 
 
@@ -16,4 +18,22 @@ class UserCreate(BaseModel):
 
 class UserLogin(BaseModel):
     username: str
-    password: str
\ No newline at end of file
+    password: str
+
+
+class UserRead(BaseModel):
+    id: int
+    username: str
+    email: str | None = None
+    created_at: datetime
+    updated_at: datetime
+
+
+class UserRoles(BaseModel):
+    username: str
+    role: list[str]
+
+
+class UserToken(BaseModel):
+    access_token: str
+    token_type: str = "bearer"
\ No newline at end of file
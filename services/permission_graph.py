@@ -0,0 +1,316 @@
+import asyncio
+import logging
+import time
+from typing import Optional
+
+from persist.change_log_dao import ChangeLogDao
+from persist.permission_dao import PermissionDao
+from persist.role_dao import RoleDao
+from persist.user_dao import UserDao
+from services.graph_snapshot import SnapshotError, UserRoleIndex, read_snapshot, write_snapshot
+from services.permission_trie import SEPARATOR, PermissionTrie
+from services.policy_condition import Condition, ConditionError, compile_condition
+
+
+logger = logging.getLogger("PermissionGraph")
+
+# 变更日志的清理间隔(秒), 多个进程同时清理互不影响
+CHANGE_LOG_TRIM_INTERVAL = 3600
+
+
+def _deny(context: dict) -> bool:
+    return False
+
+
+def _with_user(context: Optional[dict], user_id: int) -> dict:
+    """
+    条件中的 user.id 始终为当前检查的用户, 调用方不能覆盖
+    """
+    context = dict(context or {})
+    user = context.get("user")
+    context["user"] = {**user, "id": user_id} if isinstance(user, dict) else {"id": user_id}
+    return context
+
+
+class PermissionGraph:
+    """
+    内存中的权限图: 用户 -> 角色 -> 权限
+    启动时从快照恢复(或从数据库全量加载), 本进程的授权操作增量更新, 其他进程的写入通过变更日志周期性追赶
+    每个角色的授权(具体权限名或 users:* 这样的通配模式)编译为一棵前缀树, 检查不访问数据库
+    授权上的条件在加载时编译为闭包, 检查时对请求上下文求值, 上下文中的 user.id 总是当前用户
+    用户、角色、权限的ID在所有租户间唯一, 图按ID索引即可; 另记录每个用户所属的租户,
+    检查时指定租户可拒绝跨租户的查询
+    """
+
+    def __init__(
+        self,
+        user_dao: UserDao,
+        role_dao: RoleDao,
+        permission_dao: PermissionDao,
+        change_log_dao: Optional[ChangeLogDao] = None,
+        snapshot_path: str = "",
+        change_log_retention: float = 7 * 86400,
+        max_catch_up_changes: int = 50000,
+    ):
+        self.user_dao = user_dao
+        self.role_dao = role_dao
+        self.permission_dao = permission_dao
+        self.change_log_dao = change_log_dao
+        self.snapshot_path = snapshot_path
+        self.change_log_retention = change_log_retention
+        # 一次追赶的变更超过这么多条时改为全量加载, 大批量导入后逐条应用不如重新加载
+        self.max_catch_up_changes = max_catch_up_changes
+        self._permission_names: dict[int, str] = {}
+        # 角色 -> {权限ID: 条件表达式, 无条件授权为 None}; 内层字典整体替换而不原地修改, 写快照时浅复制即可
+        self._role_permissions: dict[int, dict[int, Optional[str]]] = {}
+        # 按表达式缓存编译结果, 相同条件只编译一次
+        self._conditions: dict[str, Condition] = {}
+        self._has_conditions = False
+        # 前缀树在角色首次被检查时编译, 加载和恢复快照时不必编译全部角色
+        self._role_tries: dict[int, PermissionTrie] = {}
+        self._users = UserRoleIndex()
+        # 变更日志标记: 数据对应的快照中最早的未完成事务ID, 追赶时读取之后的变更; 未使用变更日志时为 None
+        self.marker: Optional[int] = None
+        # 上次追赶时的数据库快照, 下次追赶只读取在其中不可见的变更
+        self._change_snapshot: Optional[str] = None
+        self.loaded_at = 0.0
+        self.source = None
+        self.snapshot_load_ms = None
+        self.changes_applied = 0
+        self._trimmed_at = 0.0
+
+    async def load(self):
+        """
+        全量加载权限数据, 构建完成后一次性替换, 加载期间的检查仍使用旧数据
+        有变更日志时标记和数据在同一个快照中读取(主库), 否则并发读取(可走只读副本)
+        """
+        if self.change_log_dao is not None:
+            marker, snapshot, permissions, role_permissions, user_roles = await self.change_log_dao.load_graph_state()
+        else:
+            marker, snapshot = None, None
+            permissions, role_permissions, user_roles = await asyncio.gather(
+                self.permission_dao.list_permission_names(),
+                self.role_dao.list_role_permissions(),
+                self.user_dao.list_user_roles(),
+            )
+        role_map: dict[int, dict[int, Optional[str]]] = {}
+        for role_id, permission_id, condition in role_permissions:
+            role_map.setdefault(role_id, {})[permission_id] = condition
+        self._install(dict(permissions), role_map, UserRoleIndex.from_rows(user_roles), marker, snapshot, "database")
+        logger.info(
+            f"权限图加载完成: {len(permissions)} 个权限, {len(role_permissions)} 条角色授权, "
+            f"{len(user_roles)} 条用户角色"
+        )
+
+    def _install(self, permission_names: dict, role_map: dict, users: UserRoleIndex, marker: Optional[int],
+                 change_snapshot: Optional[str], source: str):
+        self._permission_names = permission_names
+        self._role_permissions = role_map
+        self._has_conditions = any(condition for grants in role_map.values() for condition in grants.values())
+        self._role_tries = {}
+        self._users = users
+        self.marker = marker
+        # 与数据同一个快照: 第一次追赶就能跳过加载时已可见的变更, 不会把之后的写入回退成旧值
+        self._change_snapshot = change_snapshot
+        self.source = source
+        self.loaded_at = time.time()
+
+    async def warm_start(self):
+        """
+        启动时加载: 有可用的快照时从快照恢复并追赶之后的变更, 否则全量加载并写入快照
+        追赶失败(数据库不可用)时保留快照数据并抛出异常, 由后台刷新任务重试
+        """
+        if self.snapshot_path and self.change_log_dao is not None and await self.restore(self.snapshot_path):
+            if await self.catch_up():
+                return
+        await self.load()
+        if self.snapshot_path:
+            await self.save_snapshot()
+
+    async def restore(self, path: str) -> bool:
+        """
+        从快照恢复, 文件缺失、损坏或早于变更日志的保留期时返回 False
+        """
+        start = time.perf_counter()
+        try:
+            snapshot = await asyncio.to_thread(read_snapshot, path)
+        except SnapshotError as e:
+            logger.info(f"权限图快照不可用, 全量加载: {e}")
+            return False
+        if time.time() - snapshot.created_at > self.change_log_retention:
+            logger.info("权限图快照早于变更日志的保留期, 全量加载")
+            return False
+        self._install(
+            snapshot.permission_names, snapshot.role_permissions, snapshot.users, snapshot.marker,
+            snapshot.change_snapshot, "snapshot"
+        )
+        self.snapshot_load_ms = round((time.perf_counter() - start) * 1000, 2)
+        logger.info(
+            f"权限图从快照恢复: {len(snapshot.permission_names)} 个权限, {len(snapshot.role_permissions)} 个角色, "
+            f"{len(snapshot.users)} 个用户, 耗时 {self.snapshot_load_ms} ms"
+        )
+        return True
+
+    async def save_snapshot(self, path: str = "") -> Optional[int]:
+        """
+        在线程中写入快照, 返回字节数; 没有变更日志标记时无法追赶, 不写入
+        """
+        path = path or self.snapshot_path
+        if not path or self.marker is None:
+            return None
+        # 浅复制即可得到一致的副本: 内层集合和字典都是整体替换的
+        return await asyncio.to_thread(
+            write_snapshot, path, self.marker, self._change_snapshot, dict(self._permission_names),
+            dict(self._role_permissions), self._users.copy()
+        )
+
+    async def catch_up(self) -> bool:
+        """
+        应用标记之后的变更并推进标记; 遇到整表清空或变更超过 max_catch_up_changes 条时返回 False, 需要全量加载
+        变更可能与本进程已应用的写入重复, 按最后写入为准应用, 结果不变
+        """
+        marker, snapshot, changes = await self.change_log_dao.list_changes(
+            self.marker, self._change_snapshot, self.max_catch_up_changes + 1
+        )
+        if len(changes) > self.max_catch_up_changes:
+            logger.info(f"待追赶的变更超过 {self.max_catch_up_changes} 条, 全量加载")
+            return False
+        names = self._permission_names
+        role_map = self._role_permissions
+        users = self._users
+        copied_roles: set[int] = set()
+        touched_permissions: set[int] = set()
+        for entity, op, user_id, role_id, permission_id, tenant_id, name, condition in changes:
+            if op == "T":
+                return False
+            if entity == "userrole":
+                if op == "I":
+                    users.add(user_id, role_id, tenant_id)
+                else:
+                    users.remove(user_id, role_id)
+            elif entity == "role_permission":
+                if role_id not in copied_roles:
+                    role_map[role_id] = dict(role_map.get(role_id, {}))
+                    copied_roles.add(role_id)
+                if op == "I":
+                    role_map[role_id][permission_id] = condition
+                    if condition:
+                        self._has_conditions = True
+                else:
+                    role_map[role_id].pop(permission_id, None)
+            elif op == "I":
+                names[permission_id] = name
+                touched_permissions.add(permission_id)
+            else:
+                names.pop(permission_id, None)
+                touched_permissions.add(permission_id)
+
+        # 权限改名或删除时, 引用它的角色也需要重新编译
+        if touched_permissions:
+            copied_roles.update(
+                role_id for role_id, grants in role_map.items() if not touched_permissions.isdisjoint(grants)
+            )
+        for role_id in copied_roles:
+            self._role_tries.pop(role_id, None)
+        self.marker = marker
+        self._change_snapshot = snapshot
+        self.changes_applied += len(changes)
+        return True
+
+    async def refresh(self):
+        """
+        同步其他进程的写入: 有变更日志时增量追赶, 否则(或追赶遇到整表清空时)全量加载
+        """
+        if self.change_log_dao is None or self.marker is None or not await self.catch_up():
+            await self.load()
+
+    async def run_refresh(self, interval: float):
+        """
+        周期性同步, 在 lifespan 中作为后台任务运行; 同时定期清理过期的变更日志
+        """
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.refresh()
+                if self.change_log_dao is not None and time.monotonic() - self._trimmed_at > CHANGE_LOG_TRIM_INTERVAL:
+                    self._trimmed_at = time.monotonic()
+                    await self.change_log_dao.trim(self.change_log_retention)
+            except Exception as e:
+                logger.warning(f"权限图刷新失败: {e}")
+
+    def _condition(self, source: str) -> Condition:
+        condition = self._conditions.get(source)
+        if condition is None:
+            try:
+                condition = compile_condition(source)
+            except ConditionError as e:
+                # 数据库中的条件无法编译时, 该授权一律不生效
+                logger.warning(f"授权条件编译失败, 按拒绝处理: {source!r}: {e}")
+                condition = _deny
+            self._conditions[source] = condition
+        return condition
+
+    def _compile(self, grants: dict[int, Optional[str]], permission_names: dict[int, str]) -> PermissionTrie:
+        trie = PermissionTrie()
+        for permission_id, condition in grants.items():
+            if permission_id in permission_names:
+                trie.add(permission_names[permission_id], self._condition(condition) if condition else None)
+        return trie
+
+    def add_permission(self, permission_id: int, name: str):
+        self._permission_names[permission_id] = name
+
+    def add_user_role(self, user_id: int, role_id: int, tenant_id: int):
+        self._users.add(user_id, role_id, tenant_id)
+
+    def add_role_permission(self, role_id: int, permission_id: int, condition: Optional[str] = None):
+        grants = {**self._role_permissions.get(role_id, {}), permission_id: condition}
+        self._role_permissions[role_id] = grants
+        if condition:
+            self._has_conditions = True
+        # 只让变更的角色在下次检查时重新编译
+        self._role_tries.pop(role_id, None)
+
+    def check(
+        self, user_id: int, permission: str, context: Optional[dict] = None, tenant_id: Optional[int] = None
+    ) -> bool:
+        """
+        tenant_id 不为空时, 用户不属于该租户一律拒绝
+        """
+        users = self._users
+        role_ids = users.roles(user_id)
+        if not role_ids:
+            return False
+        if tenant_id is not None and users.tenant(user_id) != tenant_id:
+            return False
+        segments = permission.split(SEPARATOR)
+        if self._has_conditions:
+            context = _with_user(context, user_id)
+        role_tries = self._role_tries
+        for role_id in role_ids:
+            trie = role_tries.get(role_id)
+            if trie is None:
+                trie = self._role_trie(role_id)
+            if trie is not None and trie.match_segments(segments, context):
+                return True
+        return False
+
+    def _role_trie(self, role_id: int) -> Optional[PermissionTrie]:
+        grants = self._role_permissions.get(role_id)
+        if grants is None:
+            return None
+        trie = self._role_tries[role_id] = self._compile(grants, self._permission_names)
+        return trie
+
+    def stats(self) -> dict:
+        return {
+            "permissions": len(self._permission_names),
+            "roles": len(self._role_permissions),
+            "conditions": len(self._conditions),
+            "users": len(self._users),
+            "loaded_at": self.loaded_at,
+            "source": self.source,
+            "marker": self.marker,
+            "snapshot_load_ms": self.snapshot_load_ms,
+            "changes_applied": self.changes_applied,
+        }
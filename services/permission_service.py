@@ -6,14 +6,21 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from persist.models.permission_model import Permission
 from persist.permission_dao import PermissionDao
 from services.model.permission_vo import PermissionCreate
+from services.permission_graph import PermissionGraph
+from services.permission_trie import is_valid_permission_name
+from utils.tracing import traced_class
 
 
+@traced_class
 class PermissionService:
-    def __init__(self, session: AsyncSession, permission_dao: PermissionDao):
+    def __init__(self, session: AsyncSession, permission_dao: PermissionDao, permission_graph: PermissionGraph):
         self.session = session
         self.permission_dao = permission_dao
+        self.permission_graph = permission_graph
 
     async def create_permission(self, permission: PermissionCreate) -> Permission:
+        if not is_valid_permission_name(permission.name):
+            raise HTTPException(status_code=400, detail="权限名格式错误, 应为 : 分隔的段, 如 users:read 或 users:*")
         permission_exist = await self.permission_dao.get_permission_by_name(permission.name)
         if permission_exist:
             raise HTTPException(status_code=400, detail="权限已存在")
@@ -21,4 +28,6 @@ class PermissionService:
             name=permission.name,
             description=permission.description,
         )
-        return await self.permission_dao.create_permission(permission)
\ No newline at end of file
+        permission = await self.permission_dao.create_permission(permission)
+        self.permission_graph.add_permission(permission.id, permission.name)
+        return permission
\ No newline at end of file
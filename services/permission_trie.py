@@ -0,0 +1,104 @@
+import re
+from typing import Callable, Dict, Iterable, Optional
+
+
+# 权限名分段分隔符, 如 users:read、users:profile:update
+SEPARATOR = ":"
+# 通配段: 位于中间时匹配恰好一段, 位于末尾时匹配剩余的一段或多段
+WILDCARD = "*"
+MAX_PERMISSION_NAME_LENGTH = 255
+
+_SEGMENT = re.compile(r"^(\*|[A-Za-z0-9_.\-]+)$")
+
+
+def is_valid_permission_name(name: str) -> bool:
+    """
+    每段为字母、数字、_ . - 组成的非空字符串, 或单独的 *
+    """
+    if not name or len(name) > MAX_PERMISSION_NAME_LENGTH:
+        return False
+    return all(_SEGMENT.match(segment) for segment in name.split(SEPARATOR))
+
+
+def is_wildcard(name: str) -> bool:
+    return WILDCARD in name.split(SEPARATOR)
+
+
+class _Node:
+    __slots__ = ("children", "wildcard", "granted", "tail", "granted_if", "tail_if")
+
+    def __init__(self):
+        self.children: Dict[str, "_Node"] = {}
+        self.wildcard: Optional["_Node"] = None  # 中间的 * 段
+        self.granted = False  # 权限名在此结束时命中
+        self.tail = False  # 末尾的 *: 此节点下的所有权限均命中
+        # 带条件的授权, 满足任一条件时命中
+        self.granted_if: list[Callable[[dict], bool]] = []
+        self.tail_if: list[Callable[[dict], bool]] = []
+
+
+def _any_condition(conditions: list, context: Optional[dict]) -> bool:
+    if not conditions:
+        return False
+    context = context or {}
+    return any(condition(context) for condition in conditions)
+
+
+class PermissionTrie:
+    """
+    单个角色的权限前缀树
+    由角色的授权(具体权限名或通配模式)编译而成, 按名称段逐级匹配,
+    判断耗时只与权限名的段数相关, 与角色拥有的授权数量无关
+    """
+
+    def __init__(self, names: Iterable[str] = ()):
+        self.root = _Node()
+        self.size = 0
+        for name in names:
+            self.add(name)
+
+    def add(self, name: str, condition: Optional[Callable[[dict], bool]] = None):
+        """
+        添加一条授权, condition 为编译后的授权条件, None 表示无条件授权
+        """
+        segments = name.split(SEPARATOR)
+        node = self.root
+        for index, segment in enumerate(segments):
+            if segment == WILDCARD:
+                if index == len(segments) - 1:
+                    if condition is None:
+                        node.tail = True
+                    else:
+                        node.tail_if.append(condition)
+                    self.size += 1
+                    return
+                if node.wildcard is None:
+                    node.wildcard = _Node()
+                node = node.wildcard
+            else:
+                node = node.children.setdefault(segment, _Node())
+        if condition is None:
+            node.granted = True
+        else:
+            node.granted_if.append(condition)
+        self.size += 1
+
+    def match(self, name: str, context: Optional[dict] = None) -> bool:
+        return self._match(self.root, name.split(SEPARATOR), 0, context)
+
+    def match_segments(self, segments: list[str], context: Optional[dict] = None) -> bool:
+        """
+        context 为请求上下文, 只在匹配到带条件的授权时使用
+        """
+        return self._match(self.root, segments, 0, context)
+
+    def _match(self, node: _Node, segments: list[str], index: int, context: Optional[dict]) -> bool:
+        if index == len(segments):
+            return node.granted or _any_condition(node.granted_if, context)
+        if node.tail or _any_condition(node.tail_if, context):
+            return True
+        child = node.children.get(segments[index])
+        if child is not None and self._match(child, segments, index + 1, context):
+            return True
+        # 字面段不匹配时尝试中间的通配段
+        return node.wildcard is not None and self._match(node.wildcard, segments, index + 1, context)
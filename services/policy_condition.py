@@ -0,0 +1,189 @@
+import ast
+import ipaddress
+import operator
+import socket
+from typing import Any, Callable
+
+
+# 条件表达式的规模上限: 编译后的求值开销与节点数成正比, 且每个节点都是常数时间操作
+MAX_CONDITION_LENGTH = 1024
+MAX_CONDITION_NODES = 64
+
+Condition = Callable[[dict], bool]
+
+_COMPARE_OPS = {
+    ast.Eq: operator.eq,
+    ast.NotEq: operator.ne,
+    ast.Lt: operator.lt,
+    ast.LtE: operator.le,
+    ast.Gt: operator.gt,
+    ast.GtE: operator.ge,
+}
+
+_MISSING = object()
+
+
+class ConditionError(ValueError):
+    pass
+
+
+def compile_condition(source: str) -> Condition:
+    """
+    将授权条件编译为闭包, 闭包接收请求上下文(嵌套 dict)并返回是否满足
+
+    语法是 Python 表达式的一个子集:
+    - 字面量: 数字、字符串、True/False/None, 以及由字面量组成的列表/元组
+    - 上下文取值: user.id、resource.owner_id、request.ip, 不存在的字段取值为 None
+    - 运算: and / or / not, == != < <= > >=, in / not in (右侧必须是字面量列表)
+    - 函数: ip_in(request.ip, "10.0.0.0/8")
+
+    不支持循环、算术、下标和任意函数调用, 节点数不超过 MAX_CONDITION_NODES,
+    因此单次求值的耗时有固定上界; 求值时出现类型错误视为不满足
+    """
+    if len(source) > MAX_CONDITION_LENGTH:
+        raise ConditionError(f"条件长度超过 {MAX_CONDITION_LENGTH}")
+    try:
+        tree = ast.parse(source.strip(), mode="eval")
+    except SyntaxError as e:
+        raise ConditionError(f"条件语法错误: {e.msg}") from e
+    nodes = sum(1 for _ in ast.walk(tree))
+    if nodes > MAX_CONDITION_NODES:
+        raise ConditionError(f"条件过于复杂: {nodes} 个节点, 上限 {MAX_CONDITION_NODES}")
+    evaluate = _compile(tree.body)
+
+    def condition(context: dict) -> bool:
+        try:
+            return bool(evaluate(context))
+        except (TypeError, ValueError):
+            return False
+
+    condition.source = source
+    return condition
+
+
+def _compile(node: ast.AST) -> Callable[[dict], Any]:
+    if isinstance(node, ast.Constant):
+        if not isinstance(node.value, (str, int, float, bool, type(None))):
+            raise ConditionError(f"不支持的字面量: {node.value!r}")
+        value = node.value
+        return lambda context: value
+
+    if isinstance(node, (ast.Name, ast.Attribute)):
+        return _compile_lookup(node)
+
+    if isinstance(node, ast.BoolOp):
+        operands = [_compile(value) for value in node.values]
+        if isinstance(node.op, ast.And):
+            return lambda context: all(operand(context) for operand in operands)
+        return lambda context: any(operand(context) for operand in operands)
+
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.Not):
+        operand = _compile(node.operand)
+        return lambda context: not operand(context)
+
+    if isinstance(node, ast.Compare):
+        return _compile_compare(node)
+
+    if isinstance(node, ast.Call):
+        return _compile_call(node)
+
+    raise ConditionError(f"不支持的表达式: {type(node).__name__}")
+
+
+def _compile_lookup(node: ast.AST) -> Callable[[dict], Any]:
+    path = []
+    while isinstance(node, ast.Attribute):
+        path.append(node.attr)
+        node = node.value
+    if not isinstance(node, ast.Name):
+        raise ConditionError("只能访问上下文字段, 如 resource.owner_id")
+    path.append(node.id)
+    path.reverse()
+
+    def lookup(context: dict) -> Any:
+        value = context
+        for key in path:
+            if not isinstance(value, dict):
+                return None
+            value = value.get(key, _MISSING)
+            if value is _MISSING:
+                return None
+        return value
+
+    return lookup
+
+
+def _literal_set(node: ast.AST) -> frozenset:
+    if not isinstance(node, (ast.List, ast.Tuple, ast.Set)):
+        raise ConditionError("in 的右侧必须是字面量列表")
+    values = []
+    for element in node.elts:
+        if not isinstance(element, ast.Constant) or not isinstance(element.value, (str, int, float, bool)):
+            raise ConditionError("in 的右侧只能包含字面量")
+        values.append(element.value)
+    return frozenset(values)
+
+
+def _compile_compare(node: ast.Compare) -> Callable[[dict], Any]:
+    left = _compile(node.left)
+    pairs = []
+    for op, comparator in zip(node.ops, node.comparators):
+        if isinstance(op, (ast.In, ast.NotIn)):
+            if len(node.ops) > 1:
+                raise ConditionError("in 不能用于链式比较")
+            # 预先转换为集合, 成员判断为常数时间
+            values = _literal_set(comparator)
+            negate = isinstance(op, ast.NotIn)
+
+            def membership(a, _, values=values, negate=negate):
+                try:
+                    return (a in values) != negate
+                except TypeError:
+                    # 列表、dict 等不可哈希的值
+                    return negate
+
+            pairs.append((membership, None))
+        elif type(op) in _COMPARE_OPS:
+            pairs.append((_COMPARE_OPS[type(op)], _compile(comparator)))
+        else:
+            raise ConditionError(f"不支持的比较: {type(op).__name__}")
+
+    def compare(context: dict) -> bool:
+        a = left(context)
+        for fn, right in pairs:
+            b = right(context) if right is not None else None
+            if not fn(a, b):
+                return False
+            a = b
+        return True
+
+    return compare
+
+
+def _compile_call(node: ast.Call) -> Callable[[dict], Any]:
+    if not isinstance(node.func, ast.Name) or node.func.id != "ip_in" or node.keywords:
+        raise ConditionError("只支持函数 ip_in(ip, \"cidr\")")
+    if len(node.args) != 2 or not isinstance(node.args[1], ast.Constant) or not isinstance(node.args[1].value, str):
+        raise ConditionError("ip_in 的第二个参数必须是网段字符串")
+    try:
+        network = ipaddress.ip_network(node.args[1].value, strict=False)
+    except ValueError as e:
+        raise ConditionError(f"无效网段: {e}") from e
+    address = _compile(node.args[0])
+    # 预先计算网段的整数形式, 求值时只做一次地址解析和位运算
+    family = socket.AF_INET if network.version == 4 else socket.AF_INET6
+    network_address = int(network.network_address)
+    netmask = int(network.netmask)
+
+    def ip_in(context: dict) -> bool:
+        value = address(context)
+        if not isinstance(value, str):
+            return False
+        try:
+            packed = socket.inet_pton(family, value)
+        except (OSError, ValueError):
+            # 格式错误或地址族不同
+            return False
+        return int.from_bytes(packed, "big") & netmask == network_address
+
+    return ip_in
@@ -0,0 +1,146 @@
+import time
+from typing import Dict, List, Tuple
+
+from fastapi import HTTPException
+
+
+def check_bucket_config(name: str, capacity: float, refill_rate: float):
+    """
+    校验令牌桶配置; 补充速度不大于0时桶永远不会回满, 计算等待时间也会除零
+    """
+    if capacity < 1:
+        raise ValueError(f"{name} 令牌桶容量必须不小于1: {capacity}")
+    if refill_rate <= 0:
+        raise ValueError(f"{name} 令牌桶补充速度必须大于0: {refill_rate}")
+
+
+class TokenBucketStore:
+    """
+    进程内令牌桶存储
+    按 key 的哈希分片, 每个分片是一个 key -> (剩余令牌, 更新时间) 的字典;
+    每个分片定期淘汰空闲超过 ttl 的桶(此时桶早已回满, 删除不影响限流结果)
+    """
+
+    def __init__(self, shards: int = 16, ttl: float = 600.0, sweep_every: int = 1024):
+        self.shards: List[Dict[str, Tuple[float, float]]] = [{} for _ in range(shards)]
+        self.ttl = ttl
+        self.sweep_every = sweep_every
+        self._ops = [0] * shards
+
+    async def consume(self, key: str, capacity: float, refill_rate: float, cost: float = 1.0) -> float:
+        """
+        从桶中取出 cost 个令牌, 成功返回 0, 否则返回需要等待的秒数
+        """
+        index = hash(key) % len(self.shards)
+        shard = self.shards[index]
+        now = time.monotonic()
+
+        self._ops[index] += 1
+        if self._ops[index] >= self.sweep_every:
+            self._ops[index] = 0
+            self._sweep(shard, now)
+
+        tokens, updated_at = shard.get(key, (capacity, now))
+        tokens = min(capacity, tokens + (now - updated_at) * refill_rate)
+        if tokens >= cost:
+            shard[key] = (tokens - cost, now)
+            return 0.0
+        shard[key] = (tokens, now)
+        return (cost - tokens) / refill_rate
+
+    def _sweep(self, shard: Dict[str, Tuple[float, float]], now: float):
+        expired = [key for key, (_, updated_at) in shard.items() if now - updated_at > self.ttl]
+        for key in expired:
+            del shard[key]
+
+
+# Redis 令牌桶脚本, 在服务端原子地完成补充与扣减
+_REDIS_TOKEN_BUCKET = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local cost = tonumber(ARGV[4])
+local ttl = tonumber(ARGV[5])
+local bucket = redis.call('HMGET', KEYS[1], 't', 'ts')
+local tokens = tonumber(bucket[1]) or capacity
+local ts = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local retry = 0
+if tokens >= cost then
+    tokens = tokens - cost
+else
+    retry = (cost - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 't', tokens, 'ts', now)
+redis.call('EXPIRE', KEYS[1], ttl)
+return tostring(retry)
+"""
+
+
+class RedisTokenBucketStore:
+    """
+    基于 Redis 的共享令牌桶存储, 多 worker 部署时所有进程共用同一组桶
+    需要额外安装 redis 包
+    """
+
+    def __init__(self, url: str, ttl: float = 600.0, prefix: str = "rpac:ratelimit:"):
+        try:
+            from redis import asyncio as redis
+        except ImportError as e:
+            raise RuntimeError("使用 RATE_LIMIT_REDIS_URL 需要安装 redis 包: pip install redis") from e
+        self.client = redis.from_url(url)
+        self.ttl = int(ttl)
+        self.prefix = prefix
+        self._script = self.client.register_script(_REDIS_TOKEN_BUCKET)
+
+    async def consume(self, key: str, capacity: float, refill_rate: float, cost: float = 1.0) -> float:
+        retry = await self._script(
+            keys=[self.prefix + key],
+            args=[capacity, refill_rate, time.time(), cost, self.ttl],
+        )
+        return float(retry)
+
+
+def create_token_bucket_store(redis_url: str = "", ttl: float = 600.0):
+    """
+    配置了 Redis 地址时使用共享存储, 否则使用进程内存储
+    """
+    if redis_url:
+        return RedisTokenBucketStore(redis_url, ttl=ttl)
+    return TokenBucketStore(ttl=ttl)
+
+
+class LoginRateLimiter:
+    """
+    登录限流: 分别按客户端IP和用户名限制尝试频率
+    在查询数据库和校验 bcrypt 之前执行, 被拒绝的请求不消耗数据库和CPU
+    """
+
+    def __init__(
+        self,
+        store: TokenBucketStore,
+        ip_capacity: float = 20,
+        ip_refill_rate: float = 0.5,
+        username_capacity: float = 5,
+        username_refill_rate: float = 0.1,
+    ):
+        check_bucket_config("登录IP", ip_capacity, ip_refill_rate)
+        check_bucket_config("登录用户名", username_capacity, username_refill_rate)
+        self.store = store
+        self.ip_capacity = ip_capacity
+        self.ip_refill_rate = ip_refill_rate
+        self.username_capacity = username_capacity
+        self.username_refill_rate = username_refill_rate
+
+    async def check(self, client_ip: str, username: str):
+        retry_after = await self.store.consume(f"login:ip:{client_ip}", self.ip_capacity, self.ip_refill_rate)
+        if not retry_after:
+            retry_after = await self.store.consume(
+                f"login:user:{username.lower()}", self.username_capacity, self.username_refill_rate
+            )
+        if retry_after:
+            raise HTTPException(
+                status_code=429,
+                detail="登录尝试过于频繁, 请稍后再试",
+                headers={"Retry-After": str(max(1, int(retry_after + 0.999)))},
+            )
@@ -0,0 +1,77 @@
+from contextlib import contextmanager
+
+from dependency_injector import providers
+
+from services.authz_service import AuthzService
+from services.manifest_service import ManifestService
+from services.permission_graph import PermissionGraph
+from services.permission_service import PermissionService
+from services.rate_limit_service import LoginRateLimiter
+from services.role_service import RoleService
+from services.token_service import TokenService
+from services.user_service import UserService
+
+
+class ServiceRegistry:
+    """
+    路由使用的服务实例
+    容器中的服务都是单例, bind() 在启动时解析一次并保存为实例属性, 路由中取用只是一次属性查找,
+    不再经过 @inject 包装和 FastAPI 的依赖解析;
+    未绑定(或 unbind() 之后)时每次访问都从容器解析, 容器上的 override 立即生效
+    """
+
+    token_service: TokenService
+    login_rate_limiter: LoginRateLimiter
+    permission_graph: PermissionGraph
+    user_service: UserService
+    role_service: RoleService
+    permission_service: PermissionService
+    manifest_service: ManifestService
+    authz_service: AuthzService
+
+    def __init__(self):
+        self._container = None
+
+    def bind(self, container, resolve: bool = True):
+        """
+        关联容器; resolve 为 True 时立即解析全部服务, 之后对容器的 override 需要重新 bind 才生效
+        """
+        self.unbind()
+        self._container = container
+        if resolve:
+            for name in self.__annotations__:
+                setattr(self, name, getattr(container, name)())
+
+    def unbind(self):
+        for name in self.__annotations__:
+            self.__dict__.pop(name, None)
+
+    @contextmanager
+    def override(self, name: str, instance):
+        """
+        临时替换一个服务(供测试使用), 同时覆盖容器中的提供者, 依赖它的其他单例在首次解析时也会拿到替身
+        需要先关联容器; 只关联而不解析服务时用 bind(container, resolve=False)
+        """
+        if name not in self.__annotations__:
+            raise AttributeError(f"未知的服务: {name}")
+        if self._container is None:
+            raise RuntimeError(f"替换服务 {name} 前需先调用 registry.bind(container, resolve=False)")
+        provider = getattr(self._container, name)
+        bound = name in self.__dict__
+        try:
+            with provider.override(providers.Object(instance)):
+                if bound:
+                    setattr(self, name, instance)
+                yield instance
+        finally:
+            if bound:
+                setattr(self, name, provider())
+
+    def __getattr__(self, name: str):
+        # 只有未绑定的服务才会走到这里
+        if name not in self.__annotations__ or self._container is None:
+            raise AttributeError(f"服务 {name} 未绑定, 需先调用 registry.bind(container)")
+        return getattr(self._container, name)()
+
+
+registry = ServiceRegistry()
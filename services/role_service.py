@@ -2,15 +2,28 @@ from fastapi import HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from persist.models.role_model import Role
+from persist.permission_dao import PermissionDao
 from persist.role_dao import RoleDao
 from services.model.role_vo import RoleCreate, RolePermission
+from services.permission_graph import PermissionGraph
+from services.policy_condition import ConditionError, compile_condition
+from utils.tracing import traced_class
 
 
 
+@traced_class
 class RoleService:
-    def __init__(self, session: AsyncSession, role_dao: RoleDao):
+    def __init__(
+        self,
+        session: AsyncSession,
+        role_dao: RoleDao,
+        permission_dao: PermissionDao,
+        permission_graph: PermissionGraph,
+    ):
         self.session = session
         self.role_dao = role_dao
+        self.permission_dao = permission_dao
+        self.permission_graph = permission_graph
 
     
     async def add_permission_to_role(self, role_permission: RolePermission) -> Role:
@@ -21,8 +34,19 @@ class RoleService:
         if not permission_exist:
             raise HTTPException(status_code=400, detail="权限不存在")
 
-        role = await self.role_dao.add_permission_to_role(role_permission.role_id, role_permission.permission_id)
-        return {"role": role.name, "permission": [permission.name for permission in role.permissions]}
+        condition = role_permission.condition or None
+        if condition:
+            # 写入前先编译一次, 无效的条件不入库
+            try:
+                compile_condition(condition)
+            except ConditionError as e:
+                raise HTTPException(status_code=400, detail=f"授权条件无效: {e}")
+
+        permission_names = await self.role_dao.add_permission_to_role(
+            role_permission.role_id, role_permission.permission_id, condition
+        )
+        self.permission_graph.add_role_permission(role_permission.role_id, role_permission.permission_id, condition)
+        return {"role": role_exist.name, "permission": permission_names}
     
     
     async def create_role(self, role: RoleCreate) -> Role:
@@ -3,7 +3,6 @@
 from datetime import datetime, timezone, timedelta
 
 from fastapi import HTTPException
-import jwt
 from persist.models.user_model import User
 
 
@@ -12,13 +11,19 @@ class TokenService:
         self.secret_key = secret_key
 
     def generate_token(self, user: User):
+        # 延迟导入 jwt, 缩短服务冷启动时间
+        import jwt
         payload = {
-            "sub": user.id,
+            # PyJWT 2.10 起要求 sub 为字符串
+            "sub": str(user.id),
+            # 租户ID, 鉴权中间件据此确定请求所属的租户
+            "tid": user.tenant_id,
             "exp": datetime.now(timezone.utc) + timedelta(days=1),
         }
         return jwt.encode(payload, self.secret_key, algorithm="HS256")
     
     def verify_token(self, token: str):
+        import jwt
         try:
             payload = jwt.decode(token, self.secret_key, algorithms=["HS256"])
             return payload
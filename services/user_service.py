@@ -3,18 +3,30 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from persist.models.user_model import User
 from persist.role_dao import RoleDao
+from persist.tenant import get_tenant_id
 from persist.user_dao import UserDao
 from services.model.user_vo import UserCreate, UserLogin, UserRole
+from services.permission_graph import PermissionGraph
 from services.token_service import TokenService
-from utils.bcrypt import hash_password, verify_password
+from utils.bcrypt import hash_password_async, verify_password_async
+from utils.tracing import traced_class
 
 
+@traced_class
 class UserService:
-    def __init__(self, session: AsyncSession, user_dao: UserDao, token_service: TokenService, role_dao: RoleDao):
+    def __init__(
+        self,
+        session: AsyncSession,
+        user_dao: UserDao,
+        token_service: TokenService,
+        role_dao: RoleDao,
+        permission_graph: PermissionGraph,
+    ):
         self.session = session
         self.user_dao = user_dao
         self.token_service = token_service
         self.role_dao = role_dao
+        self.permission_graph = permission_graph
 
     async def add_role_to_user(self, user_role: UserRole) -> User:
         user_exist = await self.user_dao.get_user_by_id(user_role.user_id)
@@ -23,8 +35,9 @@ class UserService:
         role_exist = await self.role_dao.get_role_by_id(user_role.role_id)
         if not role_exist:
             raise HTTPException(status_code=400, detail="角色不存在")
-        user = await self.user_dao.add_role_to_user(user_role.user_id, user_role.role_id)
-        return {"username": user.username, "role": [role.name for role in user.roles]}
+        role_names = await self.user_dao.add_role_to_user(user_role.user_id, user_role.role_id)
+        self.permission_graph.add_user_role(user_role.user_id, user_role.role_id, get_tenant_id())
+        return {"username": user_exist.username, "role": role_names}
     
     async def create_user(self, user: UserCreate) -> User:
         user_exist = await self.user_dao.get_user_by_username(user.username)
@@ -32,15 +45,15 @@ class UserService:
             raise HTTPException(status_code=400, detail="用户已存在")
         user = User(
             username=user.username,
-            password=hash_password(user.password),
+            password=await hash_password_async(user.password),
             email=user.email,
         )
         return await self.user_dao.create_user(user)
     
     async def login(self, user: UserLogin) -> User:
-        user_exist = await self.user_dao.get_user_by_username(user.username)
+        user_exist = await self.user_dao.get_user_credentials(user.username)
         if not user_exist:
             raise HTTPException(status_code=400, detail="用户不存在")
-        if not verify_password(user.password, user_exist.password):
+        if not await verify_password_async(user.password, user_exist.password):
             raise HTTPException(status_code=400, detail="密码错误")
         return self.token_service.generate_token(user_exist)
\ No newline at end of file
@@ -1,5 +1,16 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+
 import bcrypt
 
+# bcrypt 是 CPU 密集型操作, 放到独立线程池中执行, 避免阻塞事件循环
+HASH_POOL_SIZE = int(os.getenv("BCRYPT_POOL_SIZE", str(min(4, os.cpu_count() or 1))))
+_hash_executor = ThreadPoolExecutor(max_workers=HASH_POOL_SIZE, thread_name_prefix="bcrypt")
+# 已提交到线程池但尚未完成的任务数(包含排队中的任务)
+_hash_in_flight = 0
+
+
 def hash_password(password: str) -> str:
     pwd_bytes = password.encode('utf-8')
     salt = bcrypt.gensalt()
@@ -9,4 +20,29 @@ def hash_password(password: str) -> str:
 
 def verify_password(password: str, hashed_password: str) -> bool:
     password_byte_enc = password.encode('utf-8')
-    return bcrypt.checkpw(password_byte_enc, hashed_password)
\ No newline at end of file
+    return bcrypt.checkpw(password_byte_enc, hashed_password.encode('utf-8'))
+
+
+async def _run_in_hash_pool(func, *args):
+    global _hash_in_flight
+    _hash_in_flight += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_hash_executor, func, *args)
+    finally:
+        _hash_in_flight -= 1
+
+
+async def hash_password_async(password: str) -> str:
+    return await _run_in_hash_pool(hash_password, password)
+
+
+async def verify_password_async(password: str, hashed_password: str) -> bool:
+    return await _run_in_hash_pool(verify_password, password, hashed_password)
+
+
+def hash_pool_stats() -> dict:
+    return {
+        "workers": HASH_POOL_SIZE,
+        "in_flight": _hash_in_flight,
+        "queued": max(0, _hash_in_flight - HASH_POOL_SIZE),
+    }
\ No newline at end of file
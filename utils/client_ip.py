@@ -0,0 +1,54 @@
+import ipaddress
+import os
+from typing import List, Union
+
+from fastapi import Request
+
+Network = Union[ipaddress.IPv4Network, ipaddress.IPv6Network]
+
+
+def parse_trusted_proxies(value: str) -> List[Network]:
+    """
+    解析逗号分隔的代理地址或网段, 如 "10.0.0.0/8,127.0.0.1"
+    """
+    return [ipaddress.ip_network(item.strip(), strict=False) for item in value.split(",") if item.strip()]
+
+
+# 受信任的反向代理, 只有直连地址属于这些网段时才读取代理请求头; 未配置时一律使用直连地址
+TRUSTED_PROXIES = parse_trusted_proxies(os.getenv("TRUSTED_PROXIES", ""))
+
+
+def is_trusted_proxy(host: str, trusted: List[Network]) -> bool:
+    try:
+        address = ipaddress.ip_address(host)
+    except ValueError:
+        return False
+    return any(address in network for network in trusted)
+
+
+def get_client_ip(request: Request, trusted: List[Network] = None) -> str:
+    """
+    获取客户端真实IP地址
+    X-Forwarded-For 由客户端和各级代理依次追加, 最左侧的值可由客户端任意伪造;
+    因此从右往左跳过受信任的代理, 第一个不受信任的地址才是客户端
+    """
+    trusted = TRUSTED_PROXIES if trusted is None else trusted
+    client_ip = getattr(request.client, "host", "unknown")
+    if not is_trusted_proxy(client_ip, trusted):
+        # 直连的不是受信任的代理, 代理头可能是伪造的
+        return client_ip
+
+    forwarded_for = request.headers.get("x-forwarded-for")
+    if forwarded_for:
+        for hop in reversed([hop.strip() for hop in forwarded_for.split(",") if hop.strip()]):
+            client_ip = hop
+            if not is_trusted_proxy(hop, trusted):
+                break
+        return client_ip
+
+    real_ip = request.headers.get("x-real-ip")
+    if real_ip:
+        return real_ip.strip()
+
+    # 返回直接连接的客户端IP
+    return client_ip
@@ -0,0 +1,254 @@
+import asyncio
+import gc
+import hmac
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+from fastapi import Request, Response
+from fastapi.responses import ORJSONResponse
+
+from services.rate_limit_service import TokenBucketStore, check_bucket_config
+
+PROFILE_HEADER = "X-Profile"
+# inline: 以响应体返回折叠栈, 否则写入 logs/profiles 并在响应头中给出文件名
+PROFILE_OUTPUT_HEADER = "X-Profile-Output"
+
+logger = logging.getLogger("RequestProfiler")
+
+# 当前请求的剖析会话, 由中间件设置, 请求内创建的子任务复制上下文后同样可见
+_session: ContextVar[Optional["ProfileSession"]] = ContextVar("profile_session", default=None)
+
+_ROOT = str(Path(__file__).resolve().parent.parent) + os.sep
+_ASYNCIO_EVENTS = os.path.join("asyncio", "events.py")
+
+
+class ProfileSession:
+    """
+    单个请求的采样会话
+    后台线程按固定间隔读取事件循环线程的调用栈: 事件循环正在执行本请求的任务时记录当前栈,
+    否则记录本请求各任务的挂起栈(以 (await) 结尾), 即等待数据库、线程池等的时间;
+    请求内并发的多个任务各自计数, 因此栈的样本数之和可能大于采样次数
+    """
+
+    def __init__(self, interval: float, max_seconds: float):
+        self.interval = interval
+        self.max_seconds = max_seconds
+        self.loop = asyncio.get_running_loop()
+        self.thread_id = threading.get_ident()
+        self.stacks: Counter[str] = Counter()
+        self.samples = 0
+        self.duration = 0.0
+        self._root: Optional[asyncio.Task] = None
+        self._labels: dict = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def start(self):
+        self._root = asyncio.current_task()
+        self._started = time.perf_counter()
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.duration = time.perf_counter() - self._started
+
+    def collapsed(self) -> str:
+        """
+        折叠栈格式, 每行 "根;...;叶 样本数", 可直接交给 flamegraph.pl 或 speedscope
+        """
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def _run(self):
+        deadline = time.perf_counter() + self.max_seconds
+        while not self._stop.wait(self.interval) and time.perf_counter() < deadline:
+            try:
+                self._sample()
+            except Exception:
+                # 读取其他线程的栈时对象可能正在变化, 丢弃该样本
+                continue
+
+    def _sample(self):
+        task = asyncio.current_task(self.loop)
+        frame = sys._current_frames().get(self.thread_id)
+        if task is not None and frame is not None and task.get_context().get(_session) is self:
+            stacks = [self._frame_stack(frame)]
+        else:
+            # 本请求的任务都在等待, 记录各自的挂起栈; 中间件自身只在等待下游任务, 有下游任务时不计
+            tasks = [t for t in asyncio.all_tasks(self.loop) if t.get_context().get(_session) is self]
+            if len(tasks) > 1:
+                tasks = [t for t in tasks if t is not self._root]
+            stacks = [self._await_stack(t.get_coro()) + ["(await)"] for t in tasks]
+        for stack in stacks:
+            self.stacks[";".join(stack)] += 1
+        self.samples += 1
+
+    def _frame_stack(self, frame) -> list[str]:
+        frames = []
+        while frame is not None:
+            code = frame.f_code
+            # 事件循环调度任务的位置之下都是循环本身的栈帧
+            if code.co_name == "_run" and code.co_filename.endswith(_ASYNCIO_EVENTS):
+                break
+            frames.append(self._label(code))
+            frame = frame.f_back
+        frames.reverse()
+        return frames
+
+    def _await_stack(self, coro) -> list[str]:
+        frames = []
+        while coro is not None:
+            frame = getattr(coro, "cr_frame", None) or getattr(coro, "gi_frame", None)
+            # Cython 实现的协程(如依赖注入的包装)没有栈帧, 跳过后继续沿 await 链查找
+            if frame is not None:
+                frames.append(self._label(frame.f_code))
+            coro = getattr(coro, "cr_await", None) or getattr(coro, "gi_yieldfrom", None)
+            if type(coro).__name__ == "coroutine_wrapper":
+                # Cython 协程 await Python 协程时得到的是 __await__() 包装, 其唯一引用即被等待的协程
+                coro = next(iter(gc.get_referents(coro)), None)
+        return frames
+
+    def _label(self, code) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            filename = code.co_filename
+            if filename.startswith(_ROOT):
+                filename = filename[len(_ROOT):]
+            elif "site-packages" in filename:
+                filename = filename.split("site-packages" + os.sep, 1)[-1]
+            label = self._labels[code] = f"{filename}:{code.co_qualname}".replace(";", ",").replace(" ", "")
+        return label
+
+
+class RequestProfiler:
+    """
+    按需剖析单个请求
+    携带 X-Profile: <secret> 的请求在采样会话中执行, 结果为折叠栈(flame graph 输入);
+    全局令牌桶限制剖析频率, 同时最多 max_concurrent 个会话, 超出时返回 429;
+    未携带请求头的请求只多一次请求头查找
+    """
+
+    def __init__(
+        self,
+        secret: str,
+        output_dir: str = "logs/profiles",
+        interval: float = 0.005,
+        max_seconds: float = 30.0,
+        capacity: float = 2,
+        refill_rate: float = 0.1,
+        max_concurrent: int = 1,
+    ):
+        check_bucket_config("请求剖析", capacity, refill_rate)
+        self.secret = secret.encode()
+        self.output_dir = Path(output_dir)
+        self.interval = interval
+        self.max_seconds = max_seconds
+        self.capacity = capacity
+        self.refill_rate = refill_rate
+        self.max_concurrent = max_concurrent
+        self.bucket = TokenBucketStore(shards=1)
+        self.active = 0
+        self.profiled = 0
+        self.denied = 0
+        self.rate_limited = 0
+
+    def _rate_limited(self, retry_after: float) -> Response:
+        """
+        并发已满时按单次剖析的最长时间提示重试, 频率超限时按令牌回补时间提示
+        """
+        self.rate_limited += 1
+        return ORJSONResponse(
+            {"detail": "剖析请求过于频繁"},
+            status_code=429,
+            headers={"Retry-After": str(max(1, int(retry_after + 0.999)))},
+        )
+
+    def requested(self, request: Request) -> bool:
+        return PROFILE_HEADER in request.headers
+
+    async def profile(self, request: Request, call_next) -> Response:
+        """
+        在采样会话中处理请求; 密钥错误返回 403, 超出频率或并发限制返回 429
+        """
+        if not hmac.compare_digest(request.headers[PROFILE_HEADER].encode(), self.secret):
+            self.denied += 1
+            return ORJSONResponse({"detail": "无权剖析请求"}, status_code=403)
+        # 先检查并发, 因并发被拒绝的请求不消耗频率令牌
+        if self.active >= self.max_concurrent:
+            return self._rate_limited(self.max_seconds)
+        retry_after = await self.bucket.consume("profile", self.capacity, self.refill_rate)
+        if retry_after:
+            return self._rate_limited(retry_after)
+
+        inline = request.headers.get(PROFILE_OUTPUT_HEADER, "").lower() == "inline"
+        self.active += 1
+        session = ProfileSession(self.interval, self.max_seconds)
+        token = _session.set(session)
+        session.start()
+        try:
+            response = await call_next(request)
+            if inline:
+                # 读完响应体, 流式响应的耗时也计入
+                async for _ in response.body_iterator:
+                    pass
+        finally:
+            session.stop()
+            _session.reset(token)
+            self.active -= 1
+            self.profiled += 1
+
+        headers = {
+            "X-Profile-Samples": str(session.samples),
+            "X-Profile-Duration-Ms": f"{session.duration * 1000:.1f}",
+        }
+        if inline:
+            headers["X-Profile-Status"] = str(response.status_code)
+            return Response(session.collapsed(), media_type="text/plain", headers=headers)
+
+        path = self._write(request, session)
+        logger.info(f"请求剖析 {request.method} {request.url.path}: {session.samples} 个样本, 已写入 {path}")
+        headers["X-Profile-File"] = path.name
+        response.headers.update(headers)
+        return response
+
+    def _write(self, request: Request, session: ProfileSession) -> Path:
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        name = re.sub(r"[^A-Za-z0-9]+", "_", request.url.path).strip("_") or "root"
+        path = self.output_dir / f"{datetime.now():%Y%m%d-%H%M%S-%f}_{request.method}_{name}.collapsed"
+        path.write_text(session.collapsed(), encoding="utf-8")
+        return path
+
+    def stats(self) -> dict:
+        return {
+            "active": self.active,
+            "profiled": self.profiled,
+            "denied": self.denied,
+            "rate_limited": self.rate_limited,
+        }
+
+
+def create_request_profiler() -> Optional[RequestProfiler]:
+    """
+    从环境变量创建请求剖析器, 未配置 REQUEST_PROFILE_SECRET 时不启用
+    """
+    secret = os.getenv("REQUEST_PROFILE_SECRET", "")
+    if not secret:
+        return None
+    return RequestProfiler(
+        secret,
+        output_dir=os.getenv("REQUEST_PROFILE_DIR", "logs/profiles"),
+        interval=float(os.getenv("REQUEST_PROFILE_INTERVAL_MS", "5")) / 1000,
+        max_seconds=float(os.getenv("REQUEST_PROFILE_MAX_SECONDS", "30")),
+        capacity=float(os.getenv("REQUEST_PROFILE_BURST", "2")),
+        refill_rate=float(os.getenv("REQUEST_PROFILE_PER_MINUTE", "6")) / 60,
+        max_concurrent=int(os.getenv("REQUEST_PROFILE_MAX_CONCURRENT", "1")),
+    )
@@ -0,0 +1,19 @@
+from functools import lru_cache
+from typing import Any
+
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel
+
+
+@lru_cache(maxsize=None)
+def _read_fields(model: type[BaseModel]) -> tuple[str, ...]:
+    return tuple(model.model_fields)
+
+
+def read_response(model: type[BaseModel], obj: Any, status_code: int = 200) -> ORJSONResponse:
+    """
+    按读模型的字段直接从 ORM 对象取值并用 orjson 序列化
+    数据来自数据库, 属于可信数据, 因此跳过 pydantic 的校验; 只输出读模型声明的字段
+    """
+    content = {name: getattr(obj, name) for name in _read_fields(model)}
+    return ORJSONResponse(content, status_code=status_code)
@@ -0,0 +1,34 @@
+import time
+from contextlib import contextmanager
+
+
+class StartupProfiler:
+    """
+    启动阶段计时器
+    记录导入、容器装配、中间件注册等阶段的耗时, 供 --profile-startup 输出报告
+    """
+
+    def __init__(self):
+        self.phases: list[tuple[str, float]] = []
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, time.perf_counter() - start))
+
+    def total(self) -> float:
+        return sum(elapsed for _, elapsed in self.phases)
+
+    def report(self) -> str:
+        total = self.total() or 1e-9
+        lines = [f"{'phase':<24}{'ms':>10}{'%':>8}"]
+        for name, elapsed in self.phases:
+            lines.append(f"{name:<24}{elapsed * 1000:>10.1f}{elapsed / total * 100:>8.1f}")
+        lines.append(f"{'total':<24}{self.total() * 1000:>10.1f}")
+        return "\n".join(lines)
+
+
+startup_profiler = StartupProfiler()
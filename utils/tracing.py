@@ -0,0 +1,409 @@
+import asyncio
+import functools
+import inspect
+import logging
+import os
+import random
+import re
+import time
+import weakref
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Optional
+
+import orjson
+
+TRACING_EXPORTER = os.getenv("TRACING_EXPORTER", "").lower()  # file / otlp / memory, 为空时不启用追踪
+TRACING_SAMPLE_RATE = float(os.getenv("TRACING_SAMPLE_RATE", "1"))  # 新建追踪的采样比例, 携带 traceparent 的请求沿用上游决定
+TRACING_FILE = os.getenv("TRACING_FILE", "logs/traces.jsonl")
+TRACING_OTLP_ENDPOINT = os.getenv("TRACING_OTLP_ENDPOINT", "http://localhost:4318/v1/traces")
+TRACING_BATCH_SIZE = int(os.getenv("TRACING_BATCH_SIZE", "512"))  # 累积到该数量立即导出
+TRACING_FLUSH_INTERVAL = float(os.getenv("TRACING_FLUSH_INTERVAL", "5"))  # 秒, 未满一批时的导出间隔
+TRACING_MAX_QUEUE = int(os.getenv("TRACING_MAX_QUEUE", "10000"))  # 待导出的最大 span 数, 超出时丢弃
+TRACING_SERVICE_NAME = os.getenv("TRACING_SERVICE_NAME", "fastapi-rpac")
+
+# OTLP 的 span 类型
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+SPAN_KIND_CLIENT = 3
+
+TRACE_ID_HEADER = "X-Trace-ID"
+
+logger = logging.getLogger("Tracing")
+
+# 当前 span, 请求内创建的子任务复制上下文后以它为父 span; 未采样的请求为 None, 下游不再创建 span
+_current: ContextVar[Optional["Span"]] = ContextVar("trace_span", default=None)
+
+# 已安装 SQL 事件监听的引擎, 避免重复安装
+_instrumented_engines = weakref.WeakSet()
+
+_TRACEPARENT = re.compile(r"^[0-9a-f]{2}-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+
+def _new_id(bits: int) -> str:
+    return f"{random.getrandbits(bits):0{bits // 4}x}"
+
+
+def _attribute(key: str, value) -> dict:
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+
+class Span:
+    """
+    一段计时的操作, 以 OTLP 的 JSON 结构导出
+    """
+
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "kind", "start_ns", "end_ns", "attributes", "error")
+
+    def __init__(self, trace_id: str, parent_id: Optional[str], name: str, kind: int = SPAN_KIND_INTERNAL):
+        self.trace_id = trace_id
+        self.span_id = _new_id(64)
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.start_ns = time.time_ns()
+        self.end_ns = 0
+        self.attributes: dict = {}
+        self.error: Optional[BaseException] = None
+
+    def set_attribute(self, key: str, value):
+        self.attributes[key] = value
+
+    def record_exception(self, exc: BaseException):
+        self.error = exc
+
+    def to_otlp(self) -> dict:
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [_attribute(key, value) for key, value in self.attributes.items()],
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        if self.error is not None:
+            # 业务上的 4xx 异常只记录事件, 不标记为错误
+            status_code = getattr(self.error, "status_code", 500)
+            span["events"] = [{
+                "name": "exception",
+                "timeUnixNano": str(self.end_ns),
+                "attributes": [
+                    _attribute("exception.type", type(self.error).__qualname__),
+                    _attribute("exception.message", getattr(self.error, "detail", None) or str(self.error)),
+                ],
+            }]
+            if not isinstance(status_code, int) or status_code >= 500:
+                span["status"] = {"code": 2, "message": type(self.error).__qualname__}
+        return span
+
+
+def otlp_payload(spans: list[Span]) -> dict:
+    """
+    OTLP/JSON 的 ExportTraceServiceRequest
+    """
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": [_attribute("service.name", TRACING_SERVICE_NAME)]},
+            "scopeSpans": [{"scope": {"name": "rpac"}, "spans": [span.to_otlp() for span in spans]}],
+        }]
+    }
+
+
+class InMemorySpanExporter:
+    """
+    保存在内存中, 供测试和基准测试使用
+    """
+
+    def __init__(self):
+        self.spans: list[Span] = []
+
+    def export(self, spans: list[Span]):
+        self.spans.extend(spans)
+
+    def clear(self):
+        self.spans.clear()
+
+
+class FileSpanExporter:
+    """
+    每批 span 以一行 OTLP/JSON 追加到文件, 可由 OpenTelemetry Collector 的 otlpjsonfile 接收器读取
+    """
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+    def export(self, spans: list[Span]):
+        with self.path.open("ab") as f:
+            f.write(orjson.dumps(otlp_payload(spans)) + b"\n")
+
+
+class OtlpHttpSpanExporter:
+    """
+    以 OTLP/HTTP JSON 发送到 Collector 的 /v1/traces
+    """
+
+    def __init__(self, endpoint: str, timeout: float = 5.0):
+        self.endpoint = endpoint
+        self.timeout = timeout
+
+    def export(self, spans: list[Span]):
+        # 只在启用导出时用到, 不在启动时导入
+        import urllib.request
+
+        request = urllib.request.Request(
+            self.endpoint,
+            data=orjson.dumps(otlp_payload(spans)),
+            headers={"Content-Type": "application/json"},
+            method="POST",
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout):
+            pass
+
+
+class Tracer:
+    """
+    创建根 span 并批量导出结束的 span
+    结束的 span 先放入缓冲区, 满 batch_size 条或每隔 flush_interval 秒由后台任务在线程池中导出,
+    请求路径上只有追加列表的开销; 导出跟不上时超出 max_queue 的 span 被丢弃并计数
+    """
+
+    def __init__(self, exporter, sample_rate: float = 1.0, batch_size: int = 512, max_queue: int = 10000):
+        self.exporter = exporter
+        self.sample_rate = sample_rate
+        self.batch_size = batch_size
+        self.max_queue = max_queue
+        self._buffer: list[Span] = []
+        self._full = asyncio.Event()
+        self.sampled = 0
+        self.not_sampled = 0
+        self.exported = 0
+        self.dropped = 0
+        self.export_failures = 0
+
+    def start_trace(self, name: str, traceparent: Optional[str] = None) -> Optional[Span]:
+        """
+        开始一次追踪, 未被采样时返回 None
+        携带合法 W3C traceparent 时沿用其追踪ID和采样标记
+        """
+        match = _TRACEPARENT.match(traceparent) if traceparent else None
+        sampled = int(match.group(3), 16) & 1 if match else random.random() < self.sample_rate
+        if not sampled:
+            self.not_sampled += 1
+            return None
+        self.sampled += 1
+        if match:
+            return Span(match.group(1), match.group(2), name, SPAN_KIND_SERVER)
+        return Span(_new_id(128), None, name, SPAN_KIND_SERVER)
+
+    def end(self, span: Span):
+        span.end_ns = time.time_ns()
+        if len(self._buffer) >= self.max_queue:
+            self.dropped += 1
+            return
+        self._buffer.append(span)
+        if len(self._buffer) >= self.batch_size:
+            self._full.set()
+
+    async def run_export(self, interval: float):
+        """
+        后台导出任务, 在应用生命周期内运行
+        """
+        while True:
+            try:
+                await asyncio.wait_for(self._full.wait(), interval)
+            except asyncio.TimeoutError:
+                pass
+            await self.flush()
+
+    async def flush(self):
+        self._full.clear()
+        while self._buffer:
+            batch, self._buffer = self._buffer[:self.batch_size], self._buffer[self.batch_size:]
+            try:
+                await asyncio.to_thread(self.exporter.export, batch)
+                self.exported += len(batch)
+            except Exception as e:
+                self.export_failures += 1
+                logger.warning(f"span 导出失败, 丢弃 {len(batch)} 条: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "sampled": self.sampled,
+            "not_sampled": self.not_sampled,
+            "buffered": len(self._buffer),
+            "exported": self.exported,
+            "dropped": self.dropped,
+            "export_failures": self.export_failures,
+        }
+
+
+def create_tracer() -> Optional[Tracer]:
+    """
+    按 TRACING_EXPORTER 创建追踪器, 未配置时返回 None
+    """
+    if not TRACING_EXPORTER:
+        return None
+    if TRACING_EXPORTER == "file":
+        exporter = FileSpanExporter(TRACING_FILE)
+    elif TRACING_EXPORTER == "otlp":
+        exporter = OtlpHttpSpanExporter(TRACING_OTLP_ENDPOINT)
+    elif TRACING_EXPORTER == "memory":
+        exporter = InMemorySpanExporter()
+    else:
+        raise RuntimeError(f"未知的 TRACING_EXPORTER: {TRACING_EXPORTER}, 可选 file / otlp / memory")
+    return Tracer(exporter, TRACING_SAMPLE_RATE, TRACING_BATCH_SIZE, TRACING_MAX_QUEUE)
+
+
+# 进程内唯一的追踪器, 在导入时按环境变量创建; 为 None 时各装饰器原样返回, 没有任何开销
+tracer: Optional[Tracer] = create_tracer()
+
+
+def set_tracer(new_tracer: Optional[Tracer]):
+    """
+    替换追踪器, 只影响之后装饰的函数和类(供基准测试使用)
+    """
+    global tracer
+    tracer = new_tracer
+
+
+def current_span() -> Optional[Span]:
+    return _current.get()
+
+
+def current_trace_id() -> Optional[str]:
+    span = _current.get()
+    return span.trace_id if span else None
+
+
+def activate(span: Span):
+    return _current.set(span)
+
+
+def deactivate(token):
+    _current.reset(token)
+
+
+@contextmanager
+def start_span(name: str, kind: int = SPAN_KIND_INTERNAL, **attributes):
+    """
+    在当前追踪内创建子 span, 当前请求未被采样时不创建
+    """
+    parent = _current.get()
+    if parent is None:
+        yield None
+        return
+    span = Span(parent.trace_id, parent.span_id, name, kind)
+    span.attributes.update(attributes)
+    token = _current.set(span)
+    try:
+        yield span
+    except BaseException as e:
+        span.record_exception(e)
+        raise
+    finally:
+        _current.reset(token)
+        tracer.end(span)
+
+
+def traced(fn, name: str):
+    """
+    为协程函数创建子 span; 当前请求未被采样时只多一次上下文变量读取
+    """
+    if tracer is None or not inspect.iscoroutinefunction(fn):
+        return fn
+
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        parent = _current.get()
+        if parent is None:
+            return await fn(*args, **kwargs)
+        span = Span(parent.trace_id, parent.span_id, name)
+        token = _current.set(span)
+        try:
+            return await fn(*args, **kwargs)
+        except BaseException as e:
+            span.record_exception(e)
+            raise
+        finally:
+            _current.reset(token)
+            tracer.end(span)
+
+    return wrapper
+
+
+def traced_class(cls):
+    """
+    类装饰器: 为类中定义的每个公开协程方法创建 "类名.方法名" 的 span
+    """
+    if tracer is None:
+        return cls
+    for name, attr in list(vars(cls).items()):
+        if not name.startswith("_") and inspect.iscoroutinefunction(attr):
+            setattr(cls, name, traced(attr, f"{cls.__name__}.{name}"))
+    return cls
+
+
+def instrument_routes(app):
+    """
+    为每个路由的处理函数创建 span, 需在路由注册完成后调用
+    FastAPI 在请求时才读取 dependant.call, 因此替换后立即生效
+    """
+    if tracer is None:
+        return
+    from fastapi.routing import APIRoute
+
+    for route in app.routes:
+        if isinstance(route, APIRoute):
+            route.dependant.call = traced(route.dependant.call, f"route {route.name}")
+
+
+def instrument_engine(engine):
+    """
+    为数据库引擎执行的每条 SQL 创建 span
+    SQLAlchemy 在 greenlet 中执行同步事件时沿用调用方的上下文, 因此能找到当前 span
+    """
+    if tracer is None:
+        return
+    from sqlalchemy import event
+
+    sync_engine = getattr(engine, "sync_engine", engine)
+    if sync_engine in _instrumented_engines:
+        return
+    _instrumented_engines.add(sync_engine)
+    system = sync_engine.dialect.name
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        parent = _current.get()
+        if parent is None:
+            return
+        span = Span(parent.trace_id, parent.span_id, f"db {statement.split(None, 1)[0]}", SPAN_KIND_CLIENT)
+        span.attributes.update({"db.system": system, "db.statement": statement[:1000]})
+        if executemany:
+            span.attributes["db.executemany"] = True
+        conn.info.setdefault("trace_spans", []).append(span)
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        spans = conn.info.get("trace_spans")
+        if spans:
+            tracer.end(spans.pop())
+
+    @event.listens_for(sync_engine, "handle_error")
+    def handle_error(context):
+        spans = context.connection.info.get("trace_spans") if context.connection is not None else None
+        if spans:
+            span = spans.pop()
+            span.record_exception(context.original_exception)
+            tracer.end(span)